@@ -1,41 +1,159 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
-import json
-import os
+import hmac
+from datetime import date
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from scipy import sparse
+from app import config
 from app.models.user import UserProfile, ProfileResponse, ReadinessScore
-from app.models.grant import MatchResponse, Grant, MatchResult, ApplicationTips
-from app.services.matcher import MatcherService
-from app.services.readiness import calculate_readiness_score
+from app.models.grant import (
+    MatchResponse, Grant, MatchResult, ApplicationTips,
+    BatchMatchRequest, BatchMatchResponse, CandidatesResponse, GrantSearchResponse, IngestResult
+)
+from app.services.matcher import MatcherService, BATCH_CHUNK_SIZE
+from app.services.grant_repository import GrantRepository
+from app.services.grant_search import SORTS, SearchResult
+from app.services.catalog import catalog_state
+from app.services.match_cache import match_cache
+from app.services.match_cursors import InvalidCursorError, RankedMatches, match_cursors
+from app.services.profile_index import profile_index
+from app.services.profile_store import ProfileRecord, ProfileVector, get_profile_store
+from app.services.readiness import calculate_readiness_score, calculate_readiness_scores
 from app.services.ai_assistant import generate_application_tips
+from app.services.batching import MicroBatcher
+from app.services.executor import execution_backend
+from app.services.ingestion import ingestion_service, GrantExistsError, GrantNotFoundError
+from app.services.metrics import timed
+from app.api.serialization import (
+    COMPACT_GRANT_FIELDS, COMPACT_MATCH_FIELDS, GRANT_FIELDS, MATCH_FIELDS, Fields,
+    FastJSONResponse, grants_json, match_response_json, match_summary_headers, ndjson_response,
+    parse_fields, project_grant, project_matches, search_response_json, wants_ndjson
+)
 
 router = APIRouter()
 
 # Load grants data
-def get_grants():
+def get_repository() -> GrantRepository:
     # In a real app, this would be a database
-    # For MVP, we load from JSON and cache in memory
-    if hasattr(get_grants, "data"):
-        return get_grants.data
-    
-    file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "grants.json")
-    with open(file_path, "r") as f:
-        data = json.load(f)
-        grants = [Grant(**g) for g in data]
-        get_grants.data = grants
-        return grants
+    # For MVP, we load from JSON and keep an indexed copy in memory
+    return catalog_state.get_repository()
+
+def get_grants() -> Sequence[Grant]:
+    return get_repository().active_grants()
 
 # Initialize matcher service
-def get_matcher():
-    if hasattr(get_matcher, "service"):
-        return get_matcher.service
+def get_matcher() -> MatcherService:
+    return catalog_state.get_matcher()
+
+# CPU-bound work submitted to the execution backend (module-level so it can be pickled)
+def _profile_vector(profile: UserProfile) -> ProfileVector:
+    matcher = catalog_state.get_matcher()
+    return ProfileVector(matcher.vocabulary_key, matcher.profile_vectors([profile]))
+
+def _stored_vector(record: Optional[ProfileRecord], matcher: MatcherService):
+    """A stored profile's TF-IDF vector, recomputed (and stored) if the vocabulary changed since"""
+    if record is None:
+        return None
+    if record.vector is None or record.vector.vocabulary_key != matcher.vocabulary_key:
+        vector = ProfileVector(matcher.vocabulary_key, matcher.profile_vectors([record.profile]))
+        record = record._replace(vector=vector)
+        get_profile_store().put(record)
+    return record.vector.vector
+
+class _MatchCall(NamedTuple):
+    profile: UserProfile
+    strict_eligibility: bool
+    record: Optional[ProfileRecord]
+
+def _match_call_key(call: _MatchCall) -> Tuple[str, bool]:
+    # Everything the results depend on: the whole profile (explanations read credentials too) but its id
+    return call.profile.model_dump_json(exclude={"id", "created_at"}), call.strict_eligibility
+
+def _match_calls(calls: List[_MatchCall], top_k: int = 25) -> List[List[MatchResult]]:
+    """
+    Match the /match calls of one micro-batch against the same catalog snapshot.
     
-    grants = get_grants()
-    service = MatcherService(grants)
-    get_matcher.service = service
-    return service
+    Missing profile vectors are computed with one transform; on catalogs matched
+    exhaustively the match cache misses are scored as one profiles x grants product.
+    """
+    snapshot = catalog_state.ready_snapshot()
+    matcher = snapshot.matcher
+    exhaustive = not matcher.candidate_pool
+    scores = [match_cache.get(c.profile, snapshot.version) if exhaustive else None for c in calls]
+    todo = [i for i, s in enumerate(scores) if s is None]
+    vectors = {i: _stored_vector(calls[i].record, matcher) for i in todo}
+    missing = [i for i in todo if vectors[i] is None]
+    if missing:
+        with timed("match.transform"):
+            fresh = matcher.profile_vectors([calls[i].profile for i in missing])
+        vectors.update((i, fresh[j]) for j, i in enumerate(missing))
+    if exhaustive:
+        # Large catalogs score retrieved candidates per profile instead of caching whole-catalog scores
+        for start in range(0, len(todo), BATCH_CHUNK_SIZE):
+            chunk = todo[start:start + BATCH_CHUNK_SIZE]
+            with timed("match.score"):
+                batch = matcher.score_batch(
+                    [calls[i].profile for i in chunk], vectors=sparse.vstack([vectors[i] for i in chunk], format="csr")
+                )
+            for j, i in enumerate(chunk):
+                scores[i] = batch.row(j).copy()
+                match_cache.put(calls[i].profile, snapshot.version, scores[i])
+    return [
+        matcher.match(
+            c.profile, top_k=top_k, strict_eligibility=c.strict_eligibility, scores=scores[i], vector=vectors.get(i)
+        )
+        for i, c in enumerate(calls)
+    ]
+
+# Concurrent /match calls are scored together; identical in-flight calls share one result
+match_batcher = MicroBatcher(
+    "match", _match_calls, execution_backend.run_numeric, key=_match_call_key,
+    max_wait=config.MATCH_BATCH_MAX_WAIT_MS / 1000, max_size=config.MATCH_BATCH_MAX_SIZE
+)
+
+def _grant_match_score(profile: UserProfile, grant_id: str, record: Optional[ProfileRecord] = None) -> Optional[int]:
+    snapshot = catalog_state.ready_snapshot()
+    position = snapshot.matcher.positions.get(grant_id)
+    scores = match_cache.get(profile, snapshot.version)
+    if scores is not None and position is not None:
+        return int(scores.match_score[position])
+    # No cached vector: score just this grant instead of the whole catalog
+    result = snapshot.matcher.score_one(profile, grant_id, _stored_vector(record, snapshot.matcher))
+    return result.match_score if result else None
+
+def _match_profiles(
+    profiles: List[UserProfile], top_k: int = 25, strict_eligibility: bool = False
+) -> List[List[MatchResult]]:
+    return get_matcher().match_batch(profiles, top_k=top_k, strict_eligibility=strict_eligibility)
+
+async def _load_record(profile_id: str) -> Optional[ProfileRecord]:
+    # Cache hits are served on the event loop; only a miss queries the store, on a worker thread
+    store = get_profile_store()
+    record = store.get_cached(profile_id)
+    if record is None:
+        record = await execution_backend.run_blocking(store.get, profile_id)
+    return record
+
+async def _save_record(record: ProfileRecord):
+    await execution_backend.run_blocking(get_profile_store().put, record)
+
+async def _get_record(profile_id: str) -> ProfileRecord:
+    record = await _load_record(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return record
+
+async def _stored_readiness(record: ProfileRecord) -> ReadinessScore:
+    """Readiness stored with the profile (computed and stored for records that lack it)"""
+    if record.readiness is not None:
+        return record.readiness
+    readiness = await execution_backend.run_python(calculate_readiness_score, record.profile)
+    await _save_record(record._replace(readiness=readiness))
+    return readiness
 
-# In-memory profile storage for MVP
-profiles_db = {}
+async def _profile_readiness(profile: UserProfile, record: Optional[ProfileRecord]) -> ReadinessScore:
+    if record:
+        return await _stored_readiness(record)
+    return await execution_backend.run_python(calculate_readiness_score, profile)
 
 @router.post("/profile/create", response_model=ProfileResponse)
 async def create_profile(profile: UserProfile):
@@ -43,11 +161,13 @@ async def create_profile(profile: UserProfile):
     if not profile.id:
         profile.id = str(uuid.uuid4())
     
-    # Calculate score
-    readiness = calculate_readiness_score(profile)
+    # Calculate score and the TF-IDF vector once; both are stored with the profile
+    readiness = await execution_backend.run_python(calculate_readiness_score, profile)
+    vector = await execution_backend.run_numeric(_profile_vector, profile)
     
-    # Save to "db"
-    profiles_db[profile.id] = profile
+    # Save to the store; cached match scores of a previous version of this profile are stale
+    await _save_record(ProfileRecord(profile, readiness, vector))
+    match_cache.invalidate_profile(profile.id)
     
     return ProfileResponse(
         profile_id=profile.id,
@@ -57,83 +177,301 @@ async def create_profile(profile: UserProfile):
 
 @router.get("/profile/{profile_id}", response_model=ProfileResponse)
 async def get_profile(profile_id: str):
-    if profile_id not in profiles_db:
-        raise HTTPException(status_code=404, detail="Profile not found")
-    
-    profile = profiles_db[profile_id]
-    readiness = calculate_readiness_score(profile)
+    record = await _get_record(profile_id)
+    readiness = await _stored_readiness(record)
     
     return ProfileResponse(
-        profile_id=profile.id,
+        profile_id=record.profile.id,
         completeness_score=readiness.overall_score,
-        profile=profile
+        profile=record.profile
     )
 
 @router.get("/readiness-score", response_model=ReadinessScore)
 async def get_readiness_score(profile_id: str):
-    if profile_id not in profiles_db:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    return await _stored_readiness(await _get_record(profile_id))
+
+def _match_summary(matches: List[MatchResult], readiness: ReadinessScore) -> dict:
+    # Calculate totals
+    total_funding = sum(m.grant.amount for m in matches if m.match_score > 60)
     
-    profile = profiles_db[profile_id]
-    return calculate_readiness_score(profile)
+    return {
+        "total_funding": total_funding,
+        "total_matches": len(matches),
+        "profile_score": readiness.overall_score
+    }
+
+def _match_response_json(matches: List[MatchResult], readiness: ReadinessScore, fields: Fields = None, **extra) -> bytes:
+    # Encoded directly (response_model only documents the shape); grants are spliced in pre-encoded
+    with timed("serialize"):
+        return match_response_json(matches, fields, **_match_summary(matches, readiness), **extra)
+
+def _rank_profile(
+    profile: UserProfile, strict_eligibility: bool, readiness: ReadinessScore, record: Optional[ProfileRecord] = None
+) -> RankedMatches:
+    """A profile's matches ranked once (up to MATCH_PAGE_MAX_RESULTS) for paging"""
+    snapshot = catalog_state.ready_snapshot()
+    matcher = snapshot.matcher
+    scores = vector = None
+    if matcher.candidate_pool:
+        vector = _stored_vector(record, matcher)
+    else:
+        scores = match_cache.get_or_compute(
+            profile, snapshot.version, lambda: matcher.score_all(profile, vector=_stored_vector(record, matcher))
+        )
+    rows, ranked = matcher.rank(profile, config.MATCH_PAGE_MAX_RESULTS, strict_eligibility, scores=scores, vector=vector)
+    return RankedMatches(matcher, snapshot.version, profile, readiness, rows, ranked)
+
+def _match_page(ranked: RankedMatches, offset: int, page_size: int) -> List[MatchResult]:
+    page = slice(offset, offset + page_size)
+    return ranked.matcher.results(ranked.profile, ranked.rows[page], ranked.scores.take(page))
+
+def _get_cursor(cursor: str):
+    try:
+        found = match_cursors.get(cursor, catalog_state.version)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if found is None:
+        raise HTTPException(status_code=410, detail="Cursor expired or the catalog changed, request the first page again")
+    return found
+
+def _matches_response(
+    request: Request, matches: List[MatchResult], readiness: ReadinessScore, projection: Fields, **paging
+):
+    if wants_ndjson(request):
+        # One match per line; the totals (and paging) travel as X-Total-Funding etc. headers
+        summary = {**_match_summary(matches, readiness), **{k: v for k, v in paging.items() if v is not None}}
+        return ndjson_response(project_matches(matches, projection), headers=match_summary_headers(summary))
+    return FastJSONResponse(_match_response_json(matches, readiness, fields=projection, **paging))
+
+async def _page_response(
+    request: Request, key: str, ranked: RankedMatches, offset: int, page_size: int, projection: Fields
+):
+    # Only this page's results are built; the ranking was computed with the first page
+    matches = await execution_backend.run_numeric(_match_page, ranked, offset, page_size)
+    end = offset + len(matches)
+    next_cursor = match_cursors.token(key, end, page_size) if end < len(ranked.rows) else None
+    return _matches_response(
+        request, matches, ranked.readiness, projection, next_cursor=next_cursor, total_results=len(ranked.rows)
+    )
 
 @router.post("/match", response_model=MatchResponse)
-async def get_matches(profile_id: Optional[str] = None, profile: Optional[UserProfile] = None):
+async def get_matches(
+    request: Request,
+    profile_id: Optional[str] = None,
+    profile: Optional[UserProfile] = None,
+    strict_eligibility: bool = False,
+    fields: Optional[str] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    projection = parse_fields(fields, MATCH_FIELDS, COMPACT_MATCH_FIELDS)
+    if page_size is not None and not 1 <= page_size <= config.MATCH_PAGE_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {config.MATCH_PAGE_MAX_SIZE}")
+    if cursor:
+        # Next page of an earlier paged request; page_size may change from page to page
+        key, ranked, offset, cursor_page_size = _get_cursor(cursor)
+        return await _page_response(request, key, ranked, offset, page_size or cursor_page_size, projection)
+    
     # Support both existing profile ID or transient profile
-    if profile_id and profile_id in profiles_db:
-        user_profile = profiles_db[profile_id]
-    elif profile:
-        user_profile = profile
-    else:
+    record = await _load_record(profile_id) if profile_id else None
+    if record:
+        profile = record.profile
+    elif not profile:
         raise HTTPException(status_code=400, detail="Either profile_id or profile data must be provided")
     
-    matcher = get_matcher()
-    matches = matcher.match(user_profile)
+    if page_size is not None:
+        readiness = await _profile_readiness(profile, record)
+        ranked = await execution_backend.run_numeric(_rank_profile, profile, strict_eligibility, readiness, record)
+        return await _page_response(request, match_cursors.put(ranked), ranked, 0, page_size, projection)
     
-    # Calculate totals
-    total_funding = sum(m.grant.amount for m in matches if m.match_score > 60)
+    matches = await match_batcher.submit(_MatchCall(profile, strict_eligibility, record))
+    readiness = await _profile_readiness(profile, record)
+    return _matches_response(request, matches, readiness, projection)
+
+async def _stream_batch(
+    user_profiles: List[UserProfile], readiness_scores: List[ReadinessScore], request: BatchMatchRequest, fields: Fields
+):
+    # Match one chunk at a time so only a chunk's results are ever held in memory
+    for start in range(0, len(user_profiles), BATCH_CHUNK_SIZE):
+        chunk = user_profiles[start:start + BATCH_CHUNK_SIZE]
+        all_matches = await execution_backend.run_numeric(
+            _match_profiles, chunk, top_k=request.top_k, strict_eligibility=request.strict_eligibility
+        )
+        for p, matches, readiness in zip(chunk, all_matches, readiness_scores[start:]):
+            yield _match_response_json(matches, readiness, fields=fields, profile_id=p.id) + b"\n"
+
+@router.post("/match/batch", response_model=BatchMatchResponse)
+async def get_batch_matches(request: BatchMatchRequest, http_request: Request, fields: Optional[str] = None):
+    projection = parse_fields(fields, MATCH_FIELDS, COMPACT_MATCH_FIELDS)
+    # Cached profiles are read on the event loop, the rest with one store query on a worker thread
+    store = get_profile_store()
+    cached = {pid: store.get_cached(pid) for pid in request.profile_ids}
+    records = {pid: r for pid, r in cached.items() if r is not None}
+    uncached = [pid for pid, r in cached.items() if r is None]
+    if uncached:
+        records.update(await execution_backend.run_blocking(store.get_many, uncached))
+    missing = [pid for pid in request.profile_ids if pid not in records]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Profiles not found: {missing}")
     
-    readiness = calculate_readiness_score(user_profile)
+    user_profiles = [records[pid].profile for pid in request.profile_ids] + request.profiles
+    if not user_profiles:
+        raise HTTPException(status_code=400, detail="Either profile_ids or profiles must be provided")
+    if len(user_profiles) > config.MAX_BATCH_PROFILES:
+        raise HTTPException(status_code=413, detail=f"At most {config.MAX_BATCH_PROFILES} profiles per batch")
     
-    return MatchResponse(
-        matches=matches,
-        total_funding=total_funding,
-        total_matches=len(matches),
-        profile_score=readiness.overall_score
+    # Stored profiles reuse their stored readiness; only transient ones are scored here
+    stored = [records[pid].readiness for pid in request.profile_ids]
+    todo = [p for p, r in zip(user_profiles, stored) if r is None] + request.profiles
+    computed = iter(await execution_backend.run_python(calculate_readiness_scores, todo) if todo else [])
+    readiness_scores = [r if r is not None else next(computed) for r in stored]
+    readiness_scores += list(computed)
+    
+    if wants_ndjson(http_request):
+        # One profile's results per line, matched and sent chunk by chunk
+        return ndjson_response(_stream_batch(user_profiles, readiness_scores, request, projection))
+    
+    all_matches = await execution_backend.run_numeric(
+        _match_profiles, user_profiles, top_k=request.top_k, strict_eligibility=request.strict_eligibility
     )
+    results = b",".join(
+        _match_response_json(matches, readiness, fields=projection, profile_id=p.id)
+        for p, matches, readiness in zip(user_profiles, all_matches, readiness_scores)
+    )
+    return FastJSONResponse(b'{"results":[' + results + b"]}")
+
+def _search_grants(**params) -> Tuple[GrantRepository, SearchResult]:
+    # One snapshot, so the text index rows and the repository positions agree
+    snapshot = catalog_state.ready_snapshot()
+    with timed("search"):
+        result = snapshot.repository.search_index.search(snapshot.matcher.text_index, **params)
+    return snapshot.repository, result
+
+# Declared before /grants/{grant_id} so "search" is not taken for an id
+@router.get("/grants/search", response_model=GrantSearchResponse)
+async def search_grants(
+    q: Optional[str] = None,
+    type: List[str] = Query([]),
+    focus_area: List[str] = Query([]),
+    tag: List[str] = Query([]),
+    difficulty: List[str] = Query([]),
+    equity_required: Optional[bool] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+    deadline_from: Optional[date] = None,
+    deadline_to: Optional[date] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    page_size: int = 20,
+    fields: Optional[str] = None
+):
+    projection = parse_fields(fields, GRANT_FIELDS, COMPACT_GRANT_FIELDS)
+    if sort is not None and sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort '{sort}', expected one of {SORTS}")
+    if not 1 <= page_size <= config.SEARCH_MAX_PAGE_SIZE or offset < 0:
+        raise HTTPException(
+            status_code=400, detail=f"page_size must be between 1 and {config.SEARCH_MAX_PAGE_SIZE}, offset >= 0"
+        )
+    # Repeated parameters are alternatives (type=government&type=foundation); facets combine with AND
+    filters = {"type": type, "focus_area": focus_area, "tag": tag, "difficulty": difficulty}
+    if equity_required is not None:
+        filters["equity_required"] = [str(equity_required).lower()]
+    repository, result = await execution_backend.run_numeric(
+        _search_grants, query=q, filters=filters, min_amount=min_amount, max_amount=max_amount,
+        deadline_from=deadline_from, deadline_to=deadline_to, sort=sort, offset=offset, limit=page_size
+    )
+    grants = [repository.grants.json_bytes(i) for i in result.positions.tolist()]
+    with timed("serialize"):
+        body = search_response_json(grants, projection, total=result.total, offset=offset, facets=result.facets)
+    return FastJSONResponse(body)
 
 @router.get("/grants/{grant_id}", response_model=Grant)
 async def get_grant_details(grant_id: str):
-    grants = get_grants()
-    for g in grants:
-        if g.id == grant_id:
-            return g
-    raise HTTPException(status_code=404, detail="Grant not found")
+    grant = get_repository().grant_json(grant_id)
+    if grant is None:
+        raise HTTPException(status_code=404, detail="Grant not found")
+    return FastJSONResponse(grant)
+
+def _grant_candidates(grant_id: str, top_k: int, strict_eligibility: bool) -> Optional[dict]:
+    return profile_index.candidates(get_matcher(), grant_id, top_k=top_k, strict_eligibility=strict_eligibility)
+
+@router.get("/grants/{grant_id}/candidates", response_model=CandidatesResponse)
+async def get_grant_candidates(grant_id: str, top_k: int = 25, strict_eligibility: bool = False):
+    """Stored profiles that fit a grant, ranked with the same scores /match gives them"""
+    result = await execution_backend.run_numeric(_grant_candidates, grant_id, top_k, strict_eligibility)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Grant not found")
+    return FastJSONResponse(result)
 
 @router.post("/grants/{grant_id}/analyze", response_model=ApplicationTips)
 async def analyze_grant(grant_id: str, profile_id: str):
-    if profile_id not in profiles_db:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    record = await _get_record(profile_id)
+    profile = record.profile
     
-    profile = profiles_db[profile_id]
-    
-    grants = get_grants()
-    grant = next((g for g in grants if g.id == grant_id), None)
+    grant = get_repository().get(grant_id)
     
     if not grant:
         raise HTTPException(status_code=404, detail="Grant not found")
     
-    # Re-calculate match score to be accurate
-    matcher = get_matcher()
-    matches = matcher.match(profile)
-    match_result = next((m for m in matches if m.grant.id == grant_id), None)
-    match_score = match_result.match_score if match_result else 50
+    # Exact score for this grant: read from a cached score vector, or scored on its own
+    match_score = await execution_backend.run_numeric(_grant_match_score, profile, grant_id, record)
+    if match_score is None:
+        # Retired since the lookup above
+        raise HTTPException(status_code=404, detail="Grant not found")
     
-    return generate_application_tips(profile, grant, match_score)
+    return await execution_backend.run_python(generate_application_tips, profile, grant, match_score)
 
 @router.get("/timeline")
-async def get_timeline_grants():
-    grants = get_grants()
-    # Sort by deadline
-    sorted_grants = sorted(grants, key=lambda x: x.deadline)
-    return sorted_grants
+async def get_timeline_grants(
+    request: Request,
+    type: Optional[str] = None,
+    focus_area: Optional[str] = None,
+    tag: Optional[str] = None,
+    location: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    projection = parse_fields(fields, GRANT_FIELDS, COMPACT_GRANT_FIELDS)
+    repository = get_repository()
+    # Deadline order is precomputed at load; filters narrow it via the secondary indexes
+    if not (type or focus_area or tag or location):
+        order = repository.deadline_order()
+    else:
+        positions = repository.positions_for(type=type, focus_area=focus_area, tag=tag, location=location)
+        order = repository.deadline_order(positions)
+    # Stored JSON straight from the catalog, no Grant models built
+    grants = (repository.grants.json_bytes(i) for i in order)
+    
+    if wants_ndjson(request):
+        # Grants are serialized one line at a time as the client reads
+        return ndjson_response(project_grant(g, projection) for g in grants)
+    return FastJSONResponse(grants_json(grants, projection))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Fail closed: without a configured token the admin endpoints are disabled
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (GRANTMATCH_ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.post("/admin/grants", response_model=IngestResult, status_code=201, dependencies=[Depends(require_admin)])
+async def add_grant(grant: Grant):
+    try:
+        return await execution_backend.run_numeric(ingestion_service.add, grant)
+    except GrantExistsError:
+        raise HTTPException(status_code=409, detail="Grant already exists")
+
+@router.put("/admin/grants/{grant_id}", response_model=IngestResult, dependencies=[Depends(require_admin)])
+async def update_grant(grant_id: str, grant: Grant):
+    if grant.id != grant_id:
+        raise HTTPException(status_code=400, detail="Grant id does not match the URL")
+    try:
+        return await execution_backend.run_numeric(ingestion_service.update, grant)
+    except GrantNotFoundError:
+        raise HTTPException(status_code=404, detail="Grant not found")
+
+@router.delete("/admin/grants/{grant_id}", response_model=IngestResult, dependencies=[Depends(require_admin)])
+async def retire_grant(grant_id: str):
+    try:
+        return await execution_backend.run_numeric(ingestion_service.retire, grant_id)
+    except GrantNotFoundError:
+        raise HTTPException(status_code=404, detail="Grant not found")
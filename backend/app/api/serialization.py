@@ -0,0 +1,145 @@
+"""
+Response shaping - fast JSON encoding, NDJSON streaming and field projection
+
+Hot endpoints encode their responses here instead of going through
+response_model validation and the default JSON encoder. Grants are encoded
+once at catalog load (kept in the compact catalog, see CompactCatalog.json_bytes)
+and spliced into responses as bytes; everything else is encoded with orjson.
+
+Clients that send ``Accept: application/x-ndjson`` get one JSON document per
+line, serialized lazily from a generator so the first line goes out before
+the last result is encoded. ``fields=`` narrows each result to the named
+fields (``fields=compact`` sends grant ids plus scores instead of embedded
+Grant objects).
+"""
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from app.models.grant import Grant, MatchResult
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# fields=compact presets
+COMPACT_MATCH_FIELDS = (
+    "grant_id", "match_score", "eligibility_status",
+    "semantic_score", "domain_score", "eligibility_score", "strategic_score"
+)
+COMPACT_GRANT_FIELDS = ("id", "name", "type", "amount", "currency", "deadline")
+
+# grant_id is a shortcut for grant.id on match results
+MATCH_FIELDS = frozenset(MatchResult.model_fields) | {"grant_id"}
+GRANT_FIELDS = frozenset(Grant.model_fields)
+
+# MatchResult fields after the embedded grant, in model order
+_MATCH_SCALARS = tuple(name for name in MatchResult.model_fields if name != "grant")
+
+Fields = Optional[Tuple[str, ...]]
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded with orjson; bytes content is taken as already-encoded JSON"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def parse_fields(fields: Optional[str], allowed: frozenset, compact: Tuple[str, ...]) -> Fields:
+    """Requested field names (None for full objects); 400 on unknown names"""
+    if not fields:
+        return None
+    if fields == "compact":
+        return compact
+    names = tuple(name.strip() for name in fields.split(",") if name.strip())
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}; allowed: {sorted(allowed)}")
+    return names
+
+
+def project_match(match: MatchResult, fields: Fields) -> Union[MatchResult, Dict]:
+    if fields is None:
+        return match
+    data = match.model_dump(mode="json", include=set(fields) - {"grant_id"})
+    if "grant_id" in fields:
+        data["grant_id"] = match.grant.id
+    return {name: data[name] for name in fields}
+
+
+def project_matches(matches: Sequence[MatchResult], fields: Fields) -> list:
+    return [project_match(m, fields) for m in matches]
+
+
+def project_grant(grant: Union[Grant, bytes], fields: Fields) -> Union[Grant, bytes, Dict]:
+    """The requested fields of a grant (a model or its stored JSON); all of it if fields is None"""
+    if fields is None:
+        return grant
+    if isinstance(grant, bytes):
+        data = orjson.loads(grant)
+    else:
+        data = grant.model_dump(mode="json", include=set(fields))
+    return {name: data[name] for name in fields}
+
+
+def match_json(match: MatchResult) -> bytes:
+    """A MatchResult as JSON, splicing in the grant's pre-encoded bytes"""
+    rest = orjson.dumps({name: getattr(match, name) for name in _MATCH_SCALARS})
+    return b'{"grant":' + match.grant.json_bytes() + b"," + rest[1:]
+
+
+def match_response_json(matches: List[MatchResult], fields: Fields = None, **summary: Any) -> bytes:
+    """A MatchResponse-shaped object: the matches (full or projected) followed by the summary fields"""
+    if fields is None:
+        body = b",".join(match_json(m) for m in matches)
+    else:
+        body = b",".join(orjson.dumps(project_match(m, fields)) for m in matches)
+    return b'{"matches":[' + body + b"]," + orjson.dumps(summary)[1:]
+
+
+def grants_json(grants: Iterable[Union[Grant, bytes]], fields: Fields = None) -> bytes:
+    if fields is None:
+        return b"[" + b",".join(encode(g) for g in grants) + b"]"
+    return orjson.dumps([project_grant(g, fields) for g in grants])
+
+
+def search_response_json(grants: Iterable[Union[Grant, bytes]], fields: Fields = None, **summary: Any) -> bytes:
+    """A GrantSearchResponse-shaped object: the page of grants followed by the summary fields"""
+    return b'{"results":' + grants_json(grants, fields) + b"," + orjson.dumps(summary)[1:]
+
+
+def encode(item: Union[BaseModel, Dict, bytes]) -> bytes:
+    if isinstance(item, bytes):
+        return item
+    if isinstance(item, Grant):
+        return item.json_bytes()
+    if isinstance(item, MatchResult):
+        return match_json(item)
+    if isinstance(item, BaseModel):
+        return item.model_dump_json().encode()
+    return orjson.dumps(item)
+
+
+def ndjson_lines(items: Iterable[Union[BaseModel, Dict, bytes]]) -> Iterator[bytes]:
+    for item in items:
+        yield encode(item) + b"\n"
+
+
+def ndjson_response(
+    items: Union[Iterable, AsyncIterator[bytes]], headers: Optional[Dict[str, str]] = None
+) -> StreamingResponse:
+    """Stream items (models, dicts or encoded JSON; or an async iterator of ready lines) as NDJSON"""
+    body = items if hasattr(items, "__aiter__") else ndjson_lines(items)
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def match_summary_headers(summary: Dict[str, int]) -> Dict[str, str]:
+    """Totals that would wrap the matches in a JSON response, as headers of an NDJSON stream"""
+    return {f"X-{name.replace('_', '-').title()}": str(value) for name, value in summary.items()}
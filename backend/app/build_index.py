@@ -0,0 +1,48 @@
+"""
+Offline TF-IDF index build
+
+Run after changing data/grants.json (e.g. as a deploy step) so workers start by
+memory-mapping the prebuilt index instead of refitting:
+
+    python -m app.build_index [--force]
+"""
+import argparse
+import json
+import time
+from app import config
+from app.models.grant import Grant
+from app.services import index_store
+from app.services.embeddings import EmbeddingsService, _new_vectorizer
+from app.services.matcher import grant_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the persistent TF-IDF grant index")
+    parser.add_argument("--grants", default=config.GRANTS_FILE, help="catalog JSON file")
+    parser.add_argument("--index-dir", default=config.INDEX_DIR, help="output directory")
+    parser.add_argument("--force", action="store_true", help="rebuild even if an index exists")
+    args = parser.parse_args()
+
+    with open(args.grants, "rb") as f:
+        catalog_bytes = f.read()
+    texts = [grant_text(Grant(**g)) for g in json.loads(catalog_bytes)]
+    key = index_store.catalog_key(catalog_bytes, _new_vectorizer())
+
+    start = time.perf_counter()
+    service = EmbeddingsService()
+    if args.force:
+        index_store.prune_indexes(args.index_dir, keep=None)
+        index = service.fit(texts)
+        index_store.save_index(args.index_dir, key, index.vectorizer, index.matrix)
+        loaded = False
+    else:
+        loaded = service.load_or_fit(texts, catalog_bytes, args.index_dir)
+    index_store.prune_indexes(args.index_dir, keep=key)
+
+    status = "up to date" if loaded else "built"
+    print(f"Index {key} {status}: {len(texts)} grants, "
+          f"{len(service.index.vectorizer.vocabulary_)} terms, {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Runtime configuration - read once from environment variables
+"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Grant catalog source file
+GRANTS_FILE = os.getenv("GRANTMATCH_GRANTS_FILE", os.path.join(BASE_DIR, "data", "grants.json"))
+
+# Grants added, updated or retired at runtime are logged here, never in GRANTS_FILE
+# (empty string keeps them in memory only)
+INGEST_DIR = os.getenv("GRANTMATCH_INGEST_DIR", os.path.join(BASE_DIR, "data", "ingested"))
+
+# Directory holding prebuilt TF-IDF indexes (empty string disables persistence)
+INDEX_DIR = os.getenv("GRANTMATCH_INDEX_DIR", os.path.join(BASE_DIR, "data", "index"))
+
+# Grant models kept materialized (LRU) next to the compact catalog columns
+GRANT_CACHE_SIZE = int(os.getenv("GRANTMATCH_GRANT_CACHE_SIZE", "4096"))
+
+# Largest number of profiles accepted by one /match/batch call
+MAX_BATCH_PROFILES = int(os.getenv("GRANTMATCH_MAX_BATCH_PROFILES", "1000"))
+
+# Where CPU-bound request work runs: "thread", "process" (pure-Python parts in a
+# process pool, NumPy parts in threads) or "inline" (on the event loop, for debugging)
+EXECUTOR_MODE = os.getenv("GRANTMATCH_EXECUTOR", "thread")
+EXECUTOR_THREADS = int(os.getenv("GRANTMATCH_EXECUTOR_THREADS", "0")) or None
+EXECUTOR_PROCESSES = int(os.getenv("GRANTMATCH_EXECUTOR_PROCESSES", "0")) or None
+
+# Worker processes forked by "python -m app.server" after the catalog is loaded once (0 = CPU count)
+WORKERS = int(os.getenv("GRANTMATCH_WORKERS", "1"))
+# Catalog warm-up when the app starts: "background" (readiness probe reports ready once done),
+# "blocking" (startup waits for it) or "off" (first request loads the catalog)
+WARMUP = os.getenv("GRANTMATCH_WARMUP", "background")
+
+# Calls queued or running before new requests are rejected with 429
+EXECUTOR_MAX_PENDING = int(os.getenv("GRANTMATCH_EXECUTOR_MAX_PENDING", "64"))
+
+# Micro-batching of concurrent /match calls: a batch is scored once MATCH_BATCH_MAX_SIZE calls are
+# queued or MATCH_BATCH_MAX_WAIT_MS after its first call (a max size of 1 turns batching off)
+MATCH_BATCH_MAX_WAIT_MS = float(os.getenv("GRANTMATCH_MATCH_BATCH_MAX_WAIT_MS", "2"))
+MATCH_BATCH_MAX_SIZE = int(os.getenv("GRANTMATCH_MATCH_BATCH_MAX_SIZE", "32"))
+
+# Hashed columns for terms outside the fitted vocabulary in grants added at runtime
+HASH_BUCKETS = int(os.getenv("GRANTMATCH_HASH_BUCKETS", "4096"))
+
+# Vocabulary drift (0-1) from runtime-added grants that triggers a background re-fit
+REFIT_DRIFT_THRESHOLD = float(os.getenv("GRANTMATCH_REFIT_DRIFT_THRESHOLD", "0.05"))
+
+# Shared secret for /api/admin endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv("GRANTMATCH_ADMIN_TOKEN", "")
+
+# Cache of whole-catalog match score vectors per profile fingerprint
+MATCH_CACHE_MAX_BYTES = int(os.getenv("GRANTMATCH_MATCH_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+MATCH_CACHE_TTL_SECONDS = float(os.getenv("GRANTMATCH_MATCH_CACHE_TTL_SECONDS", "600"))
+
+# Paged /match: results ranked per profile, the largest page, and how long rankings stay
+# pageable by cursor (an LRU bounded in bytes)
+MATCH_PAGE_MAX_RESULTS = int(os.getenv("GRANTMATCH_MATCH_PAGE_MAX_RESULTS", "1000"))
+MATCH_PAGE_MAX_SIZE = int(os.getenv("GRANTMATCH_MATCH_PAGE_MAX_SIZE", "100"))
+MATCH_CURSOR_MAX_BYTES = int(os.getenv("GRANTMATCH_MATCH_CURSOR_MAX_BYTES", str(64 * 1024 * 1024)))
+MATCH_CURSOR_TTL_SECONDS = float(os.getenv("GRANTMATCH_MATCH_CURSOR_TTL_SECONDS", "600"))
+
+# /grants/search: largest page, and text hits per query (0 = every grant sharing a query term;
+# the dense backend returns the nearest ones its ANN index finds)
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("GRANTMATCH_SEARCH_MAX_PAGE_SIZE", "100"))
+SEARCH_TEXT_HITS = int(os.getenv("GRANTMATCH_SEARCH_TEXT_HITS", "0"))
+
+# Profile storage: "sqlite" (durable, shared by all workers) or "memory" (process-local)
+PROFILE_STORE = os.getenv("GRANTMATCH_PROFILE_STORE", "sqlite")
+PROFILE_DB_PATH = os.getenv("GRANTMATCH_PROFILE_DB", os.path.join(BASE_DIR, "data", "profiles.db"))
+# Hot read-through cache in front of the database; entries expire so other workers' writes show up
+PROFILE_CACHE_SIZE = int(os.getenv("GRANTMATCH_PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("GRANTMATCH_PROFILE_CACHE_TTL_SECONDS", "30"))
+# Write-behind: profile writes are flushed in batches after this delay or batch size
+PROFILE_FLUSH_INTERVAL_SECONDS = float(os.getenv("GRANTMATCH_PROFILE_FLUSH_INTERVAL_SECONDS", "0.05"))
+PROFILE_FLUSH_BATCH = int(os.getenv("GRANTMATCH_PROFILE_FLUSH_BATCH", "256"))
+# Reverse matching: how often the profile index picks up profiles written by other workers
+PROFILE_INDEX_SYNC_SECONDS = float(os.getenv("GRANTMATCH_PROFILE_INDEX_SYNC_SECONDS", "5"))
+
+# Semantic similarity backend: "tfidf" (default) or "dense" (local embedding model + ANN index)
+EMBEDDING_BACKEND = os.getenv("GRANTMATCH_EMBEDDING_BACKEND", "tfidf")
+# Local sentence-transformers model directory for the dense backend (never downloaded)
+EMBEDDING_MODEL_PATH = os.getenv("GRANTMATCH_EMBEDDING_MODEL_PATH", os.path.join(BASE_DIR, "data", "models", "embedding"))
+# Stored grant vector precision for the dense backend: "float32" or "int8"
+EMBEDDING_QUANTIZATION = os.getenv("GRANTMATCH_EMBEDDING_QUANTIZATION", "float32")
+# IVF lists (0 = about sqrt(catalog size)) and lists scanned per query (higher = better recall, slower)
+ANN_NLIST = int(os.getenv("GRANTMATCH_ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("GRANTMATCH_ANN_NPROBE", "8"))
+
+# Hybrid retrieval: catalogs of at least HYBRID_MIN_GRANTS active grants are matched by scoring
+# only candidates (lexical top-N plus eligible domain hits, MATCH_CANDIDATES each); 0 disables it
+MATCH_CANDIDATES = int(os.getenv("GRANTMATCH_MATCH_CANDIDATES", "500"))
+HYBRID_MIN_GRANTS = int(os.getenv("GRANTMATCH_HYBRID_MIN_GRANTS", "5000"))
+
+# Server-Timing response header with per-stage durations: "request" (only for requests
+# sending "X-Server-Timing: 1"), "always" or "off"
+SERVER_TIMING = os.getenv("GRANTMATCH_SERVER_TIMING", "request")
@@ -1,11 +1,127 @@
-from fastapi import FastAPI
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app import config
+from app.api.routes import match_batcher, router
+from app.services.catalog import catalog_state
+from app.services.executor import execution_backend, ExecutorOverloadedError
+from app.services.match_cache import match_cache
+from app.services.match_cursors import match_cursors
+from app.services.metrics import REQUEST_METRIC, registry, server_timing_header, start_request_timing
+from app.services.profile_index import profile_index
+from app.services.profile_store import close_profile_store, profile_store_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers forked by app.server start warm; otherwise build the catalog now, not on the first request
+    if not catalog_state.warmed:
+        if config.WARMUP == "blocking":
+            catalog_state.warm_up()
+        elif config.WARMUP == "background":
+            threading.Thread(target=catalog_state.warm_up, name="grantmatch-warmup", daemon=True).start()
+    yield
+    execution_backend.shutdown()
+    # Flush write-behind profile writes before the process exits
+    close_profile_store()
+
 
 app = FastAPI(
     title="GrantMatch AI API",
     description="AI-powered grant matching and readiness assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Shed load instead of queueing without bound when the executor is saturated
+@app.exception_handler(ExecutorOverloadedError)
+async def overloaded_handler(request: Request, exc: ExecutorOverloadedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+
+def _route_label(scope) -> str:
+    """METHOD and path template of the matched route as requested: root path, router prefix, route path"""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return f"{scope['method']} unmatched"
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(path):
+        # An included router's routes carry their path without its prefix (/api): the prefix
+        # is whatever precedes the segment the route's pattern matched from
+        for boundary in re.finditer("/", path):
+            if regex.match(path[boundary.start():]):
+                template = path[:boundary.start()] + template
+                break
+    return f"{scope['method']} {root_path}{template}"
+
+
+class TimingMiddleware:
+    """
+    Records request latency per route and adds the opt-in Server-Timing header.
+
+    Plain ASGI (no BaseHTTPMiddleware) so it adds next to nothing per request
+    and never buffers streamed responses. For streams the header covers the
+    work done before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        timings = None
+        if config.SERVER_TIMING == "always" or (
+            config.SERVER_TIMING == "request" and (b"x-server-timing", b"1") in scope["headers"]
+        ):
+            timings = start_request_timing()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings is not None:
+                header = server_timing_header(timings, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            registry.histogram(REQUEST_METRIC, "route", _route_label(scope)).observe(time.perf_counter() - start)
+
+
+def _catalog_gauges():
+    snapshot = catalog_state.peek()  # a scrape never triggers the catalog load
+    if snapshot is None:
+        return {"grants": 0, "version": 0, "warmed": 0}
+    gauges = {"grants": len(snapshot.repository), "version": snapshot.version, "warmed": int(catalog_state.warmed)}
+    if snapshot.matcher is not None:
+        gauges["index_build_seconds"] = snapshot.matcher.build_seconds
+        gauges["candidate_pool"] = snapshot.matcher.candidate_pool
+    return gauges
+
+
+registry.register_gauges("grantmatch_catalog", "Loaded grant catalog", _catalog_gauges)
+registry.register_gauges("grantmatch_match_cache", "Match score cache", match_cache.stats)
+registry.register_gauges("grantmatch_match_cursors", "Paged match rankings", match_cursors.stats)
+registry.register_gauges("grantmatch_profile_store", "Profile store", profile_store_stats)
+registry.register_gauges("grantmatch_match_batcher", "Micro-batching of /match calls", match_batcher.stats)
+registry.register_gauges("grantmatch_profile_index", "Reverse matching profile index", profile_index.stats)
+registry.register_gauges(
+    "grantmatch_executor", "Execution backend",
+    lambda: {"pending": execution_backend.pending, "rejected": execution_backend.rejected}
 )
 
 # Configure CORS
@@ -17,9 +133,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(TimingMiddleware)
+
 # Register routes
 app.include_router(router, prefix="/api")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition: stage and request latency histograms plus gauges"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the catalog and its indexes are built (see CatalogState.warm_up)"""
+    if not catalog_state.warmed and config.WARMUP != "off":
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    snapshot = catalog_state.peek()  # None only with warm-up off, until the first request loads it
+    return {
+        "status": "ready",
+        "grants": len(snapshot.repository) if snapshot else 0,
+        "version": snapshot.version if snapshot else 0
+    }
+
 @app.get("/")
 async def root():
     return {"message": "GrantMatch AI API is running"}
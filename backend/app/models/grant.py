@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional
+import orjson
+from pydantic import BaseModel, PrivateAttr
+from typing import Dict, List, Optional
+from app.models.user import UserProfile
 
 
 class Eligibility(BaseModel):
@@ -35,6 +37,15 @@ class Grant(BaseModel):
     tags: List[str] = []
     website: str = ""
     contact_email: Optional[str] = None
+    
+    # Cached JSON encoding (grants are never mutated once loaded)
+    _json_bytes: Optional[bytes] = PrivateAttr(default=None)
+    
+    def json_bytes(self) -> bytes:
+        """This grant as JSON, encoded on first use and spliced into every later response"""
+        if self._json_bytes is None:
+            self._json_bytes = orjson.dumps(self.model_dump(mode="json"))
+        return self._json_bytes
 
 
 class MatchResult(BaseModel):
@@ -54,6 +65,57 @@ class MatchResponse(BaseModel):
     total_funding: int
     total_matches: int
     profile_score: int
+    # Paged requests only (page_size or cursor): cursor of the next page (None on the last) and
+    # the number of results ranked across all pages
+    next_cursor: Optional[str] = None
+    total_results: Optional[int] = None
+
+
+class BatchMatchRequest(BaseModel):
+    profile_ids: List[str] = []
+    profiles: List[UserProfile] = []
+    top_k: int = 25
+    strict_eligibility: bool = False  # only score grants passing the eligibility pre-filter
+
+
+class BatchMatchItem(MatchResponse):
+    profile_id: Optional[str] = None
+
+
+class BatchMatchResponse(BaseModel):
+    results: List[BatchMatchItem]  # one per profile: profile_ids first, then inline profiles
+
+
+class CandidateResult(BaseModel):
+    """A stored profile ranked for a grant (the scores match() gives the grant for that profile)"""
+    profile_id: str
+    match_score: int  # 0-100
+    eligibility_status: str  # eligible, needs_action, not_eligible
+    semantic_score: float
+    domain_score: float
+    eligibility_score: float
+    strategic_score: float
+
+
+class CandidatesResponse(BaseModel):
+    grant_id: str
+    candidates: List[CandidateResult]
+    total_profiles: int  # profiles ranked (near-eligible ones only with strict_eligibility)
+
+
+class GrantSearchResponse(BaseModel):
+    results: List[Grant]  # this page
+    total: int  # grants matching the query and filters, across all pages
+    offset: int
+    # facet -> value -> matching grants, each facet counted without its own filter
+    facets: Dict[str, Dict[str, int]]
+
+
+class IngestResult(BaseModel):
+    grant_id: str
+    catalog_version: int
+    vocabulary_drift: float  # 0-1, share of catalog text outside the fitted vocabulary
+    refit_scheduled: bool
 
 
 class ApplicationTips(BaseModel):
@@ -0,0 +1,55 @@
+"""
+Bulk profile load and export (one JSON record per line)
+
+Records carry the profile plus its stored readiness score and TF-IDF vector:
+
+    python -m app.profiles_io export profiles.ndjson
+    python -m app.profiles_io load profiles.ndjson
+
+`report` writes every stored profile's readiness scores as CSV (scored column-wise):
+
+    python -m app.profiles_io report readiness.csv
+"""
+import argparse
+import csv
+import sys
+import time
+from app.services.profile_store import close_profile_store, get_profile_store, record_from_json, record_to_json
+from app.services.readiness import readiness_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load or export stored profiles")
+    parser.add_argument("action", choices=["load", "export", "report"])
+    parser.add_argument("path", help="NDJSON file ('-' for stdin/stdout)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    profile_store = get_profile_store()
+    if args.action == "export":
+        out = sys.stdout if args.path == "-" else open(args.path, "w")
+        count = 0
+        with out:
+            for record in profile_store.export():
+                out.write(record_to_json(record) + "\n")
+                count += 1
+    elif args.action == "report":
+        profiles = [record.profile for record in profile_store.export()]
+        columns = readiness_columns(profiles)
+        out = sys.stdout if args.path == "-" else open(args.path, "w", newline="")
+        with out:
+            writer = csv.writer(out)
+            writer.writerow(["profile_id", *columns])
+            for i, profile in enumerate(profiles):
+                writer.writerow([profile.id, *(int(column[i]) for column in columns.values())])
+        count = len(profiles)
+    else:
+        source = sys.stdin if args.path == "-" else open(args.path)
+        with source:
+            count = profile_store.load(record_from_json(line) for line in source if line.strip())
+    close_profile_store()
+    print(f"{args.action}: {count} profiles, {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Preload-and-fork server
+
+Loads the grant catalog and builds the matcher and search indexes once, in a
+master process, then forks the workers, which share those pages copy-on-write
+instead of each importing, parsing and fitting on its own:
+
+    python -m app.server [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+The garbage collector is off while the catalog loads and frozen before the
+fork, so collections in the workers never write to (and copy) the pages of
+the preloaded objects. The port is bound only after warm-up and shared by all
+workers, so every worker answers the readiness probe as ready from the start.
+The master restarts workers that exit and forwards SIGINT / SIGTERM to them.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+import uvicorn
+from app import config
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _serve(server_config: uvicorn.Config, sock: socket.socket):
+    # Objects created from here on are the worker's own; the frozen ones are never scanned
+    gc.enable()
+    uvicorn.Server(server_config).run(sockets=[sock])
+
+
+def _fork_worker(server_config: uvicorn.Config, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    code = 0
+    try:
+        _serve(server_config, sock)
+    except BaseException:
+        logger.exception("Worker %d failed", os.getpid())
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def _supervise(server_config: uvicorn.Config, sock: socket.socket, workers: int):
+    children: Dict[int, float] = {}  # pid -> start time
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        children[_fork_worker(server_config, sock)] = time.monotonic()
+    logger.info("Started %d workers: %s", workers, ", ".join(map(str, children)))
+
+    while children:
+        pid, status = os.wait()
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d, restarting it", pid, os.waitstatus_to_exitcode(status))
+        # A worker that dies right away would otherwise be restarted in a tight loop
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        if not stopping:
+            children[_fork_worker(server_config, sock)] = time.monotonic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from workers forked after the catalog is loaded")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=config.WORKERS, help="worker processes (0 = CPU count)"
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    # No collections while the long-lived objects are built, so they are packed without freed holes
+    gc.disable()
+    from app.main import app
+    from app.services.catalog import catalog_state
+
+    server_config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    start = time.perf_counter()
+    snapshot = catalog_state.warm_up()
+    logger.info("Catalog of %d grants ready in %.2fs", len(snapshot.repository), time.perf_counter() - start)
+    gc.collect()
+    gc.freeze()
+
+    sock = server_config.bind_socket()
+    if workers == 1 or not hasattr(os, "fork"):
+        _serve(server_config, sock)
+    else:
+        _supervise(server_config, sock, workers)
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
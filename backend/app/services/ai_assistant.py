@@ -4,8 +4,10 @@ AI Application Assistant - generates tailored tips for grant applications
 from typing import List
 from app.models.user import UserProfile
 from app.models.grant import Grant, ApplicationTips
+from app.services.metrics import timed
 
 
+@timed("application_tips")
 def generate_application_tips(profile: UserProfile, grant: Grant, match_score: int) -> ApplicationTips:
     """
     Generate personalized application tips for a specific grant match
@@ -64,8 +66,9 @@ def generate_application_tips(profile: UserProfile, grant: Grant, match_score: i
         )
     
     # Impact statement
+    focus = f"{grant.focus_areas[0].lower()} " if grant.focus_areas else ""
     talking_points.append(
-        f"Expected impact aligns with {grant.organization}'s mission of supporting {grant.focus_areas[0].lower()} innovation"
+        f"Expected impact aligns with {grant.organization}'s mission of supporting {focus}innovation"
     )
     
     # Concerns and areas to address
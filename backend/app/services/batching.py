@@ -0,0 +1,167 @@
+"""
+Micro-batching - collects concurrent calls for a few milliseconds and runs them as one
+
+Requests that arrive together (e.g. single-profile /match calls at peak) are
+queued until max_wait has passed since the first of them or max_size are
+waiting (while no batch is running, only until the current loop iteration
+ends, so light traffic pays no wait), then run_batch gets all their items in one call on the execution
+backend, so per-call work such as the TF-IDF transform and the similarity
+product is done once per batch. Each caller gets its own entry of the
+returned list. If the batch raises, its items are run again one at a time, so
+only the callers whose own item fails get an exception.
+
+Calls with the same key while an identical one is queued or running are
+coalesced (single-flight): they wait for and share the first call's result.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+from app.services.metrics import registry
+
+Item = TypeVar("Item")
+
+
+class _Call:
+    __slots__ = ("key", "item", "future", "dispatched_at", "finished_at")
+
+    def __init__(self, key: Hashable, item: Any, future: asyncio.Future):
+        self.key = key
+        self.item = item
+        self.future = future
+        self.dispatched_at = 0.0
+        self.finished_at = 0.0
+
+
+class MicroBatcher(Generic[Item]):
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Item]], List[Any]],
+        runner: Callable[..., Awaitable[Any]],
+        key: Callable[[Item], Hashable],
+        max_wait: float = 0.002,
+        max_size: int = 32
+    ):
+        """
+        run_batch(items) must return one result per item, in order; it is called as
+        runner(run_batch, items) (e.g. execution_backend.run_numeric). max_wait is in seconds.
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.runner = runner
+        self.key = key
+        self.max_wait = max_wait
+        self.max_size = max(max_size, 1)
+        self._queue: List[_Call] = []
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.split = 0
+
+    async def submit(self, item: Item) -> Any:
+        """Result of run_batch for item, computed in the next batch (or by an identical in-flight call)"""
+        submitted = time.perf_counter()
+        key = self.key(item)
+        call = self._inflight.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            call = _Call(key, item, loop.create_future())
+            self._inflight[key] = call
+            self._queue.append(call)
+            self.calls += 1
+            if len(self._queue) >= self.max_size:
+                self._dispatch()
+            elif self._timer is None:
+                # An idle batcher only gathers the calls of this loop iteration, so a lone call is not delayed
+                delay = self.max_wait if self._tasks else 0
+                self._timer = loop.call_later(delay, self._dispatch)
+        # Shielded: a caller that goes away must not cancel the result others are waiting for
+        result = await asyncio.shield(call.future)
+        # Per-caller view of the shared batch: time queued, then time in the batch it joined
+        started = max(call.dispatched_at, submitted)
+        registry.observe_stage(f"{self.name}.queue", started - submitted)
+        registry.observe_stage(f"{self.name}.batch", call.finished_at - started)
+        return result
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+        # A fresh context: the batch's own stages belong to no single request's Server-Timing
+        task = asyncio.get_running_loop().create_task(self._run(batch), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Call]):
+        self.batches += 1
+        start = time.perf_counter()
+        for call in batch:
+            call.dispatched_at = start
+        try:
+            results = await self.runner(self.run_batch, [call.item for call in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                self._fail(batch[0], exc)
+                return
+            # One bad item must not fail the rest: run each alone (one executor slot at a time)
+            self.split += 1
+            try:
+                for call in batch:
+                    await self._run_one(call)
+            except BaseException:
+                self._cancel(batch)
+                raise
+        except BaseException:
+            self._cancel(batch)
+            raise
+        else:
+            for call, result in zip(batch, results):
+                self._succeed(call, result)
+
+    async def _run_one(self, call: _Call):
+        try:
+            [result] = await self.runner(self.run_batch, [call.item])
+        except Exception as exc:
+            self._fail(call, exc)
+        else:
+            self._succeed(call, result)
+
+    def _succeed(self, call: _Call, result: Any):
+        self._finish(call)
+        if not call.future.done():
+            call.future.set_result(result)
+
+    def _fail(self, call: _Call, exc: Exception):
+        self._finish(call)
+        if not call.future.done():
+            call.future.set_exception(exc)
+
+    def _cancel(self, batch: List[_Call]):
+        for call in batch:
+            if not call.future.done():
+                self._finish(call)
+                call.future.cancel()
+
+    def _finish(self, call: _Call):
+        call.finished_at = time.perf_counter()
+        if self._inflight.get(call.key) is call:
+            del self._inflight[call.key]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "split_batches": self.split,
+            "mean_batch_size": self.calls / self.batches if self.batches else 0.0,
+            "queued": len(self._queue),
+        }
@@ -0,0 +1,60 @@
+"""
+Packed bitsets over catalog positions
+
+A bitset is a little-endian packed uint8 NumPy array (bit i = position i), so
+set algebra is plain ``&``, ``|`` and ``~`` on the arrays. Bits past ``size`` in
+the last byte are kept at zero by every helper here; callers that use ``~``
+should mask the result with ``full(size)``.
+"""
+from typing import Iterable
+import numpy as np
+
+# Set bits per byte: np.bitwise_count on NumPy >= 2.0, else a lookup table
+_BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_popcount = getattr(np, "bitwise_count", None) or _BYTE_COUNTS.__getitem__
+
+
+def empty(size: int) -> np.ndarray:
+    return np.zeros((size + 7) // 8, dtype=np.uint8)
+
+
+def full(size: int) -> np.ndarray:
+    return from_mask(np.ones(size, dtype=bool))
+
+
+def from_mask(mask: np.ndarray) -> np.ndarray:
+    return np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+
+
+def from_positions(positions: Iterable[int], size: int) -> np.ndarray:
+    mask = np.zeros(size, dtype=bool)
+    mask[positions if isinstance(positions, np.ndarray) else np.fromiter(positions, dtype=np.int64)] = True
+    return from_mask(mask)
+
+
+def to_mask(bits: np.ndarray, size: int) -> np.ndarray:
+    return np.unpackbits(bits, count=size, bitorder="little").astype(bool)
+
+
+def to_positions(bits: np.ndarray, size: int) -> np.ndarray:
+    return np.flatnonzero(np.unpackbits(bits, count=size, bitorder="little"))
+
+
+def count(bits: np.ndarray) -> int:
+    return int(_popcount(bits).sum(dtype=np.int64))
+
+
+def concat(first: np.ndarray, first_size: int, second: np.ndarray, second_size: int) -> np.ndarray:
+    """Bitset over first_size + second_size positions: first's bits, then second's"""
+    return from_mask(np.concatenate([to_mask(first, first_size), to_mask(second, second_size)]))
+
+
+def contains(bits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Boolean array: is each of the given positions set (cost proportional to len(positions))"""
+    positions = np.asarray(positions, dtype=np.int64)
+    return ((bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+def count_rows(matrix: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """Set bits of matrix[i] & bits for each row of a stacked (values x bytes) bitset matrix"""
+    return _popcount(matrix & bits).sum(axis=1, dtype=np.int64)
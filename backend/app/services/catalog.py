@@ -0,0 +1,135 @@
+"""
+Catalog state - the loaded grant catalog and the indexes built from it
+
+A CatalogSnapshot pairs a GrantRepository with the MatcherService built from the
+same grants (same positions). Snapshots are immutable; changes build a new one
+and swap it in with a single reference assignment, so a request that grabbed a
+snapshot never sees a half-updated index.
+"""
+import json
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app import config
+from app.models.grant import Grant
+from app.services.compact_catalog import CompactCatalog
+from app.services.embeddings import embeddings_service
+from app.services.grant_changes import grant_change_log
+from app.services.grant_repository import GrantRepository
+from app.services.matcher import MatcherService
+from app.services.metrics import timed
+
+
+class CatalogSnapshot(NamedTuple):
+    repository: GrantRepository
+    matcher: Optional[MatcherService]  # built lazily on first match
+    version: int
+
+
+class _BaseCatalog(NamedTuple):
+    """The catalog file a snapshot was loaded from and the logged changes replayed over it"""
+    grants: CompactCatalog
+    catalog_bytes: bytes
+    added: List[Grant]
+    retired: List[int]
+
+
+def _replay(repository: GrantRepository, changes: Dict[str, Optional[dict]]) -> Tuple[List[Grant], List[int]]:
+    """(added, retired) that bring the repository's grants to their logged records"""
+    retired = [repository.position(grant_id) for grant_id in changes if repository.position(grant_id) is not None]
+    added = [Grant(**record) for record in changes.values() if record is not None]
+    return added, retired
+
+
+class CatalogState:
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # Kept from the load until the first matcher is built from it
+        self._base: Optional[_BaseCatalog] = None
+        # Serializes loading and every writer (ingestion, refits); readers never take it
+        self.lock = threading.RLock()
+        # Set once warm_up has built everything the first requests would otherwise wait for
+        self.warmed = False
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot, loading the grants file on first use"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self.lock:
+            if self._snapshot is None:
+                with timed("catalog.load"):
+                    catalog_bytes, changes = grant_change_log.load()
+                    # Each parsed grant is compacted and dropped; only the columns are kept
+                    grants = CompactCatalog.from_grants(Grant(**g) for g in json.loads(catalog_bytes))
+                    repository = GrantRepository(grants)
+                    added, retired = _replay(repository, changes)
+                    if added or retired:
+                        repository = repository.with_changes(added, retired)
+                    self._base = _BaseCatalog(grants, catalog_bytes, added, retired)
+                    self._snapshot = CatalogSnapshot(repository, None, 1)
+            return self._snapshot
+
+    def peek(self) -> Optional[CatalogSnapshot]:
+        """Current snapshot, or None if the catalog has not been loaded yet (never loads it)"""
+        return self._snapshot
+
+    def get_repository(self) -> GrantRepository:
+        return self.snapshot().repository
+
+    def get_matcher(self) -> MatcherService:
+        snapshot = self.snapshot()
+        if snapshot.matcher is not None:
+            return snapshot.matcher
+        # Requests run on executor threads, so make sure only one of them builds the matcher
+        with self.lock:
+            snapshot = self.snapshot()
+            if snapshot.matcher is None:
+                base = self._base
+                # Loads the prebuilt TF-IDF index for the catalog file instead of refitting when possible,
+                # then appends the logged changes the same way the repository did
+                matcher = MatcherService(base.grants, catalog_bytes=base.catalog_bytes, index_dir=config.INDEX_DIR)
+                if base.added or base.retired:
+                    matcher = matcher.apply_changes(base.added, base.retired, grants=snapshot.repository.grants)
+                    embeddings_service.swap(matcher.text_index)
+                self._base = None
+                snapshot = snapshot._replace(matcher=matcher)
+                self._snapshot = snapshot
+            return snapshot.matcher
+
+    def ready_snapshot(self) -> CatalogSnapshot:
+        """Current snapshot with its matcher built (repository, matcher and version agree)"""
+        self.get_matcher()
+        # Every published snapshot after the first build carries a matcher
+        return self.snapshot()
+
+    def warm_up(self) -> CatalogSnapshot:
+        """
+        Load the catalog and build its lazily built indexes: the matcher, the search
+        index, the text index's posting lists and its vocabulary key.
+
+        Run before serving (and before forking workers, see app.server) so no user
+        request pays for the cold start.
+        """
+        with timed("catalog.warmup"):
+            snapshot = self.ready_snapshot()
+            snapshot.repository.search_index
+            text_index = snapshot.matcher.text_index
+            text_index.scored_candidates(text_index.transform(["grant"]), 1)
+            snapshot.matcher.vocabulary_key
+        self.warmed = True
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """Catalog version, bumped on every change to the grants"""
+        return self.snapshot().version
+
+    def swap(self, repository: GrantRepository, matcher: MatcherService) -> CatalogSnapshot:
+        """Publish a new catalog version (caller must hold the lock)"""
+        snapshot = CatalogSnapshot(repository, matcher, self.snapshot().version + 1)
+        self._snapshot = snapshot
+        return snapshot
+
+
+# Global instance
+catalog_state = CatalogState()
@@ -0,0 +1,305 @@
+"""
+Compact grant catalog - columnar storage with lazily materialized Grant models
+
+Instead of one pydantic Grant per catalog entry (nested models, per-object
+dicts and lists), the catalog keeps:
+
+- each grant's JSON encoding (the bytes responses splice in) packed into a few
+  large buffers with an offsets array; this is the only copy of the long text
+- categorical code arrays for repeated strings (type, difficulty,
+  competition_level, currency, deadline) over a per-column value table
+- offsets + codes for list columns (focus areas, tags, eligibility lists),
+  from which per-value bitsets are derived for the indexes
+- NumPy arrays for the numeric and boolean fields
+
+Grant models are built from the JSON only when something needs the object
+(a match result, application tips); a small LRU keeps hot ones around.
+A CompactCatalog is a read-only Sequence[Grant], so code indexing or iterating
+grants works unchanged, and like the other catalog structures it is never
+modified: extend and take return new catalogs.
+"""
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import orjson
+from app import config
+from app.models.grant import Grant
+from app.services import bitsets
+
+CATEGORICAL_COLUMNS: Dict[str, Callable[[Grant], str]] = {
+    "type": lambda g: g.type,
+    "difficulty": lambda g: g.difficulty,
+    "competition_level": lambda g: g.competition_level,
+    "currency": lambda g: g.currency,
+    "deadline": lambda g: g.deadline,
+}
+
+LIST_COLUMNS: Dict[str, Callable[[Grant], List[str]]] = {
+    "focus_areas": lambda g: g.focus_areas,
+    "tags": lambda g: g.tags,
+    "user_types": lambda g: g.eligibility.user_types,
+    "stages": lambda g: g.eligibility.stages,
+    "location": lambda g: g.eligibility.location,
+    "organization_types": lambda g: g.eligibility.organization_types,
+}
+
+NUMERIC_COLUMNS: Dict[str, Tuple[type, Callable[[Grant], Union[int, float, bool]]]] = {
+    "amount": (np.int64, lambda g: g.amount),
+    "success_rate": (np.float64, lambda g: g.success_rate),
+    "past_winners": (np.int32, lambda g: g.past_winners),
+    "min_team_size": (np.int32, lambda g: g.eligibility.min_team_size),
+    "equity_required": (np.bool_, lambda g: g.equity_required),
+    "requires_registration": (np.bool_, lambda g: g.eligibility.requires_registration),
+}
+
+
+class _Values:
+    """Distinct values of one column (interned) and their codes"""
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self.codes: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def copy(self) -> "_Values":
+        return _Values(self.values)
+
+
+def _code_array(codes: List[int], values: _Values) -> np.ndarray:
+    return np.array(codes, dtype=np.uint16 if len(values.values) <= 0xFFFF else np.uint32)
+
+
+def _gather_lists(offsets: np.ndarray, codes: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(offsets, codes) of the given rows of a list column"""
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    index = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return new_offsets, codes[index]
+
+
+class CompactCatalog(Sequence[Grant]):
+    def __init__(
+        self,
+        ids: List[str],
+        chunks: List[Tuple[bytes, np.ndarray]],
+        values: Dict[str, _Values],
+        categorical: Dict[str, np.ndarray],
+        lists: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        numeric: Dict[str, np.ndarray],
+        cache_size: int = config.GRANT_CACHE_SIZE
+    ):
+        self.ids = ids
+        # JSON buffers with per-chunk offsets; extend adds a chunk instead of copying the buffers
+        self._chunks = chunks
+        self._chunk_starts: List[int] = []
+        start = 0
+        for _, offsets in chunks:
+            self._chunk_starts.append(start)
+            start += len(offsets) - 1
+        self._values = values
+        self._categorical = categorical
+        self._lists = lists
+        self._numeric = numeric
+        self.cache_size = cache_size
+        self._materialize = lru_cache(maxsize=cache_size)(self._build_grant)
+
+    @classmethod
+    def from_grants(
+        cls, grants: Iterable[Grant], values: Optional[Dict[str, _Values]] = None,
+        cache_size: int = config.GRANT_CACHE_SIZE
+    ) -> "CompactCatalog":
+        """
+        Compact catalog of grants (any iterable; each grant is read once and can be dropped).
+
+        values continues existing value tables (see extend).
+        """
+        values = {name: _Values() for name in (*CATEGORICAL_COLUMNS, *LIST_COLUMNS)} if values is None else values
+        ids: List[str] = []
+        buffer = bytearray()
+        offsets = [0]
+        categorical: Dict[str, List[int]] = {name: [] for name in CATEGORICAL_COLUMNS}
+        list_offsets: Dict[str, List[int]] = {name: [0] for name in LIST_COLUMNS}
+        list_codes: Dict[str, List[int]] = {name: [] for name in LIST_COLUMNS}
+        numeric: Dict[str, list] = {name: [] for name in NUMERIC_COLUMNS}
+        for grant in grants:
+            ids.append(sys.intern(grant.id))
+            buffer += grant.json_bytes()
+            offsets.append(len(buffer))
+            for name, get in CATEGORICAL_COLUMNS.items():
+                categorical[name].append(values[name].code(get(grant)))
+            for name, get in LIST_COLUMNS.items():
+                codes = list_codes[name]
+                codes.extend(values[name].code(v) for v in get(grant))
+                list_offsets[name].append(len(codes))
+            for name, (_, get) in NUMERIC_COLUMNS.items():
+                numeric[name].append(get(grant))
+        return cls(
+            ids,
+            [(bytes(buffer), np.array(offsets, dtype=np.int64))],
+            values,
+            {name: _code_array(codes, values[name]) for name, codes in categorical.items()},
+            {
+                name: (np.array(list_offsets[name], dtype=np.int64), _code_array(list_codes[name], values[name]))
+                for name in LIST_COLUMNS
+            },
+            {name: np.array(numeric[name], dtype=dtype) for name, (dtype, _) in NUMERIC_COLUMNS.items()},
+            cache_size
+        )
+
+    # Sequence[Grant]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._materialize(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._materialize(i)
+
+    def __iter__(self) -> Iterator[Grant]:
+        # Full scans build throwaway models rather than flushing the hot LRU
+        for i in range(len(self)):
+            yield self._build_grant(i)
+
+    def __add__(self, grants: List[Grant]) -> "CompactCatalog":
+        return self.extend(grants)
+
+    # Row access without materializing
+
+    def json_bytes(self, i: int) -> bytes:
+        """The grant's JSON encoding (the same bytes Grant.json_bytes returns)"""
+        chunk = bisect_right(self._chunk_starts, i) - 1
+        buffer, offsets = self._chunks[chunk]
+        local = i - self._chunk_starts[chunk]
+        return buffer[offsets[local]:offsets[local + 1]]
+
+    def record(self, i: int) -> dict:
+        """The grant as plain JSON data (Grant.model_dump(mode="json") without the model)"""
+        return orjson.loads(self.json_bytes(i))
+
+    def records(self) -> Iterator[dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def _build_grant(self, i: int) -> Grant:
+        data = self.json_bytes(i)
+        grant = Grant.model_validate_json(data)
+        grant._json_bytes = data
+        return grant
+
+    # Columns
+
+    def column(self, name: str) -> np.ndarray:
+        """A numeric column (see NUMERIC_COLUMNS)"""
+        return self._numeric[name]
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List[str]]:
+        """(per-grant codes, value table) of a categorical column"""
+        return self._categorical[name], self._values[name].values
+
+    def value(self, name: str, i: int) -> str:
+        return self._values[name].values[self._categorical[name][i]]
+
+    def values(self, name: str) -> List[str]:
+        """A categorical column decoded (one shared string per distinct value)"""
+        table = self._values[name].values
+        return [table[c] for c in self._categorical[name].tolist()]
+
+    def lists(self, name: str) -> List[List[str]]:
+        """A list column decoded, one list per grant (in the grants' own order)"""
+        offsets, codes = self._lists[name]
+        table = self._values[name].values
+        decoded = [table[c] for c in codes.tolist()]
+        bounds = offsets.tolist()
+        return [decoded[bounds[i]:bounds[i + 1]] for i in range(len(self))]
+
+    def value_bitsets(self, name: str) -> Dict[str, np.ndarray]:
+        """Per distinct value of a list column, the bitset of grants listing it"""
+        offsets, codes = self._lists[name]
+        rows = np.repeat(np.arange(len(self)), np.diff(offsets))
+        table = self._values[name].values
+        order = np.argsort(codes, kind="stable")
+        codes, rows = codes[order], rows[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        result = {}
+        for group_codes, group_rows in zip(np.split(codes, bounds), np.split(rows, bounds)):
+            if len(group_codes):
+                result[table[group_codes[0]]] = bitsets.from_positions(group_rows, len(self))
+        return result
+
+    # New catalogs
+
+    def extend(self, grants: List[Grant]) -> "CompactCatalog":
+        """New catalog with grants appended (this one is left untouched)"""
+        added = CompactCatalog.from_grants(grants, {name: v.copy() for name, v in self._values.items()})
+        lists = {}
+        for name, (offsets, codes) in self._lists.items():
+            added_offsets, added_codes = added._lists[name]
+            lists[name] = (
+                np.concatenate([offsets, offsets[-1] + added_offsets[1:]]),
+                np.concatenate([codes, added_codes]).astype(added_codes.dtype, copy=False)
+            )
+        return CompactCatalog(
+            self.ids + added.ids,
+            self._chunks + added._chunks,
+            added._values,
+            {
+                name: np.concatenate([codes, added._categorical[name]]).astype(added._categorical[name].dtype)
+                for name, codes in self._categorical.items()
+            },
+            lists,
+            {name: np.concatenate([column, added._numeric[name]]) for name, column in self._numeric.items()},
+            self.cache_size
+        )
+
+    def take(self, rows: Sequence[int]) -> "CompactCatalog":
+        """New catalog of the given rows, in that order, packed into a single buffer"""
+        rows = np.asarray(rows, dtype=np.int64)
+        parts = [self.json_bytes(int(i)) for i in rows]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        return CompactCatalog(
+            [self.ids[i] for i in rows.tolist()],
+            [(b"".join(parts), offsets)],
+            self._values,
+            {name: codes[rows] for name, codes in self._categorical.items()},
+            {name: _gather_lists(offsets_, codes, rows) for name, (offsets_, codes) in self._lists.items()},
+            {name: column[rows] for name, column in self._numeric.items()},
+            self.cache_size
+        )
+
+    # Reporting
+
+    def memory_report(self) -> Dict[str, int]:
+        """Approximate bytes held per part of the catalog (materialized grants excluded)"""
+        strings = sum(sys.getsizeof(s) for s in self.ids) + sys.getsizeof(self.ids)
+        report = {
+            "json": sum(len(buffer) + offsets.nbytes for buffer, offsets in self._chunks),
+            "ids": strings,
+            "categorical": sum(codes.nbytes for codes in self._categorical.values()),
+            "lists": sum(offsets.nbytes + codes.nbytes for offsets, codes in self._lists.values()),
+            "numeric": sum(column.nbytes for column in self._numeric.values()),
+            "value_tables": sum(sum(sys.getsizeof(v) for v in t.values) for t in self._values.values()),
+        }
+        report["total"] = sum(report.values())
+        return report
+
+
+def as_catalog(grants: Sequence[Grant]) -> CompactCatalog:
+    """grants as a CompactCatalog (compacting a plain list)"""
+    return grants if isinstance(grants, CompactCatalog) else CompactCatalog.from_grants(grants)
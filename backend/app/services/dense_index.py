@@ -0,0 +1,220 @@
+"""
+Dense embedding backend - local CPU embedding model, quantized vectors and an IVF index
+
+An alternative to the TF-IDF index with the same interface (transform,
+vector_similarities, append, search...), selected with
+GRANTMATCH_EMBEDDING_BACKEND=dense. The model is loaded from a local path
+only; nothing is downloaded.
+
+Grant vectors are stored as float32 or int8 (per-row scale). Match scoring
+is exact; top-k retrieval (search, top_candidates) goes through an
+inverted-file (IVF) index: a spherical k-means over the grant vectors, where
+a query only scans the rows of its ``nprobe`` nearest centroids. A higher
+nprobe gives better recall at the cost of latency.
+"""
+import hashlib
+import os
+from typing import List, Optional, Protocol, Tuple
+import numpy as np
+from scipy import sparse
+from app import config
+
+
+class EmbeddingModel(Protocol):
+    name: str
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalised float32 vectors, one row per text"""
+        ...
+
+
+class SentenceTransformerModel:
+    """A sentence-transformers model loaded from a local directory (CPU only)"""
+
+    def __init__(self, path: str):
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Embedding model directory not found: {path!r}")
+        # Never reach out to the model hub; the path must hold the full model
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        from sentence_transformers import SentenceTransformer  # optional dependency
+        self.name = os.path.basename(os.path.normpath(path))
+        self._model = SentenceTransformer(path, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class QuantizedMatrix:
+    """Row vectors stored as float32, or as int8 with one float32 scale per row"""
+    __slots__ = ("values", "scales")
+
+    def __init__(self, values: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, quantization: str) -> "QuantizedMatrix":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if quantization == "float32":
+            return cls(vectors)
+        if quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            return cls(np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32))
+        raise ValueError(f"Unknown quantization {quantization!r}")
+
+    @property
+    def quantization(self) -> str:
+        return "float32" if self.scales is None else "int8"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    def dot(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """queries (q x d) . rows^T, for all rows or the given ones"""
+        values = self.values if rows is None else self.values[rows]
+        scores = queries @ values.T.astype(np.float32, copy=False)
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def append(self, other: "QuantizedMatrix") -> "QuantizedMatrix":
+        scales = None if self.scales is None else np.concatenate([self.scales, other.scales])
+        return QuantizedMatrix(np.concatenate([self.values, other.values]), scales)
+
+
+class IVFIndex:
+    """Inverted-file ANN index: rows bucketed by nearest k-means centroid"""
+    __slots__ = ("centroids", "lists")
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray]):
+        self.centroids = centroids
+        self.lists = lists
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(vectors)))
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        return cls(centroids, [np.flatnonzero(assignment == c) for c in range(nlist)])
+
+    def append(self, vectors: np.ndarray, start: int) -> "IVFIndex":
+        """New index with rows start.. added to their nearest lists (centroids are not retrained)"""
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        lists = list(self.lists)
+        for c in np.unique(assignment):
+            lists[c] = np.concatenate([lists[c], start + np.flatnonzero(assignment == c)])
+        return IVFIndex(self.centroids, lists)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the nprobe lists whose centroids are closest to the query"""
+        nprobe = min(nprobe, len(self.lists))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[c] for c in probe])
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    if top_k < len(scores):
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class DenseIndex:
+    """
+    Dense grant vectors from an embedding model (same interface as TfidfIndex).
+
+    Immutable like TfidfIndex: append returns a new index.
+    """
+    __slots__ = ("model", "matrix", "ann", "nprobe")
+
+    # Dense vectors have no vocabulary to drift, so ingestion never triggers a re-fit
+    vocabulary_drift = 0.0
+
+    def __init__(self, model: EmbeddingModel, matrix: QuantizedMatrix, ann: Optional[IVFIndex], nprobe: int):
+        self.model = model
+        self.matrix = matrix
+        self.ann = ann
+        self.nprobe = nprobe
+
+    @classmethod
+    def fit(
+        cls, model: EmbeddingModel, texts: List[str], quantization: str = "float32",
+        nlist: int = 0, nprobe: int = 8
+    ) -> "DenseIndex":
+        vectors = model.encode(texts)
+        # nlist 0: about sqrt(n) lists; tiny catalogs are searched exhaustively
+        nlist = nlist or int(np.sqrt(len(texts)))
+        ann = IVFIndex.build(vectors, nlist) if nlist > 1 else None
+        return cls(model, QuantizedMatrix.from_vectors(vectors, quantization), ann, nprobe)
+
+    @classmethod
+    def from_config(cls, texts: List[str]) -> "DenseIndex":
+        return cls.fit(
+            SentenceTransformerModel(config.EMBEDDING_MODEL_PATH), texts,
+            quantization=config.EMBEDDING_QUANTIZATION, nlist=config.ANN_NLIST, nprobe=config.ANN_NPROBE
+        )
+
+    @property
+    def size(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def vocabulary_key(self) -> str:
+        """Identifies the vector space (model, dimensions and quantization) query vectors belong to"""
+        spec = f"dense:{self.model.name}:{self.matrix.shape[1]}:{self.matrix.quantization}"
+        return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """Query vectors (as 1-row-per-text CSR, so they store and pass around like TF-IDF vectors)"""
+        return sparse.csr_matrix(self.model.encode(texts))
+
+    def append(self, texts: List[str], hash_buckets: int = 0) -> "DenseIndex":
+        vectors = self.model.encode(texts)
+        matrix = self.matrix.append(QuantizedMatrix.from_vectors(vectors, self.matrix.quantization))
+        ann = self.ann.append(vectors, self.size) if self.ann is not None else None
+        return DenseIndex(self.model, matrix, ann, self.nprobe)
+
+    def similarities(self, queries: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.vector_similarities(self.transform(queries), rows)
+
+    def vector_similarities(self, query_vecs: sparse.csr_matrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Exact cosine similarity (queries x every grant, or x the given rows), clipped to [0, 1]"""
+        queries = query_vecs.toarray().astype(np.float32, copy=False)
+        # Scoring assumes semantic similarity is non-negative like TF-IDF's (see top_k_indices)
+        return np.clip(self.matrix.dot(queries, rows).astype(np.float64), 0.0, 1.0)
+
+    def _nearest(self, vector: np.ndarray, top_k: int, nprobe: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, similarities) of the approximate top_k, scanning only the nprobe nearest IVF lists"""
+        rows = None if self.ann is None else self.ann.candidates(vector, nprobe or self.nprobe)
+        scores = self.matrix.dot(vector[None, :], rows)[0]
+        best = _top_k(scores, top_k)
+        return (best if rows is None else rows[best]), scores[best]
+
+    def top_candidates(self, query_vec: sparse.csr_matrix, n: int) -> np.ndarray:
+        """Up to n rows most similar to one query vector (from the ANN index)"""
+        return self.scored_candidates(query_vec, n)[0]
+
+    def scored_candidates(self, query_vec: sparse.csr_matrix, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(sorted rows, similarities) of top_candidates"""
+        if n <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows, scores = self._nearest(query_vec.toarray()[0].astype(np.float32), n, None)
+        order = np.argsort(rows)
+        return rows[order], scores[order].astype(np.float64)
+
+    def search(self, query: str, top_k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Approximate top_k rows by similarity, scanning only the nprobe nearest IVF lists"""
+        rows, scores = self._nearest(self.model.encode([query])[0], top_k, nprobe)
+        return [(int(row), float(score)) for row, score in zip(rows, scores)]
@@ -0,0 +1,102 @@
+"""
+Eligibility pre-filter - inverted indexes over grant Eligibility fields
+
+Each allowed value (country, user type, stage, organization type) maps to a
+bitset of the grants that accept it, so the grants a profile can apply to are
+found with a few bitset intersections instead of running check_eligibility
+against the whole catalog.
+"""
+from typing import Dict, List, Sequence
+import numpy as np
+from app.models.user import UserProfile
+from app.models.grant import Grant
+from app.services import bitsets
+from app.services.compact_catalog import as_catalog
+from app.services.grant_repository import GLOBAL_LOCATION
+
+
+def _merge_value_bitsets(
+    first: Dict[str, np.ndarray], first_size: int, second: Dict[str, np.ndarray], second_size: int
+) -> Dict[str, np.ndarray]:
+    empty_first, empty_second = bitsets.empty(first_size), bitsets.empty(second_size)
+    return {
+        value: bitsets.concat(
+            first.get(value, empty_first), first_size, second.get(value, empty_second), second_size
+        )
+        for value in first.keys() | second.keys()
+    }
+
+
+class EligibilityIndex:
+    _VALUE_INDEXES = ("by_country", "by_user_type", "by_stage", "by_org_type")
+
+    def __init__(self, grants: Sequence[Grant]):
+        catalog = as_catalog(grants)
+        self.size = len(catalog)
+        self.by_country = catalog.value_bitsets("location")
+        self.by_user_type = catalog.value_bitsets("user_types")
+        self.by_stage = catalog.value_bitsets("stages")
+        self.by_org_type = catalog.value_bitsets("organization_types")
+        self.requires_registration = bitsets.from_mask(catalog.column("requires_registration"))
+        self.min_team_size = catalog.column("min_team_size").astype(np.int64)
+        # Retired grants keep their position until the next full rebuild but never match
+        self.active = bitsets.full(self.size)
+        self._finish()
+
+    def _finish(self):
+        """Derive the lookup helpers from the stored fields"""
+        self._none = bitsets.empty(self.size)
+        self._all = bitsets.full(self.size)
+        self.global_grants = self.by_country.get(GLOBAL_LOCATION, self._none)
+        # Grants sorted by minimum team size; a team qualifies for a prefix of this order
+        self._team_order = np.argsort(self.min_team_size, kind="stable")
+        self._sorted_min_team_size = self.min_team_size[self._team_order]
+
+    def append(self, grants: Sequence[Grant]) -> "EligibilityIndex":
+        """New index with grants appended after the existing positions"""
+        added = EligibilityIndex(grants)
+        merged = EligibilityIndex.__new__(EligibilityIndex)
+        merged.size = self.size + added.size
+        for name in self._VALUE_INDEXES:
+            setattr(merged, name, _merge_value_bitsets(getattr(self, name), self.size, getattr(added, name), added.size))
+        for name in ("requires_registration", "active"):
+            setattr(merged, name, bitsets.concat(getattr(self, name), self.size, getattr(added, name), added.size))
+        merged.min_team_size = np.concatenate([self.min_team_size, added.min_team_size])
+        merged._finish()
+        return merged
+
+    def retire(self, positions: List[int]) -> "EligibilityIndex":
+        """New index with the given positions excluded from every candidate set"""
+        retired = EligibilityIndex.__new__(EligibilityIndex)
+        retired.__dict__.update(self.__dict__)
+        retired.active = self.active & ~bitsets.from_positions(positions, self.size)
+        return retired
+
+    def _team_size_ok(self, team_size: int) -> np.ndarray:
+        cutoff = np.searchsorted(self._sorted_min_team_size, team_size, side="right")
+        return bitsets.from_positions(self._team_order[:cutoff], self.size)
+
+    def near_eligible(self, profile: UserProfile) -> np.ndarray:
+        """
+        Grants passing the hard requirements: country, user type and stage.
+
+        Remaining issues (organization type, team size, registration) can still
+        lower the eligibility score but are things a profile can act on.
+        """
+        country = self.by_country.get(profile.location.country, self._none) | self.global_grants
+        user_type = self.by_user_type.get(profile.user_type, self._none)
+        stage = self.by_stage.get(profile.stage, self._none)
+        return country & user_type & stage & self.active
+
+    def eligible(self, profile: UserProfile) -> np.ndarray:
+        """Grants for which check_eligibility reports no issues at all"""
+        bits = self.near_eligible(profile)
+        bits &= self.by_org_type.get(profile.organization.type, self._none)
+        bits &= self._team_size_ok(profile.organization.team_size)
+        if not profile.organization.registered:
+            bits &= ~self.requires_registration & self._all
+        return bits
+
+    def candidates(self, profile: UserProfile) -> np.ndarray:
+        """Sorted catalog positions of near-eligible grants"""
+        return bitsets.to_positions(self.near_eligible(profile), self.size)
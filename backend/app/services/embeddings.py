@@ -1,55 +1,335 @@
 """
 TF-IDF based semantic matching engine (lightweight alternative to sentence-transformers)
+
+TF-IDF is the default backend. GRANTMATCH_EMBEDDING_BACKEND=dense switches to a
+local embedding model with an ANN index (see dense_index); both backends
+expose the same index interface to the matcher.
 """
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from typing import List, Tuple
+import hashlib
+import json
+import zlib
+from collections import Counter
+from scipy import sparse
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+from app import config
+from app.services import index_store
+from app.services.dense_index import DenseIndex
 
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
 
-class EmbeddingsService:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=5000,
-            ngram_range=(1, 2)
+
+def _new_vectorizer() -> "TfidfVectorizer":
+    # scikit-learn takes most of the import time, so it is only loaded once a vectorizer is needed
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(
+        stop_words='english',
+        max_features=5000,
+        ngram_range=(1, 2)
+    )
+
+
+class TfidfIndex:
+    """
+    A fitted vectorizer plus the grant matrix it produced.
+
+    Never mutated after construction: refitting builds a new TfidfIndex and swaps
+    the reference, so readers holding the old one keep a consistent view and
+    several threads can transform/score against it concurrently.
+
+    Rows appended after the fit (see append) reuse the fitted vocabulary; terms
+    outside it are hashed into ``hash_buckets`` extra columns after the
+    vocabulary columns so new grants still match on new words.
+    """
+    __slots__ = (
+        "vectorizer", "matrix", "hash_buckets", "ingested_docs", "ingested_terms", "oov_terms",
+        "_vocabulary_key", "_postings"
+    )
+
+    def __init__(
+        self,
+        vectorizer: "TfidfVectorizer",
+        matrix: sparse.csr_matrix,
+        hash_buckets: int = 0,
+        ingested_docs: int = 0,
+        ingested_terms: int = 0,
+        oov_terms: int = 0
+    ):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.hash_buckets = hash_buckets
+        self.ingested_docs = ingested_docs
+        self.ingested_terms = ingested_terms
+        self.oov_terms = oov_terms
+        self._vocabulary_key: Optional[str] = None
+        self._postings: Optional[sparse.csc_matrix] = None
+
+    @classmethod
+    def fit(cls, texts: List[str]) -> "TfidfIndex":
+        vectorizer = _new_vectorizer()
+        matrix = vectorizer.fit_transform(texts).tocsr()
+        return cls(vectorizer, matrix)
+
+    @property
+    def size(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def vocabulary_key(self) -> str:
+        """
+        Hash of everything transform depends on (vocabulary, IDF weights, hash buckets).
+
+        Query vectors computed under one key can be reused with any index of the same key.
+        """
+        if self._vocabulary_key is None:
+            digest = hashlib.sha256()
+            digest.update(json.dumps(sorted((term, int(col)) for term, col in self.vectorizer.vocabulary_.items())).encode())
+            digest.update(np.ascontiguousarray(self.vectorizer.idf_, dtype=np.float64).tobytes())
+            digest.update(str(self.hash_buckets).encode())
+            self._vocabulary_key = digest.hexdigest()[:16]
+        return self._vocabulary_key
+
+    @property
+    def vocabulary_drift(self) -> float:
+        """
+        Share of the catalog text the fitted vocabulary does not cover (0-1).
+
+        Out-of-vocabulary share of the ingested documents, weighted by the share
+        of the catalog that was ingested since the last fit.
+        """
+        if not self.ingested_terms:
+            return 0.0
+        return (self.oov_terms / self.ingested_terms) * (self.ingested_docs / max(self.size, 1))
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """L2-normalised TF-IDF vectors for texts in this index's vocabulary"""
+        if not self.hash_buckets:
+            return self.vectorizer.transform(texts)
+        return self._transform_hashed(texts)[0]
+
+    def _transform_hashed(self, texts: List[str]) -> Tuple[sparse.csr_matrix, int, int]:
+        """TF-IDF over vocabulary + hashed out-of-vocabulary columns; also returns (terms, oov terms)"""
+        from sklearn.preprocessing import normalize  # loaded with the vectorizer already
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        idf = self.vectorizer.idf_
+        n_vocab = len(idf)
+        # Smoothed IDF of a term seen in no fitted document
+        unseen_idf = float(np.log((1 + self.corpus_size_at_fit) / 1) + 1)
+        rows, cols, data = [], [], []
+        n_terms = n_oov = 0
+        for row, text in enumerate(texts):
+            for term, count in Counter(analyzer(text)).items():
+                col = vocabulary.get(term)
+                n_terms += count
+                if col is None:
+                    n_oov += count
+                    col = n_vocab + zlib.crc32(term.encode("utf-8")) % self.hash_buckets
+                    weight = unseen_idf
+                else:
+                    weight = idf[col]
+                rows.append(row)
+                cols.append(col)
+                data.append(count * weight)
+        matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(texts), n_vocab + self.hash_buckets))
+        matrix.sum_duplicates()
+        return normalize(matrix), n_terms, n_oov
+
+    @property
+    def corpus_size_at_fit(self) -> int:
+        return self.size - self.ingested_docs
+
+    def append(self, texts: List[str], hash_buckets: int = config.HASH_BUCKETS) -> "TfidfIndex":
+        """New index with rows for texts appended, without refitting the vocabulary"""
+        buckets = self.hash_buckets or hash_buckets
+        widened = self if self.hash_buckets else TfidfIndex(
+            self.vectorizer, self.matrix, buckets,
+            self.ingested_docs, self.ingested_terms, self.oov_terms
+        )
+        rows, n_terms, n_oov = widened._transform_hashed(texts)
+        matrix = self.matrix
+        if matrix.shape[1] != rows.shape[1]:
+            matrix = sparse.hstack([matrix, sparse.csr_matrix((matrix.shape[0], buckets))], format="csr")
+        return TfidfIndex(
+            self.vectorizer,
+            sparse.vstack([matrix, rows], format="csr"),
+            buckets,
+            self.ingested_docs + len(texts),
+            self.ingested_terms + n_terms,
+            self.oov_terms + n_oov
         )
-        self._fitted = False
-        self._corpus = []
-        self._embeddings = None
-    
-    def fit(self, texts: List[str]):
-        """Fit the vectorizer on corpus of grant texts"""
-        self._corpus = texts
-        self._embeddings = self.vectorizer.fit_transform(texts)
-        self._fitted = True
-    
+
+    def similarities(self, queries: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity matrix (queries x corpus, or x the given corpus rows) from one transform call"""
+        return self.vector_similarities(self.transform(queries), rows)
+
+    def vector_similarities(self, query_vecs: sparse.csr_matrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Like similarities, for query vectors already transformed with this vocabulary"""
+        embeddings = self.matrix if rows is None else self.matrix[rows]
+        # Rows and queries are already L2-normalised by TF-IDF, so the dot product is the
+        # cosine similarity; this avoids copying the (possibly memory-mapped) grant matrix
+        return (query_vecs @ embeddings.T).toarray()
+
+    def top_candidates(self, query_vec: sparse.csr_matrix, n: int) -> np.ndarray:
+        """
+        Up to n rows most similar to one query vector, via the inverted index.
+
+        Only the posting lists of the query's terms are read, so the cost grows
+        with how common those terms are rather than with the catalog size.
+        """
+        return self.scored_candidates(query_vec, n)[0]
+
+    def scored_candidates(self, query_vec: sparse.csr_matrix, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(sorted rows, similarities) of top_candidates; n >= size gives every row sharing a query term"""
+        if self._postings is None:
+            # Term -> grants posting lists (CSC of the grant matrix), built on first use
+            self._postings = self.matrix.tocsc()
+        postings = self._postings
+        query_vec = query_vec.tocsr()
+        cols = query_vec.indices[query_vec.indices < postings.shape[1]]
+        weights = query_vec.data[query_vec.indices < postings.shape[1]]
+        if not len(cols) or n <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        spans = [slice(postings.indptr[c], postings.indptr[c + 1]) for c in cols]
+        rows = np.concatenate([postings.indices[span] for span in spans])
+        contributions = np.concatenate([postings.data[span] * w for span, w in zip(spans, weights)])
+        scores = np.bincount(rows, weights=contributions, minlength=postings.shape[0])
+        hit_rows = np.flatnonzero(scores)
+        if n < len(hit_rows):
+            hit_rows = np.sort(hit_rows[np.argpartition(-scores[hit_rows], n - 1)[:n]])
+        return hit_rows, scores[hit_rows]
+
+    def search(self, query: str, top_k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Exact top_k rows by similarity (partial selection instead of a full sort)"""
+        similarities = self.similarities([query])[0]
+        if top_k < len(similarities):
+            top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            top_indices = np.arange(len(similarities))
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind="stable")]
+        return [(int(idx), float(similarities[idx])) for idx in top_indices]
+
+
+TextIndex = Union[TfidfIndex, DenseIndex]
+
+# Index builders by GRANTMATCH_EMBEDDING_BACKEND name
+INDEX_BACKENDS = {
+    "tfidf": TfidfIndex.fit,
+    "dense": DenseIndex.from_config,
+}
+
+
+class EmbeddingsService:
+    def __init__(self, backend: str = "tfidf"):
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {sorted(INDEX_BACKENDS)}")
+        self.backend = backend
+        self._index: Optional[TextIndex] = None
+
+    @property
+    def index(self) -> Optional[TextIndex]:
+        """Current catalog index snapshot (None until fitted)"""
+        return self._index
+
+    @property
+    def vectorizer(self) -> Optional["TfidfVectorizer"]:
+        return getattr(self._index, "vectorizer", None)
+
+    @property
+    def _fitted(self) -> bool:
+        return self._index is not None
+
+    def fit(self, texts: List[str]) -> TextIndex:
+        """Fit the vectorizer (or encode with the dense model) on corpus of grant texts"""
+        # Build fully, then swap: in-flight readers keep the snapshot they started with
+        index = INDEX_BACKENDS[self.backend](texts)
+        self._index = index
+        return index
+
+    def swap(self, index: TextIndex):
+        """Publish an index built elsewhere (e.g. by incremental ingestion)"""
+        self._index = index
+
+    def load_or_fit(self, texts: List[str], catalog_bytes: bytes, index_dir: Optional[str]) -> bool:
+        """
+        Load the prebuilt index for this catalog, fitting (and saving) it on a miss.
+
+        Returns True if the index was loaded from disk. Only TF-IDF indexes are
+        persisted; the dense backend encodes the catalog at startup.
+        """
+        if not index_dir or self.backend != "tfidf":
+            self.fit(texts)
+            return False
+
+        vectorizer = _new_vectorizer()
+        key = index_store.catalog_key(catalog_bytes, vectorizer)
+        loaded = index_store.load_index(index_dir, key, vectorizer)
+        if loaded is not None and loaded[1].shape[0] == len(texts):
+            self._index = TfidfIndex(loaded[0], loaded[1])
+            return True
+
+        index = self.fit(texts)
+        index_store.save_index(index_dir, key, index.vectorizer, index.matrix)
+        return False
+
     def encode(self, text: str) -> np.ndarray:
         """Encode a single text into a vector"""
-        if not self._fitted:
-            # If not fitted, fit on the input text only
-            return self.vectorizer.fit_transform([text]).toarray()[0]
-        return self.vectorizer.transform([text]).toarray()[0]
-    
+        index = self._index
+        if index is None:
+            # If not fitted, fit a throwaway vectorizer on the input text only
+            return _new_vectorizer().fit_transform([text]).toarray()[0]
+        return index.transform([text]).toarray()[0]
+
+    def pairwise_similarity(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """
+        Semantic similarity for each (text1, text2) pair, using the fitted catalog vocabulary.
+
+        All left and right texts are transformed in one call each; the shared
+        index is never refitted. Before the catalog is fitted, a throwaway
+        vectorizer is fitted on the pairs themselves.
+        """
+        if not pairs:
+            return np.zeros(0)
+        left = [a for a, _ in pairs]
+        right = [b for _, b in pairs]
+        index = self._index
+        if index is None:
+            vectorizer = _new_vectorizer()
+            try:
+                vectors = vectorizer.fit_transform(left + right)
+            except ValueError:
+                # Nothing but stop words: no shared vocabulary at all
+                return np.zeros(len(pairs))
+            left_vecs, right_vecs = vectors[:len(pairs)], vectors[len(pairs):]
+        else:
+            left_vecs, right_vecs = index.transform(left), index.transform(right)
+        return np.asarray(left_vecs.multiply(right_vecs).sum(axis=1)).ravel()
+
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate semantic similarity between two texts"""
-        combined = [text1, text2]
-        tfidf_matrix = self.vectorizer.fit_transform(combined)
-        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-        return float(similarity)
-    
-    def find_similar(self, query: str, top_k: int = 25) -> List[Tuple[int, float]]:
-        """Find most similar items in corpus to query"""
-        if not self._fitted:
+        return float(self.pairwise_similarity([(text1, text2)])[0])
+
+    def similarities(self, query: str) -> np.ndarray:
+        """Cosine similarity of query to every item in the corpus, in corpus order"""
+        return self.similarities_batch([query])[0]
+
+    def similarities_batch(self, queries: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity matrix (queries x corpus, or x the given corpus rows) from one transform call"""
+        return self._index.similarities(queries, rows)
+
+    def find_similar(self, query: str, top_k: int = 25, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find most similar items in corpus to query.
+
+        Exact for TF-IDF; the dense backend searches its ANN index, where nprobe
+        (default GRANTMATCH_ANN_NPROBE) trades recall for latency.
+        """
+        index = self._index
+        if index is None or top_k <= 0:
             return []
-        
-        query_vec = self.vectorizer.transform([query])
-        similarities = cosine_similarity(query_vec, self._embeddings)[0]
-        
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        return [(int(idx), float(similarities[idx])) for idx in top_indices]
+        return index.search(query, top_k, nprobe)
 
 
 # Global instance
-embeddings_service = EmbeddingsService()
+embeddings_service = EmbeddingsService(config.EMBEDDING_BACKEND)
@@ -0,0 +1,114 @@
+"""
+Execution backend - runs CPU-bound service calls off the asyncio event loop
+
+NumPy/scipy heavy work (TF-IDF transform, similarity, columnar scoring) releases
+the GIL and goes to a thread pool, as does blocking I/O. Pure-Python work
+(readiness scoring, application tips) can optionally go to a process pool
+instead. Admission is bounded: once max_pending calls are queued or running,
+new calls fail fast with ExecutorOverloadedError, which the API turns into a 429.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from app import config
+
+MODES = ("thread", "process", "inline")
+
+
+class ExecutorOverloadedError(Exception):
+    """Raised when the backend already has max_pending calls in flight"""
+
+
+class ExecutionBackend:
+    def __init__(
+        self,
+        mode: str = "thread",
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        max_pending: int = 64
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown executor mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls) -> "ExecutionBackend":
+        return cls(
+            mode=config.EXECUTOR_MODE,
+            thread_workers=config.EXECUTOR_THREADS,
+            process_workers=config.EXECUTOR_PROCESSES,
+            max_pending=config.EXECUTOR_MAX_PENDING
+        )
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="grantmatch")
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(self.process_workers)
+        return self._processes
+
+    async def _submit(self, executor: Optional[Executor], fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        # The counter is only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorOverloadedError(f"{self.pending} calls already pending")
+        self.pending += 1
+        try:
+            if executor is None:
+                return fn(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            call = functools.partial(fn, *args, **kwargs)
+            if isinstance(executor, ThreadPoolExecutor):
+                # Run in the caller's context so request-scoped state (e.g. Server-Timing) follows the call
+                call = functools.partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(executor, call)
+        finally:
+            self.pending -= 1
+
+    async def run_numeric(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run GIL-releasing NumPy/scipy work on the thread pool"""
+        executor = None if self.mode == "inline" else self._thread_pool()
+        return await self._submit(executor, fn, *args, **kwargs)
+
+    async def run_python(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run pure-Python work on the process pool in "process" mode, else the thread pool.
+
+        fn and its arguments must be picklable in "process" mode (module-level
+        functions and pydantic models are).
+        """
+        if self.mode == "inline":
+            executor = None
+        elif self.mode == "process":
+            executor = self._process_pool()
+        else:
+            executor = self._thread_pool()
+        return await self._submit(executor, fn, *args, **kwargs)
+
+    async def run_blocking(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run blocking I/O (e.g. profile store reads that miss its cache) on the thread pool"""
+        executor = None if self.mode == "inline" else self._thread_pool()
+        return await self._submit(executor, fn, *args, **kwargs)
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+
+# Global instance
+execution_backend = ExecutionBackend.from_config()
@@ -0,0 +1,142 @@
+"""
+Grant change log - durable record of the grants ingested at runtime
+
+The shipped catalog (GRANTS_FILE) is never written. Each admin change is
+appended to INGEST_DIR/changes.ndjson as one JSON line (the grant's new record,
+or null once it is retired) and the log is replayed over the catalog when it is
+loaded. A re-fit compacts it: the active grants are written to
+INGEST_DIR/grants.json, which becomes the base catalog, and the log starts over.
+
+The log's first line names the source catalog it applies to (a hash of
+GRANTS_FILE), so ingested state is ignored once a different catalog ships.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+from app import config
+from app.models.grant import Grant
+from app.services.compact_catalog import CompactCatalog
+
+logger = logging.getLogger(__name__)
+
+
+def _drop_none(value):
+    """JSON data without None-valued keys (at any depth), like model_dump(exclude_none=True)"""
+    if isinstance(value, dict):
+        return {k: _drop_none(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_none(v) for v in value]
+    return value
+
+
+def grant_record(grant: Grant) -> dict:
+    """A grant's record as stored in catalog files"""
+    return json.loads(grant.model_dump_json(exclude_none=True))
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+class GrantChangeLog:
+    def __init__(self, source_path: str, directory: str):
+        """directory is where ingested state is kept; an empty one keeps changes in memory only"""
+        self.source_path = source_path
+        self.directory = directory
+        self.catalog_path = os.path.join(directory, "grants.json")
+        self.log_path = os.path.join(directory, "changes.ndjson")
+        self.source_key: Optional[str] = None
+        # Whether the log on disk belongs to the loaded source catalog
+        self._log_current = False
+
+    def load(self) -> Tuple[bytes, Dict[str, Optional[dict]]]:
+        """
+        (base catalog bytes, changes): the compacted catalog if there is one, else the
+        shipped catalog, and the latest record of every grant changed since (None if retired).
+        """
+        with open(self.source_path, "rb") as f:
+            source = f.read()
+        self.source_key = hashlib.sha256(source).hexdigest()[:16]
+        self._log_current = False
+        if not self.directory or not os.path.exists(self.log_path):
+            return source, {}
+
+        changes: Dict[str, Optional[dict]] = {}
+        with open(self.log_path, "rb") as f:
+            header = f.readline()
+            try:
+                if json.loads(header).get("source") != self.source_key:
+                    logger.warning("Ignoring ingested grants in %s: they apply to another catalog", self.directory)
+                    return source, {}
+            except ValueError:
+                logger.warning("Ignoring ingested grants in %s: unreadable change log", self.directory)
+                return source, {}
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash; every complete change before it still applies
+                    logger.warning("Skipping an incomplete line in %s", self.log_path)
+                    continue
+                changes[change["id"]] = change["grant"]
+        self._log_current = True
+
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path, "rb") as f:
+                return f.read(), changes
+        return source, changes
+
+    def append(self, grant_id: str, record: Optional[dict]):
+        """Durably record a grant's new record (None retires it); nothing is kept if this raises"""
+        if not self.directory:
+            return
+        if not self._log_current:
+            self._start()
+        line = json.dumps({"id": grant_id, "grant": record}).encode() + b"\n"
+        with open(self.log_path, "ab") as f:
+            size = f.tell()
+            try:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError:
+                f.truncate(size)
+                raise
+
+    def compact(self, grants: CompactCatalog) -> bytes:
+        """Write the active grants as the new base catalog and empty the log; returns the catalog bytes"""
+        data = json.dumps([_drop_none(r) for r in grants.records()], indent=2).encode() + b"\n"
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            # Until the log is replaced, replaying it over the new catalog gives the same grants
+            _write_atomic(self.catalog_path, data)
+            _write_atomic(self.log_path, self._header())
+            self._log_current = True
+        return data
+
+    def _header(self) -> bytes:
+        return json.dumps({"source": self.source_key}).encode() + b"\n"
+
+    def _start(self):
+        # State left from another source catalog must not be replayed over this one
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.catalog_path):
+            os.unlink(self.catalog_path)
+        _write_atomic(self.log_path, self._header())
+        self._log_current = True
+
+
+# Global instance
+grant_change_log = GrantChangeLog(config.GRANTS_FILE, config.INGEST_DIR)
@@ -0,0 +1,206 @@
+"""
+Indexed in-memory grant store - id lookup, deadline order and secondary indexes
+"""
+import bisect
+from collections import defaultdict
+from datetime import date
+from functools import cached_property
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+import numpy as np
+from app.models.grant import Grant
+from app.services import bitsets
+from app.services.compact_catalog import CompactCatalog, as_catalog
+from app.services.grant_search import GrantSearchIndex
+
+# Location value that makes a grant open to every country
+GLOBAL_LOCATION = "Global"
+
+
+def parse_deadline(deadline: str) -> date:
+    """Parse an ISO deadline; unparseable values (e.g. "Rolling") sort last"""
+    try:
+        return date.fromisoformat(deadline)
+    except ValueError:
+        return date.max
+
+
+class GrantRepository:
+    """
+    Owns the loaded grant catalog and keeps lookup structures next to it.
+
+    Positions refer to the index of a grant in ``self.grants`` (the same order the
+    matcher scores in). Secondary indexes map lowercased values to sorted position
+    lists so filters can be combined by intersection.
+
+    Retired grants keep their position (as a tombstone) until the next full
+    rebuild, so positions stay aligned with the matcher's arrays.
+
+    The grants are held in a CompactCatalog: everything here is built from its
+    columns, and responses splice its stored JSON, so Grant models are only
+    materialized for callers that need the object.
+    """
+
+    def __init__(self, grants: Sequence[Grant]):
+        self.grants = as_catalog(grants)
+        self._retired: FrozenSet[int] = frozenset()
+        self._positions: Dict[str, int] = {grant_id: i for i, grant_id in enumerate(self.grants.ids)}
+
+        # Each distinct deadline string is parsed once
+        codes, values = self.grants.codes("deadline")
+        parsed = [parse_deadline(v) for v in values]
+        self._deadline_values = self.grants.values("deadline")
+        self._deadlines = [parsed[c] for c in codes.tolist()]
+        self._set_deadline_order(sorted(range(len(self.grants)), key=self._deadline_key))
+
+        self._by_type = self._build_index((t,) for t in self.grants.values("type"))
+        self._by_focus_area = self._build_index(self.grants.lists("focus_areas"))
+        self._by_tag = self._build_index(self.grants.lists("tags"))
+        self._by_location = self._build_index(self.grants.lists("location"))
+
+    @staticmethod
+    def _build_index(values_per_grant: Iterable[Iterable[str]], offset: int = 0) -> Dict[str, List[int]]:
+        index = defaultdict(list)
+        for i, values in enumerate(values_per_grant, start=offset):
+            for value in set(v.lower() for v in values):
+                index[value].append(i)
+        return dict(index)
+
+    def _deadline_key(self, position: int):
+        return (self._deadlines[position], self._deadline_values[position])
+
+    def _set_deadline_order(self, order: List[int]):
+        self._deadline_order = order
+        self._sorted_deadlines = [self._deadlines[i] for i in order]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def active_grants(self) -> CompactCatalog:
+        """Grants that have not been retired, in catalog order"""
+        if not self._retired:
+            return self.grants
+        return self.grants.take([i for i in range(len(self.grants)) if i not in self._retired])
+
+    def with_changes(self, added: List[Grant], retired: Iterable[int]) -> "GrantRepository":
+        """
+        Copy of this repository with grants appended and positions retired.
+
+        Unchanged index lists are shared with this repository, which is never
+        modified, so readers holding it are unaffected.
+        """
+        retired = frozenset(retired)
+        start = len(self.grants)
+        repo = GrantRepository.__new__(GrantRepository)
+        repo.grants = self.grants.extend(added)
+        repo._retired = self._retired | retired
+        repo._positions = {
+            grant_id: i for grant_id, i in self._positions.items() if i not in retired
+        }
+        repo._positions.update((g.id, start + i) for i, g in enumerate(added))
+
+        repo._deadline_values = self._deadline_values + [g.deadline for g in added]
+        repo._deadlines = self._deadlines + [parse_deadline(g.deadline) for g in added]
+        order = [i for i in self._deadline_order if i not in retired]
+        for i in range(start, len(repo.grants)):
+            bisect.insort(order, i, key=repo._deadline_key)
+        repo._set_deadline_order(order)
+
+        for name, values in (
+            ("_by_type", lambda g: (g.type,)),
+            ("_by_focus_area", lambda g: g.focus_areas),
+            ("_by_tag", lambda g: g.tags),
+            ("_by_location", lambda g: g.eligibility.location),
+        ):
+            setattr(repo, name, self._merge_index(
+                getattr(self, name), self._build_index((values(g) for g in added), offset=start), retired
+            ))
+        if "search_index" in self.__dict__:
+            # Updated from this repository's search index instead of rebuilt by the next search
+            repo.search_index = self.search_index.with_changes(
+                repo.grants, added, retired, repo._deadline_order, repo._deadlines
+            )
+        return repo
+
+    @staticmethod
+    def _merge_index(
+        index: Dict[str, List[int]], additions: Dict[str, List[int]], retired: FrozenSet[int]
+    ) -> Dict[str, List[int]]:
+        merged = dict(index)
+        if retired:
+            for value, positions in index.items():
+                if not retired.isdisjoint(positions):
+                    merged[value] = [i for i in positions if i not in retired]
+        for value, positions in additions.items():
+            # New positions are past every existing one, so appending keeps lists sorted
+            merged[value] = merged.get(value, []) + positions
+        return merged
+
+    @cached_property
+    def search_index(self) -> GrantSearchIndex:
+        """Facet bitsets and sort orders for /grants/search, built on first use (or by with_changes)"""
+        active = np.ones(len(self.grants), dtype=bool)
+        active[list(self._retired)] = False
+        return GrantSearchIndex(self.grants, bitsets.from_mask(active), self._deadline_order, self._deadlines)
+
+    def get(self, grant_id: str) -> Optional[Grant]:
+        """O(1) lookup by grant id"""
+        position = self._positions.get(grant_id)
+        return self.grants[position] if position is not None else None
+
+    def grant_json(self, grant_id: str) -> Optional[bytes]:
+        """A grant's JSON encoding by id, without materializing the Grant"""
+        position = self._positions.get(grant_id)
+        return self.grants.json_bytes(position) if position is not None else None
+
+    def position(self, grant_id: str) -> Optional[int]:
+        """Catalog position of a grant id (its row in the matcher's arrays)"""
+        return self._positions.get(grant_id)
+
+    def deadline_order(self, positions: Optional[List[int]] = None) -> List[int]:
+        """Positions (all active, or the given ones) sorted by deadline, soonest first"""
+        if positions is None:
+            return self._deadline_order
+        return sorted(positions, key=self._deadline_key)
+
+    def by_deadline(self, positions: Optional[List[int]] = None) -> List[Grant]:
+        """Grants (all, or the given positions) sorted by deadline, soonest first"""
+        return [self.grants[i] for i in self.deadline_order(positions)]
+
+    def due_between(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Grant]:
+        """Grants with start <= deadline <= end, soonest first (O(log n) to locate)"""
+        lo = bisect.bisect_left(self._sorted_deadlines, start) if start else 0
+        hi = bisect.bisect_right(self._sorted_deadlines, end) if end else len(self._sorted_deadlines)
+        return [self.grants[i] for i in self._deadline_order[lo:hi]]
+
+    def positions_for(
+        self,
+        type: Optional[str] = None,
+        focus_area: Optional[str] = None,
+        tag: Optional[str] = None,
+        location: Optional[str] = None
+    ) -> List[int]:
+        """Sorted catalog positions matching every given filter (case-insensitive)"""
+        candidates = []
+        if type:
+            candidates.append(self._by_type.get(type.lower(), []))
+        if focus_area:
+            candidates.append(self._by_focus_area.get(focus_area.lower(), []))
+        if tag:
+            candidates.append(self._by_tag.get(tag.lower(), []))
+        if location:
+            # Grants open globally are eligible for every location
+            eligible = set(self._by_location.get(location.lower(), []))
+            eligible.update(self._by_location.get(GLOBAL_LOCATION.lower(), []))
+            candidates.append(sorted(eligible))
+        if not candidates:
+            return [i for i in range(len(self.grants)) if i not in self._retired]
+
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for positions in candidates[1:]:
+            result.intersection_update(positions)
+        return sorted(result)
+
+    def filter(self, **filters: Optional[str]) -> List[Grant]:
+        """Grants matching every given filter, in catalog order"""
+        return [self.grants[i] for i in self.positions_for(**filters)]
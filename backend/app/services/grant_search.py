@@ -0,0 +1,239 @@
+"""
+Faceted grant search - free text plus structured filters with facet counts
+
+Every value of a facet field (type, focus area, tag, difficulty, equity) has a
+bitset of the grants carrying it, stacked per facet into one values x bytes
+matrix. Filters are ORs of rows within a facet and ANDs across facets, and
+the counts of a whole facet come from one ``count_rows`` over its matrix.
+Counts are disjunctive: each facet is counted with every filter except its
+own, so a client can show how many results picking another value would give.
+
+Amount and deadline ranges are compared on the catalog's numeric columns,
+and free text reads the matcher's text index (posting lists for TF-IDF, the
+ANN index for dense vectors). Deadline and amount orders are precomputed, so
+an ordered page is a gather over them rather than a sort.
+
+Ingested grants do not rebuild the index: with_changes widens the bitsets,
+sets the new grants' bits and merges them into the orders.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from app import config
+from app.models.grant import Grant
+from app.services import bitsets
+from app.services.compact_catalog import CompactCatalog
+
+SORTS = ("relevance", "deadline", "amount")
+
+
+class _Facet:
+    """Per-value bitsets of one field; values that differ only in case are one value"""
+    __slots__ = ("values", "lookup", "matrix")
+
+    def __init__(self, value_bitsets: Dict[str, np.ndarray], size: int):
+        self.values: List[str] = []
+        self.lookup: Dict[str, int] = {}
+        rows: List[np.ndarray] = []
+        for value, bits in sorted(value_bitsets.items()):
+            key = value.lower()
+            if key in self.lookup:
+                rows[self.lookup[key]] = rows[self.lookup[key]] | bits
+            else:
+                self.lookup[key] = len(self.values)
+                self.values.append(value)
+                rows.append(bits)
+        self.matrix = np.stack(rows) if rows else np.zeros((0, len(bitsets.empty(size))), dtype=np.uint8)
+
+    def extend(self, additions: Dict[str, List[int]], size: int) -> "_Facet":
+        """This facet over size positions, with each value's added positions set in its bitset"""
+        matrix = np.pad(self.matrix, ((0, 0), (0, len(bitsets.empty(size)) - self.matrix.shape[1])))
+        value_bitsets = dict(zip(self.values, matrix))
+        for value, positions in additions.items():
+            bits = bitsets.from_positions(positions, size)
+            # Merged with other spellings of the value (and ordered) exactly like a fresh build
+            value_bitsets[value] = value_bitsets[value] | bits if value in value_bitsets else bits
+        return _Facet(value_bitsets, size)
+
+    def select(self, values: Sequence[str], size: int) -> np.ndarray:
+        """Grants carrying any of the values (unknown values match nothing)"""
+        rows = [self.lookup[v.lower()] for v in values if v.lower() in self.lookup]
+        if not rows:
+            return bitsets.empty(size)
+        return np.bitwise_or.reduce(self.matrix[rows], axis=0)
+
+    def counts(self, bits: np.ndarray, selected: Sequence[str]) -> Dict[str, int]:
+        """Grants in bits per value: values with any, plus the selected ones, most common first"""
+        counts = bitsets.count_rows(self.matrix, bits)
+        keep = counts > 0
+        for value in selected:
+            if value.lower() in self.lookup:
+                keep[self.lookup[value.lower()]] = True
+        rows = np.flatnonzero(keep)
+        rows = rows[np.argsort(-counts[rows], kind="stable")]
+        return {self.values[i]: int(counts[i]) for i in rows.tolist()}
+
+
+def _categorical_bitsets(catalog: CompactCatalog, name: str) -> Dict[str, np.ndarray]:
+    codes, values = catalog.codes(name)
+    return {value: bitsets.from_mask(codes == code) for code, value in enumerate(values) if (codes == code).any()}
+
+
+# Per facet, the values a grant carries (see GrantSearchIndex.facets)
+_FACET_VALUES: Dict[str, Callable[[Grant], Iterable[str]]] = {
+    "type": lambda g: (g.type,),
+    "focus_area": lambda g: g.focus_areas,
+    "tag": lambda g: g.tags,
+    "difficulty": lambda g: (g.difficulty,),
+    "equity_required": lambda g: (str(g.equity_required).lower(),),
+}
+
+
+@dataclass
+class SearchResult:
+    positions: np.ndarray  # catalog positions of the requested page, in result order
+    total: int
+    facets: Dict[str, Dict[str, int]]
+
+
+class GrantSearchIndex:
+    """Built from a repository's catalog; like the repository it is never modified"""
+
+    def __init__(
+        self, catalog: CompactCatalog, active: np.ndarray, deadline_order: Sequence[int], deadlines: Sequence[date]
+    ):
+        """
+        active is the bitset of positions not retired, deadline_order the active positions
+        by deadline and deadlines the parsed deadline of every position (see GrantRepository).
+        """
+        self.size = size = len(catalog)
+        self.active = active
+        self.facets: Dict[str, _Facet] = {
+            "type": _Facet(_categorical_bitsets(catalog, "type"), size),
+            "focus_area": _Facet(catalog.value_bitsets("focus_areas"), size),
+            "tag": _Facet(catalog.value_bitsets("tags"), size),
+            "difficulty": _Facet(_categorical_bitsets(catalog, "difficulty"), size),
+            "equity_required": _Facet(
+                {
+                    "true": bitsets.from_mask(catalog.column("equity_required")),
+                    "false": bitsets.from_mask(~catalog.column("equity_required")),
+                },
+                size
+            ),
+        }
+        self.amount = catalog.column("amount")
+        # Unparseable deadlines ("Rolling") are date.max, after every window end
+        self.deadline = np.array([d.toordinal() for d in deadlines], dtype=np.int64)
+        self.deadline_order = np.asarray(deadline_order, dtype=np.int64)
+        self.amount_order = np.argsort(-self.amount, kind="stable")
+
+    def with_changes(
+        self,
+        catalog: CompactCatalog,
+        added: Sequence[Grant],
+        retired: Iterable[int],
+        deadline_order: Sequence[int],
+        deadlines: Sequence[date]
+    ) -> "GrantSearchIndex":
+        """
+        Index of catalog (this index's catalog with added appended and positions retired),
+        built from this one instead of from scratch; this index is left untouched.
+        """
+        start, size = self.size, len(catalog)
+        index = GrantSearchIndex.__new__(GrantSearchIndex)
+        index.size = size
+        active = np.concatenate([bitsets.to_mask(self.active, start), np.ones(size - start, dtype=bool)])
+        active[list(retired)] = False
+        index.active = bitsets.from_mask(active)
+        index.facets = {}
+        for name, facet in self.facets.items():
+            additions = defaultdict(list)
+            for position, grant in enumerate(added, start=start):
+                for value in set(_FACET_VALUES[name](grant)):
+                    additions[value].append(position)
+            index.facets[name] = facet.extend(additions, size)
+        index.amount = catalog.column("amount")
+        index.deadline = np.concatenate(
+            [self.deadline, np.array([d.toordinal() for d in deadlines[start:]], dtype=np.int64)]
+        )
+        index.deadline_order = np.asarray(deadline_order, dtype=np.int64)
+        # New positions follow every existing one, so each goes after the grants of equal amount
+        new = np.arange(start, size)
+        new = new[np.argsort(-index.amount[new], kind="stable")]
+        keys = -index.amount[self.amount_order]
+        index.amount_order = np.insert(
+            self.amount_order, np.searchsorted(keys, -index.amount[new], side="right"), new
+        )
+        return index
+
+    def search(
+        self,
+        text_index,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Sequence[str]]] = None,
+        min_amount: Optional[int] = None,
+        max_amount: Optional[int] = None,
+        deadline_from: Optional[date] = None,
+        deadline_to: Optional[date] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> SearchResult:
+        """
+        One page of the grants matching everything given, with the facet counts.
+
+        filters maps facet names to accepted values (any of them, case-insensitive).
+        sort defaults to relevance with a query and to deadline without one;
+        text_index is the matcher's (its rows are the catalog positions).
+        """
+        filters = {name: values for name, values in (filters or {}).items() if values}
+        sort = sort or ("relevance" if query else "deadline")
+        base = self.active
+        hits = scores = None
+        if query:
+            limit_hits = config.SEARCH_TEXT_HITS or self.size
+            hits, scores = text_index.scored_candidates(text_index.transform([query]), limit_hits)
+            base = base & bitsets.from_positions(hits, self.size)
+        bounds = (
+            (self.amount, min_amount, max_amount),
+            (self.deadline, deadline_from and deadline_from.toordinal(), deadline_to and deadline_to.toordinal()),
+        )
+        for column, low, high in bounds:
+            if low is not None:
+                base = base & bitsets.from_mask(column >= low)
+            if high is not None:
+                base = base & bitsets.from_mask(column <= high)
+
+        selected = {name: self.facets[name].select(values, self.size) for name, values in filters.items()}
+        facets = {}
+        for name, facet in self.facets.items():
+            bits = base
+            for other, chosen in selected.items():
+                if other != name:
+                    bits = bits & chosen
+            facets[name] = facet.counts(bits, filters.get(name, ()))
+        matched = base
+        for chosen in selected.values():
+            matched = matched & chosen
+
+        mask = bitsets.to_mask(matched, self.size)
+        total = int(mask.sum())
+        if sort == "relevance" and hits is not None:
+            keep = mask[hits]
+            positions = self._top(hits[keep], scores[keep], offset + limit)[offset:]
+        else:
+            order = self.amount_order if sort == "amount" else self.deadline_order
+            positions = order[mask[order]][offset:offset + limit]
+        return SearchResult(positions, total, facets)
+
+    @staticmethod
+    def _top(rows: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """The k best rows by score, best first (ties in catalog order, so pages never overlap)"""
+        if k < len(rows):
+            # Only rows scoring at least the k-th best are sorted; all of its ties are kept
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            rows, scores = rows[keep], scores[keep]
+        return rows[np.lexsort((rows, -scores))][:k]
@@ -0,0 +1,100 @@
+"""
+On-disk TF-IDF index - fitted vocabulary, IDF weights and the sparse grant matrix
+
+Each index lives in its own directory named after the catalog key, so a changed
+grants.json (or vectorizer settings) simply misses and triggers a rebuild. The
+matrix is stored as raw .npy arrays and loaded memory-mapped, which lets every
+worker on the host share the same pages instead of holding a private copy.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Optional, Tuple
+import numpy as np
+from scipy import sparse
+
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Bump when the on-disk layout or the grant text recipe changes
+INDEX_FORMAT_VERSION = 1
+
+_MATRIX_PARTS = ("data", "indices", "indptr")
+
+
+def catalog_key(catalog_bytes: bytes, vectorizer: "TfidfVectorizer") -> str:
+    """Stable key for a catalog file + vectorizer configuration"""
+    digest = hashlib.sha256()
+    digest.update(f"v{INDEX_FORMAT_VERSION}".encode())
+    digest.update(repr(sorted(vectorizer.get_params().items())).encode())
+    digest.update(catalog_bytes)
+    return digest.hexdigest()[:32]
+
+
+def save_index(index_dir: str, key: str, vectorizer: "TfidfVectorizer", matrix: sparse.csr_matrix) -> str:
+    """
+    Write a fitted index under index_dir/key.
+
+    The files are written to a temporary directory first and renamed into place,
+    so concurrent builders (e.g. several workers starting together) never expose
+    a partial index. Returns the final index path.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    final_path = os.path.join(index_dir, key)
+    tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=index_dir)
+    try:
+        matrix = matrix.tocsr()
+        matrix.sort_indices()
+        for part in _MATRIX_PARTS:
+            np.save(os.path.join(tmp_path, f"{part}.npy"), getattr(matrix, part))
+        np.save(os.path.join(tmp_path, "idf.npy"), vectorizer.idf_)
+        with open(os.path.join(tmp_path, "vocabulary.json"), "w") as f:
+            json.dump({term: int(col) for term, col in vectorizer.vocabulary_.items()}, f)
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"key": key, "shape": list(matrix.shape), "format": INDEX_FORMAT_VERSION}, f)
+        os.replace(tmp_path, final_path)
+    except OSError:
+        # Another process won the race; its index is identical
+        if not os.path.isdir(final_path):
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return final_path
+
+
+def load_index(
+    index_dir: str, key: str, vectorizer: "TfidfVectorizer", mmap: bool = True
+) -> Optional[Tuple["TfidfVectorizer", sparse.csr_matrix]]:
+    """
+    Load the index for key into the given (unfitted) vectorizer.
+
+    Returns None if no index exists for this key.
+    """
+    path = os.path.join(index_dir, key)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("key") != key or meta.get("format") != INDEX_FORMAT_VERSION:
+        return None
+
+    mmap_mode = "r" if mmap else None
+    parts = tuple(np.load(os.path.join(path, f"{part}.npy"), mmap_mode=mmap_mode) for part in _MATRIX_PARTS)
+    matrix = sparse.csr_matrix(parts, shape=tuple(meta["shape"]), copy=False)
+
+    with open(os.path.join(path, "vocabulary.json")) as f:
+        vectorizer.vocabulary_ = json.load(f)
+    vectorizer.idf_ = np.load(os.path.join(path, "idf.npy"))
+    return vectorizer, matrix
+
+
+def prune_indexes(index_dir: str, keep: Optional[str]) -> None:
+    """Remove indexes for catalog versions other than keep (all of them if keep is None)"""
+    if not os.path.isdir(index_dir):
+        return
+    for name in os.listdir(index_dir):
+        if name != keep and not name.startswith("."):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
@@ -0,0 +1,107 @@
+"""
+Runtime grant ingestion - add, update and retire grants without a full TF-IDF re-fit
+
+New grant rows are appended to every index using the fitted vocabulary (with
+hashed columns for unseen terms); retired grants become tombstones. Each change
+builds a new catalog snapshot and swaps it in atomically. Once the vocabulary
+drift of the ingested text crosses a threshold, a full re-fit runs in a
+background thread and swaps in a compacted catalog. Changes are persisted in
+the grant change log (see grant_changes) before they are swapped in.
+"""
+import logging
+import threading
+from typing import List
+from app import config
+from app.models.grant import Grant, IngestResult
+from app.services.catalog import CatalogState, CatalogSnapshot, catalog_state
+from app.services.embeddings import embeddings_service
+from app.services.grant_changes import grant_change_log, grant_record
+from app.services.grant_repository import GrantRepository
+from app.services.matcher import MatcherService
+
+logger = logging.getLogger(__name__)
+
+
+class GrantNotFoundError(KeyError):
+    pass
+
+
+class GrantExistsError(ValueError):
+    pass
+
+
+class IngestionService:
+    def __init__(self, state: CatalogState, drift_threshold: float = config.REFIT_DRIFT_THRESHOLD):
+        self.state = state
+        self.drift_threshold = drift_threshold
+        self._refit_scheduled = False
+
+    def add(self, grant: Grant) -> IngestResult:
+        with self.state.lock:
+            if self.state.get_repository().get(grant.id):
+                raise GrantExistsError(grant.id)
+            return self._apply(grant.id, added=[grant], retired=[])
+
+    def update(self, grant: Grant) -> IngestResult:
+        """Replace a grant: the old row is retired and the new version appended"""
+        with self.state.lock:
+            position = self.state.get_repository().position(grant.id)
+            if position is None:
+                raise GrantNotFoundError(grant.id)
+            return self._apply(grant.id, added=[grant], retired=[position])
+
+    def retire(self, grant_id: str) -> IngestResult:
+        with self.state.lock:
+            position = self.state.get_repository().position(grant_id)
+            if position is None:
+                raise GrantNotFoundError(grant_id)
+            return self._apply(grant_id, added=[], retired=[position])
+
+    def _apply(self, grant_id: str, added: List[Grant], retired: List[int]) -> IngestResult:
+        # Caller holds the lock; make sure the matcher exists so both sides stay aligned
+        self.state.get_matcher()
+        snapshot = self.state.snapshot()
+        repository = snapshot.repository.with_changes(added, retired)
+        matcher = snapshot.matcher.apply_changes(added, retired, grants=repository.grants)
+        # Ready before it is published, so no search request builds it
+        repository.search_index
+        # Logged before it is published: if the write fails, the live catalog is left unchanged
+        grant_change_log.append(grant_id, grant_record(added[0]) if added else None)
+        snapshot = self.state.swap(repository, matcher)
+        embeddings_service.swap(matcher.text_index)
+
+        drift = matcher.text_index.vocabulary_drift
+        scheduled = drift >= self.drift_threshold and self._schedule_refit()
+        return IngestResult(
+            grant_id=grant_id,
+            catalog_version=snapshot.version,
+            vocabulary_drift=round(drift, 4),
+            refit_scheduled=scheduled
+        )
+
+    def _schedule_refit(self) -> bool:
+        if self._refit_scheduled:
+            return False
+        self._refit_scheduled = True
+        threading.Thread(target=self.refit, name="grantmatch-refit", daemon=True).start()
+        return True
+
+    def refit(self) -> CatalogSnapshot:
+        """Rebuild every index from the active grants and swap the result in"""
+        # Holding the lock only blocks other writers; requests keep reading the old snapshot
+        with self.state.lock:
+            try:
+                grants = self.state.get_repository().active_grants()
+                catalog_bytes = grant_change_log.compact(grants)
+                matcher = MatcherService(grants, catalog_bytes=catalog_bytes, index_dir=config.INDEX_DIR)
+                repository = GrantRepository(grants)
+                repository.search_index
+                snapshot = self.state.swap(repository, matcher)
+                logger.info("Catalog re-fitted: %d grants, version %d", len(grants), snapshot.version)
+                return snapshot
+            finally:
+                self._refit_scheduled = False
+
+
+# Global instance
+ingestion_service = IngestionService(catalog_state)
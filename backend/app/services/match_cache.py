@@ -0,0 +1,139 @@
+"""
+Match score cache - whole-catalog score vectors keyed by profile fingerprint
+
+Entries are keyed by a stable hash of the profile fields that affect matching
+plus the catalog version, so an edited profile or a changed catalog simply
+misses. The cache is an LRU bounded in bytes with a per-entry TTL.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+from app import config
+from app.models.user import UserProfile
+from app.services.scoring import ScoreColumns
+
+CacheKey = Tuple[str, int]
+
+
+def matching_fingerprint(profile: UserProfile) -> str:
+    """Stable hash of the profile fields the matcher reads (id, credentials etc. excluded)"""
+    fields = {
+        "user_type": profile.user_type,
+        "domains": profile.domains,
+        "country": profile.location.country,
+        "stage": profile.stage,
+        "organization": [profile.organization.type, profile.organization.registered, profile.organization.team_size],
+        "project": [
+            profile.project.title, profile.project.description,
+            profile.project.keywords, profile.project.funding_needed
+        ],
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+class MatchCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (expiry, scores, ids of the stored profiles the entry was cached for)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, ScoreColumns, Set[str]]]" = OrderedDict()
+        self._keys_by_profile: Dict[str, Set[CacheKey]] = {}
+        self._catalog_version = 0
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _on_catalog_version(self, version: int):
+        # Scores from an older catalog are never valid again
+        if version != self._catalog_version:
+            self._entries.clear()
+            self._keys_by_profile.clear()
+            self.bytes = 0
+            self._catalog_version = version
+
+    def _drop(self, key: CacheKey):
+        _, scores, owners = self._entries.pop(key)
+        self.bytes -= scores.nbytes
+        for profile_id in owners:
+            keys = self._keys_by_profile.get(profile_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_profile[profile_id]
+
+    def get(self, profile: UserProfile, catalog_version: int) -> Optional[ScoreColumns]:
+        key = (matching_fingerprint(profile), catalog_version)
+        with self._lock:
+            self._on_catalog_version(catalog_version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, profile: UserProfile, catalog_version: int, scores: ScoreColumns):
+        key = (matching_fingerprint(profile), catalog_version)
+        if scores.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._on_catalog_version(catalog_version)
+            owners: Set[str] = set()
+            if key in self._entries:
+                # Profiles with the same matching fields share the entry
+                owners = self._entries[key][2]
+                self._drop(key)
+            if profile.id:
+                owners.add(profile.id)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, scores, owners)
+            self.bytes += scores.nbytes
+            for profile_id in owners:
+                self._keys_by_profile.setdefault(profile_id, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(
+        self, profile: UserProfile, catalog_version: int, compute: Callable[[], ScoreColumns]
+    ) -> ScoreColumns:
+        scores = self.get(profile, catalog_version)
+        if scores is None:
+            scores = compute()
+            self.put(profile, catalog_version, scores)
+        return scores
+
+    def invalidate_profile(self, profile_id: str):
+        """Drop the entries cached for a stored profile (call when it is updated)"""
+        with self._lock:
+            for key in self._keys_by_profile.pop(profile_id, ()):
+                if key in self._entries:
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_profile.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Global instance
+match_cache = MatchCache(max_bytes=config.MATCH_CACHE_MAX_BYTES, ttl_seconds=config.MATCH_CACHE_TTL_SECONDS)
@@ -0,0 +1,136 @@
+"""
+Match cursors - ranked match results kept for paging through them
+
+The first page of a paged /match ranks the profile's matches once (up to
+MATCH_PAGE_MAX_RESULTS) and keeps the ranked catalog rows and their scores
+here, together with the matcher they came from so every page sees the same
+catalog. Cursor tokens are opaque: they name a stored ranking and an offset
+into it, so later pages only build and serialize their slice of results.
+
+Rankings are held in an LRU bounded in bytes and expire ttl_seconds after
+they were ranked; they are process-local, so a cursor only works on the
+worker that issued it. A ranking pins its catalog snapshot, which the byte
+bound does not count, so rankings are dropped once the catalog version changes.
+"""
+import base64
+import binascii
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+import numpy as np
+from app import config
+from app.models.user import ReadinessScore, UserProfile
+from app.services.matcher import MatcherService
+from app.services.scoring import ScoreColumns
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a cursor token that was not issued by this service"""
+
+
+class RankedMatches(NamedTuple):
+    matcher: MatcherService
+    catalog_version: int  # of the snapshot matcher belongs to
+    profile: UserProfile
+    readiness: ReadinessScore
+    rows: np.ndarray  # catalog rows, best first
+    scores: ScoreColumns  # aligned with rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.scores.nbytes
+
+
+class CursorStore:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 600, max_page_size: int = 100):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # Tokens are not signed, so the page size they carry is checked like a requested one
+        self.max_page_size = max_page_size
+        self._entries: "OrderedDict[str, Tuple[float, RankedMatches]]" = OrderedDict()
+        self._catalog_version = 0
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidated = 0
+
+    def _on_catalog_version(self, version: int):
+        # Rankings of an older catalog would keep its whole snapshot alive; drop them
+        if version > self._catalog_version:
+            self.invalidated += len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+            self._catalog_version = version
+
+    def _drop(self, key: str):
+        _, ranked = self._entries.pop(key)
+        self.bytes -= ranked.nbytes
+
+    def put(self, ranked: RankedMatches) -> str:
+        """Keep a ranking; returns its key (see token)"""
+        key = secrets.token_urlsafe(12)
+        with self._lock:
+            self._on_catalog_version(ranked.catalog_version)
+            if ranked.catalog_version < self._catalog_version:
+                # Ranked against a catalog replaced meanwhile: not kept, its cursor reads as expired
+                return key
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, ranked)
+            self.bytes += ranked.nbytes
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return key
+
+    @staticmethod
+    def token(key: str, offset: int, page_size: int) -> str:
+        """Cursor for the page_size results of ranking key from offset on"""
+        return base64.urlsafe_b64encode(f"{key}:{offset}:{page_size}".encode()).decode().rstrip("=")
+
+    def get(self, token: str, catalog_version: int) -> Optional[Tuple[str, RankedMatches, int, int]]:
+        """
+        (key, ranking, offset, page_size) a cursor points at; None once the ranking
+        expired, was evicted or was ranked against an older catalog than catalog_version.
+        """
+        try:
+            key, offset, page_size = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split(":")
+            offset, page_size = int(offset), int(page_size)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursorError(f"Invalid cursor '{token}'")
+        if offset < 0 or not 1 <= page_size <= self.max_page_size:
+            raise InvalidCursorError(f"Invalid cursor '{token}'")
+        with self._lock:
+            self._on_catalog_version(catalog_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return key, entry[1], offset, page_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidated": self.invalidated,
+        }
+
+
+# Global instance
+match_cursors = CursorStore(
+    max_bytes=config.MATCH_CURSOR_MAX_BYTES,
+    ttl_seconds=config.MATCH_CURSOR_TTL_SECONDS,
+    max_page_size=config.MATCH_PAGE_MAX_SIZE
+)
@@ -1,26 +1,90 @@
 """
 Main Grant Matching Service - combines all scoring components
 """
-from typing import List
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from app import config
 from app.models.user import UserProfile
 from app.models.grant import Grant, MatchResult
 from app.services.embeddings import embeddings_service
 from app.services.eligibility import check_eligibility, get_eligibility_status
 from app.services.explainer import generate_explanation
+from app.services import bitsets
+from app.services.compact_catalog import CompactCatalog, as_catalog
+from app.services.eligibility_index import EligibilityIndex
+from app.services.metrics import StageClock, registry, timed
+from app.services.scoring import DOMAIN_WEIGHT, ELIGIBILITY_WEIGHT, ScoringIndex, ScoreColumns, top_k_indices
+
+# Profiles scored together per matrix product in match_batch
+BATCH_CHUNK_SIZE = 64
+
+# Hybrid retrieval: candidates per source, and the catalog size from which match() uses them
+CANDIDATE_POOL_SIZE = config.MATCH_CANDIDATES
+HYBRID_MIN_GRANTS = config.HYBRID_MIN_GRANTS
+
+
+def grant_text(grant: Grant) -> str:
+    """Searchable text for a grant (the TF-IDF corpus document)"""
+    return f"{grant.name} {grant.description} {' '.join(grant.focus_areas)} {' '.join(grant.tags)}"
+
+
+def record_text(record: dict) -> str:
+    """grant_text of a grant's JSON record (see CompactCatalog.records)"""
+    return f"{record['name']} {record['description']} {' '.join(record['focus_areas'])} {' '.join(record['tags'])}"
 
 
 class MatcherService:
-    def __init__(self, grants: List[Grant]):
-        self.grants = grants
-        self._prepare_embeddings()
+    def __init__(self, grants: Sequence[Grant], catalog_bytes: Optional[bytes] = None, index_dir: Optional[str] = None):
+        start = time.perf_counter()
+        self.grants = as_catalog(grants)
+        self.index_loaded = self._prepare_embeddings(catalog_bytes, index_dir)
+        # Pin the snapshot this matcher was built with; a later refit swaps in a new one
+        self.text_index = embeddings_service.index
+        self.scoring = ScoringIndex(grants)
+        self.eligibility_index = EligibilityIndex(grants)
+        self.active_rows: Optional[np.ndarray] = None  # None while no grant is retired
+        self.positions: Dict[str, int] = {g.id: i for i, g in enumerate(grants)}
+        # Seconds spent building (or loading) the indexes of this catalog
+        self.build_seconds = time.perf_counter() - start
+        registry.observe_stage("index.build", self.build_seconds)
     
-    def _prepare_embeddings(self):
-        """Prepare TF-IDF embeddings for all grants"""
-        grant_texts = [
-            f"{g.name} {g.description} {' '.join(g.focus_areas)} {' '.join(g.tags)}"
-            for g in self.grants
-        ]
-        embeddings_service.fit(grant_texts)
+    def apply_changes(
+        self, added: List[Grant], retired: List[int], grants: Optional[CompactCatalog] = None
+    ) -> "MatcherService":
+        """
+        New matcher with grants appended and catalog rows retired, without a TF-IDF refit.
+        
+        This matcher is left untouched so in-flight requests keep a consistent view.
+        grants may pass the already extended catalog (e.g. the repository's) to share it.
+        """
+        start = time.perf_counter()
+        matcher = MatcherService.__new__(MatcherService)
+        matcher.grants = grants if grants is not None else self.grants.extend(added)
+        matcher.index_loaded = self.index_loaded
+        matcher.build_seconds = self.build_seconds
+        matcher.text_index = self.text_index.append([grant_text(g) for g in added]) if added else self.text_index
+        matcher.scoring = self.scoring.append(added) if added else self.scoring
+        matcher.eligibility_index = self.eligibility_index.append(added) if added else self.eligibility_index
+        if retired:
+            matcher.scoring = matcher.scoring.retire(retired)
+            matcher.eligibility_index = matcher.eligibility_index.retire(retired)
+        active = matcher.scoring.active
+        matcher.active_rows = None if active.all() else np.flatnonzero(active)
+        retired_rows = set(retired)
+        matcher.positions = {grant_id: i for grant_id, i in self.positions.items() if i not in retired_rows}
+        matcher.positions.update((g.id, len(self.grants) + i) for i, g in enumerate(added))
+        registry.observe_stage("index.apply_changes", time.perf_counter() - start)
+        return matcher
+    
+    def _prepare_embeddings(self, catalog_bytes: Optional[bytes], index_dir: Optional[str]) -> bool:
+        """Prepare TF-IDF embeddings for all grants, reusing a prebuilt index when available"""
+        grant_texts = [record_text(r) for r in self.grants.records()]
+        if catalog_bytes is None:
+            embeddings_service.fit(grant_texts)
+            return False
+        return embeddings_service.load_or_fit(grant_texts, catalog_bytes, index_dir)
     
     def _create_user_text(self, profile: UserProfile) -> str:
         """Create searchable text from user profile"""
@@ -29,49 +93,210 @@ class MatcherService:
             f"{' '.join(profile.domains)} {' '.join(profile.project.keywords)}"
         )
     
-    def _calculate_domain_match(self, profile: UserProfile, grant: Grant) -> float:
-        """Calculate domain overlap score (0-1)"""
-        user_domains = set(d.lower() for d in profile.domains)
-        grant_areas = set(a.lower() for a in grant.focus_areas)
-        if not user_domains or not grant_areas:
-            return 0.5
-        overlap = len(user_domains & grant_areas)
-        return overlap / max(len(user_domains), len(grant_areas))
+    @property
+    def vocabulary_key(self) -> str:
+        """Key of the TF-IDF vocabulary profile vectors must have been computed with"""
+        return self.text_index.vocabulary_key
     
-    def _calculate_strategic_fit(self, profile: UserProfile, grant: Grant) -> float:
-        """Calculate strategic fit bonus score (0-1)"""
-        score = 0.5
-        if profile.stage in grant.eligibility.stages and profile.stage in ["prototype", "registered"]:
-            score += 0.2
-        if profile.location.country in grant.eligibility.location:
-            score += 0.15
-        if grant.amount >= profile.project.funding_needed > 0:
-            score += 0.15
-        return min(1.0, score)
+    def profile_vectors(self, profiles: List[UserProfile]) -> sparse.csr_matrix:
+        """TF-IDF vectors of the profiles' text (one row each) in this matcher's vocabulary"""
+        return self.text_index.transform([self._create_user_text(p) for p in profiles])
     
-    def match(self, profile: UserProfile, top_k: int = 25) -> List[MatchResult]:
-        """Match user profile to grants using multi-factor scoring"""
-        user_text = self._create_user_text(profile)
-        similar_items = embeddings_service.find_similar(user_text, top_k=len(self.grants))
+    def score_batch(
+        self,
+        profiles: List[UserProfile],
+        rows: Optional[np.ndarray] = None,
+        vectors: Optional[sparse.csr_matrix] = None
+    ) -> ScoreColumns:
+        """
+        Score grants for several profiles at once (profiles x grants arrays).
         
-        results = []
-        for grant_idx, semantic_sim in similar_items:
-            grant = self.grants[grant_idx]
-            domain_score = self._calculate_domain_match(profile, grant)
-            eligibility_score, issues, actions = check_eligibility(profile, grant.eligibility)
-            strategic_score = self._calculate_strategic_fit(profile, grant)
-            
-            final_score = semantic_sim*0.40 + domain_score*0.25 + eligibility_score*0.20 + strategic_score*0.15
-            match_score = int(min(100, max(0, final_score * 100)))
-            
-            results.append(MatchResult(
-                grant=grant, match_score=match_score,
-                eligibility_status=get_eligibility_status(eligibility_score, issues),
-                eligibility_issues=issues,
-                explanation=generate_explanation(profile, grant, semantic_sim, domain_score, eligibility_score, issues, actions),
-                semantic_score=semantic_sim, domain_score=domain_score,
-                eligibility_score=eligibility_score, strategic_score=strategic_score
-            ))
+        If rows is given only those catalog rows are scored, in that order.
+        vectors may carry precomputed profile_vectors (same vocabulary_key).
+        """
+        scoring = self.scoring if rows is None else self.scoring.take(rows)
+        if not scoring.size:
+            semantic = np.zeros((len(profiles), 0))
+        else:
+            if vectors is None:
+                vectors = self.profile_vectors(profiles)
+            semantic = self.text_index.vector_similarities(vectors, rows)
+        return scoring.score_batch(profiles, semantic)
+    
+    def score_all(
+        self, profile: UserProfile, rows: Optional[np.ndarray] = None, vector: Optional[sparse.csr_matrix] = None
+    ) -> ScoreColumns:
+        """Score every grant (or the given rows) for a profile (columnar, no per-grant objects)"""
+        return self.score_batch([profile], rows, vector).row(0)
+    
+    def score_one(
+        self, profile: UserProfile, grant_id: str, vector: Optional[sparse.csr_matrix] = None
+    ) -> Optional[MatchResult]:
+        """
+        Score a single grant for a profile from its precomputed row (None if unknown or retired).
         
-        results.sort(key=lambda x: x.match_score, reverse=True)
-        return results[:top_k]
+        Uses the same columnar scoring as match, so the score equals the grant's score there.
+        """
+        position = self.positions.get(grant_id)
+        if position is None:
+            return None
+        scores = self.score_all(profile, np.array([position]), vector)
+        clock = StageClock()
+        result = self._build_result(profile, scores, 0, position, clock)
+        clock.record()
+        return result
+    
+    @property
+    def candidate_pool(self) -> int:
+        """Candidates per source match() retrieves before exact scoring (0: score the whole catalog)"""
+        active = len(self.grants) if self.active_rows is None else len(self.active_rows)
+        return CANDIDATE_POOL_SIZE if active >= HYBRID_MIN_GRANTS else 0
+    
+    def candidate_rows(
+        self,
+        profile: UserProfile,
+        pool: int,
+        vector: Optional[sparse.csr_matrix] = None,
+        strict_eligibility: bool = False
+    ) -> np.ndarray:
+        """
+        Sorted catalog rows worth scoring exactly for a profile (retrieval stage).
+        
+        The union of the ``pool`` grants whose text is most similar to the profile
+        (read from the inverted index, or the ANN index for dense vectors) and the
+        ``pool`` best domain-overlap grants, ranked by domain score and eligibility
+        (from the eligibility bitsets). Retired grants are dropped, and with
+        strict_eligibility so are grants that are not near-eligible.
+        """
+        if vector is None:
+            vector = self.profile_vectors([profile])
+        near_eligible = self.eligibility_index.near_eligible(profile)
+        lexical = self.text_index.top_candidates(vector, pool)
+        domain_rows, domain = self.scoring.domain_candidates(profile)
+        near = bitsets.contains(near_eligible, domain_rows)
+        if strict_eligibility:
+            domain_rows, domain, near = domain_rows[near], domain[near], near[near]
+        if len(domain_rows) > pool:
+            # Domain part of the final score plus a rough eligibility part: near-eligible
+            # grants score 0.8-1.0 on eligibility, the others mostly lower
+            estimate = DOMAIN_WEIGHT * domain + ELIGIBILITY_WEIGHT * (0.7 + 0.3 * near)
+            domain_rows = domain_rows[np.argpartition(-estimate, pool - 1)[:pool]]
+        rows = np.union1d(lexical, domain_rows).astype(np.int64)
+        allowed = near_eligible if strict_eligibility else self.eligibility_index.active
+        return rows[bitsets.contains(allowed, rows)]
+    
+    def _build_result(
+        self, profile: UserProfile, scores: ScoreColumns, score_idx: int, grant_idx: int,
+        clock: StageClock
+    ) -> MatchResult:
+        """Materialize the MatchResult, eligibility issues and explanation for one grant (timed on clock)"""
+        grant = self.grants[grant_idx]
+        semantic_sim = float(scores.semantic[score_idx])
+        domain_score = float(scores.domain[score_idx])
+        eligibility_score = float(scores.eligibility[score_idx])
+        _, issues, actions = check_eligibility(profile, grant.eligibility)
+        clock.lap("match.eligibility")
+        explanation = generate_explanation(profile, grant, semantic_sim, domain_score, eligibility_score, issues, actions)
+        clock.lap("match.explanation")
+        
+        # Every value is built here from validated data, so skip pydantic validation
+        result = MatchResult.model_construct(
+            grant=grant, match_score=int(scores.match_score[score_idx]),
+            eligibility_status=get_eligibility_status(eligibility_score, issues),
+            eligibility_issues=issues, explanation=explanation,
+            semantic_score=semantic_sim, domain_score=domain_score,
+            eligibility_score=eligibility_score, strategic_score=float(scores.strategic[score_idx])
+        )
+        clock.lap("match.construct")
+        return result
+    
+    def rank(
+        self,
+        profile: UserProfile,
+        limit: int,
+        strict_eligibility: bool = False,
+        scores: Optional[ScoreColumns] = None,
+        vector: Optional[sparse.csr_matrix] = None,
+        candidate_pool: Optional[int] = None
+    ) -> Tuple[np.ndarray, ScoreColumns]:
+        """
+        Catalog rows of the best ``limit`` grants for a profile, best first, with their scores.
+        
+        Phase 1 of match (see there for the arguments); ``results`` turns any
+        slice of the ranking into MatchResults.
+        """
+        pool = self.candidate_pool if candidate_pool is None else candidate_pool
+        if scores is None and vector is None:
+            with timed("match.transform"):
+                vector = self.profile_vectors([profile])
+        with timed("match.retrieve"):
+            if scores is None and pool > 0:
+                rows = self.candidate_rows(profile, pool, vector, strict_eligibility)
+            elif strict_eligibility:
+                rows = self.eligibility_index.candidates(profile)
+            else:
+                rows = self.active_rows
+        # Score the catalog (or the candidates) as arrays
+        with timed("match.score"):
+            if scores is None:
+                scores = self.score_all(profile, rows, vector)
+            elif rows is not None:
+                scores = scores.take(rows)
+        with timed("match.rank"):
+            ranked = top_k_indices(scores, limit)
+        return (ranked if rows is None else rows[ranked]), scores.take(ranked)
+    
+    def results(self, profile: UserProfile, rows: np.ndarray, scores: ScoreColumns) -> List[MatchResult]:
+        """Phase 2 of match: result objects and explanations for ranked rows and their scores (from rank)"""
+        clock = StageClock()
+        results = [self._build_result(profile, scores, i, int(row), clock) for i, row in enumerate(rows)]
+        clock.record()
+        return results
+    
+    def match(
+        self,
+        profile: UserProfile,
+        top_k: int = 25,
+        strict_eligibility: bool = False,
+        scores: Optional[ScoreColumns] = None,
+        vector: Optional[sparse.csr_matrix] = None,
+        candidate_pool: Optional[int] = None
+    ) -> List[MatchResult]:
+        """
+        Match user profile to grants using multi-factor scoring.
+        
+        With strict_eligibility only grants passing the eligibility pre-filter
+        (country, user type and stage) are scored. ``scores`` may carry
+        precomputed whole-catalog scores (e.g. from the match cache) to skip phase 1.
+        
+        On large catalogs (see candidate_pool; ``candidate_pool`` overrides it,
+        0 forcing an exhaustive pass) only the rows from candidate_rows are scored.
+        """
+        # Phase 1: score as arrays; phase 2: build result objects only for the top_k survivors
+        rows, ranked = self.rank(profile, top_k, strict_eligibility, scores, vector, candidate_pool)
+        return self.results(profile, rows, ranked)
+    
+    def match_batch(
+        self, profiles: List[UserProfile], top_k: int = 25, strict_eligibility: bool = False
+    ) -> List[List[MatchResult]]:
+        """Match many profiles in one pass; returns per-profile top_k results in input order"""
+        results = []
+        # Chunk so the dense profiles x grants score arrays stay bounded in memory
+        for start in range(0, len(profiles), BATCH_CHUNK_SIZE):
+            chunk = profiles[start:start + BATCH_CHUNK_SIZE]
+            with timed("match_batch.score"):
+                scores = self.score_batch(chunk)
+            clock = StageClock()
+            for i, profile in enumerate(chunk):
+                row = scores.row(i)
+                if strict_eligibility:
+                    # Candidate sets differ per profile, so drop ineligible grants from the ranking
+                    ineligible = ~bitsets.to_mask(self.eligibility_index.near_eligible(profile), len(self.grants))
+                    row.match_score = np.where(ineligible, -1, row.match_score)
+                elif self.active_rows is not None:
+                    row.match_score = np.where(self.scoring.active, row.match_score, -1)
+                ranked = [int(j) for j in top_k_indices(row, top_k) if row.match_score[j] >= 0]
+                clock.lap("match_batch.rank")
+                results.append([self._build_result(profile, row, j, j, clock) for j in ranked])
+            clock.record()
+        return results
@@ -0,0 +1,164 @@
+"""
+Metrics - per-stage latency histograms and the Prometheus text exposition
+
+Stages are timed with ``timed(stage)`` (or a StageClock for many short laps,
+e.g. per-result work inside a loop) and recorded in fixed-bucket histograms:
+one bisect and three increments per observation, no allocation.
+
+``render()`` writes every histogram plus the registered gauges (cache hit
+rates, catalog size, index build time...) in the Prometheus text format for
+the /metrics endpoint.
+
+While a request collects Server-Timing entries (see start_request_timing),
+the stages it runs are also added to its own timing list. The list lives in
+a context variable, so it follows the request into executor threads (the
+execution backend runs calls in a copy of the caller's context).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency buckets, +Inf implied
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+STAGE_METRIC = "grantmatch_stage_seconds"
+REQUEST_METRIC = "grantmatch_request_seconds"
+
+# (stage, seconds) recorded during the current request, when it asked for Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, label: str, value: str) -> Histogram:
+        key = (name, label, value)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.histogram(STAGE_METRIC, "stage", stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    def register_gauges(self, prefix: str, help_text: str, collect: Callable[[], Dict[str, float]]):
+        """
+        Expose collect()'s values as gauges named <prefix>_<key>.
+
+        collect is called on every scrape, so it should only read counters.
+        """
+        self._gauges[prefix] = (help_text, collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        families: Dict[str, List[Tuple[str, str, Histogram]]] = {}
+        for (name, label, value), histogram in sorted(self._histograms.items()):
+            families.setdefault(name, []).append((label, value, histogram))
+        for name, members in families.items():
+            lines.append(f"# TYPE {name} histogram")
+            for label, value, histogram in members:
+                counts, total, count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket in zip(histogram.bounds + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{value}"}} {total!r}')
+                lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+        for prefix, (help_text, collect) in sorted(self._gauges.items()):
+            for key, value in collect().items():
+                lines.append(f"# HELP {prefix}_{key} {help_text}")
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of the block as one observation of stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_stage(stage, time.perf_counter() - start)
+
+
+class StageClock:
+    """
+    Accumulates laps per stage and records each stage once at the end.
+
+    For stages that run many times per request (per-result eligibility checks,
+    explanations...) so the histogram gets one observation per request.
+    """
+    __slots__ = ("_last", "_totals")
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self._totals: Dict[str, float] = {}
+
+    def lap(self, stage: str):
+        """Charge the time since the previous lap (or creation) to stage"""
+        now = time.perf_counter()
+        self._totals[stage] = self._totals.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def record(self):
+        for stage, seconds in self._totals.items():
+            registry.observe_stage(stage, seconds)
+        self._totals.clear()
+
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    """Collect the stages of the current request (call at the start of the request's task)"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value: one entry per stage (durations summed), plus the total"""
+    durations: Dict[str, float] = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    entries = [f"{stage.replace('.', '-')};dur={seconds * 1000:.3f}" for stage, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+# Global instance
+registry = MetricsRegistry()
@@ -0,0 +1,447 @@
+"""
+Profile index - stored profiles as columns, for reverse matching (grant -> profiles)
+
+The profile-side counterpart of ScoringIndex and EligibilityIndex: every
+stored profile's TF-IDF vector is a row of one sparse matrix, its domains are
+codes, and each eligibility attribute (user type, stage, country,
+organization type) maps its values to bitsets of profiles. Ranking the
+profiles for a grant is one sparse product plus a few array operations, with
+the same sub-score rules and weights as match().
+
+The index follows the profile store. A store listener queues every write,
+and the queue is applied at the next query (vectors missing or computed under
+another vocabulary are transformed in one call). A written profile is
+therefore ranked by the very next query. A changed profile retires its old
+row and appends a new one. Profiles written by other workers (SQLite store)
+are picked up every sync_interval seconds. The index is rebuilt from the
+store when the matcher's vocabulary changes, and when retired rows outnumber
+live ones. Rebuilds run on a background thread; queries keep using the
+previous build (with its own matcher) until the new one is swapped in, and
+encode grants added since in that build's vocabulary.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from app import config
+from app.models.grant import Grant
+from app.models.user import UserProfile
+from app.services import bitsets
+from app.services.eligibility import get_eligibility_status
+from app.services.grant_repository import GLOBAL_LOCATION
+from app.services.matcher import MatcherService, grant_text
+from app.services.metrics import timed
+from app.services.profile_store import ProfileRecord, ProfileStore, get_profile_store
+from app.services.scoring import BONUS_STAGES, top_k_indices, weighted_scores
+
+logger = logging.getLogger(__name__)
+
+# Profile attributes with per-value bitsets
+ATTRIBUTES: Dict[str, Callable[[UserProfile], str]] = {
+    "user_type": lambda p: p.user_type,
+    "stage": lambda p: p.stage,
+    "country": lambda p: p.location.country,
+    "org_type": lambda p: p.organization.type,
+}
+
+# Records applied (and vectors transformed) per call during a rebuild
+REBUILD_CHUNK_SIZE = 1024
+
+# Profiles scored per similarity call, so dense vectors are never expanded for every profile at once
+SCORE_CHUNK_SIZE = 16384
+
+# Catch-up reads start this far before the previous sync (other workers commit after stamping)
+SYNC_SLACK_SECONDS = 1.0
+
+
+class _Buffer:
+    """Append-only NumPy array with amortized O(1) appends"""
+    __slots__ = ("array", "size")
+
+    def __init__(self, dtype, values: Iterable = ()):
+        values = np.asarray(list(values), dtype=dtype)
+        self.array = np.zeros(max(len(values), 64), dtype=dtype)
+        self.array[:len(values)] = values
+        self.size = len(values)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.array.dtype)
+        end = self.size + len(values)
+        if end > len(self.array):
+            grown = np.zeros(max(end, 2 * len(self.array)), dtype=self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self) -> np.ndarray:
+        return self.array[:self.size]
+
+
+class _Columns:
+    """One build of the index: the rows of the stored profiles under one vocabulary"""
+
+    def __init__(self, matcher: MatcherService):
+        # Profile vectors are computed (and grant vectors read) with a matcher of this vocabulary
+        self.matcher = matcher
+        self.vocabulary_key = matcher.vocabulary_key
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._active = _Buffer(np.bool_)
+        self._fingerprints = _Buffer(np.int64)
+        self.retired = 0
+        # Growing CSR matrix of profile vectors
+        self._width = 0
+        self._indptr = _Buffer(np.int64, [0])
+        self._indices = _Buffer(np.int32)
+        self._data = _Buffer(np.float64)
+        self._postings: Optional[sparse.csc_matrix] = None
+        # (row, domain code) pairs of each profile's lowercased domains
+        self._domain_vocab: Dict[str, int] = {}
+        self._domain_rows = _Buffer(np.int64)
+        self._domain_codes = _Buffer(np.int32)
+        self._domain_counts = _Buffer(np.int64)
+        # attribute -> value -> bitset; every bitset is sized for _bit_capacity rows
+        self._bits: Dict[str, Dict[str, np.ndarray]] = {name: {} for name in ATTRIBUTES}
+        self._bit_capacity = 0
+        self._team_size = _Buffer(np.int64)
+        self._unregistered = _Buffer(np.bool_)
+        self._funding_needed = _Buffer(np.int64)
+
+    def __len__(self) -> int:
+        """Live (not retired) profiles"""
+        return len(self.ids) - self.retired
+
+    def apply(self, records: List[ProfileRecord]):
+        """Index records with distinct profile ids, replacing earlier rows of the same profiles"""
+        # Re-writes of an unchanged profile (stored readiness or vector, catch-up reads of
+        # this worker's own writes) keep their row
+        fingerprints = []
+        changed = []
+        for record in records:
+            fingerprint = hash(record.profile.model_dump_json())
+            row = self._rows.get(record.profile.id)
+            if row is None or self._fingerprints.array[row] != fingerprint:
+                fingerprints.append(fingerprint)
+                changed.append(record)
+        records = changed
+        if not records:
+            return
+        vectors = [
+            r.vector.vector if r.vector is not None and r.vector.vocabulary_key == self.vocabulary_key else None
+            for r in records
+        ]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = self.matcher.profile_vectors([records[i].profile for i in missing])
+            for j, i in enumerate(missing):
+                vectors[i] = computed[j]
+        rows = [v.tocsr() for v in vectors]
+        self._width = rows[0].shape[1]
+        self._indices.extend(np.concatenate([r.indices for r in rows]))
+        self._data.extend(np.concatenate([r.data for r in rows]))
+        self._indptr.extend(self._indptr.array[self._indptr.size - 1] + np.cumsum([r.nnz for r in rows]))
+
+        start = len(self.ids)
+        for row, record in enumerate(records, start=start):
+            profile = record.profile
+            previous = self._rows.get(profile.id)
+            if previous is not None:
+                self._active.array[previous] = False
+                self.retired += 1
+            self._rows[profile.id] = row
+            self.ids.append(profile.id)
+            domains = set(d.lower() for d in profile.domains)
+            self._domain_rows.extend([row] * len(domains))
+            self._domain_codes.extend([self._domain_vocab.setdefault(d, len(self._domain_vocab)) for d in domains])
+            for name, get in ATTRIBUTES.items():
+                self._set_bit(name, get(profile), row)
+        profiles = [r.profile for r in records]
+        self._active.extend(np.ones(len(records), dtype=bool))
+        self._fingerprints.extend(fingerprints)
+        self._domain_counts.extend([len(set(d.lower() for d in p.domains)) for p in profiles])
+        self._team_size.extend([p.organization.team_size for p in profiles])
+        self._unregistered.extend([not p.organization.registered for p in profiles])
+        self._funding_needed.extend([p.project.funding_needed for p in profiles])
+
+    def _set_bit(self, attribute: str, value: str, row: int):
+        if row >= self._bit_capacity:
+            self._bit_capacity = (max(64, 2 * self._bit_capacity, row + 1) + 7) // 8 * 8
+            for values in self._bits.values():
+                for key, bits in values.items():
+                    values[key] = np.concatenate([bits, bitsets.empty(self._bit_capacity - 8 * len(bits))])
+        bits = self._bits[attribute].get(value)
+        if bits is None:
+            bits = self._bits[attribute][value] = bitsets.empty(self._bit_capacity)
+        bits[row >> 3] |= np.uint8(1 << (row & 7))
+
+    def _any_of(self, attribute: str, values: Iterable[str], size: int) -> np.ndarray:
+        """Bitset of the profiles whose attribute is one of values"""
+        result = bitsets.empty(size)
+        for value in set(values):
+            bits = self._bits[attribute].get(value)
+            if bits is not None:
+                result |= bits[:len(result)]
+        return result
+
+    def score(self, grant: Grant, strict_eligibility: bool):
+        """(rows, ScoreColumns over those rows): the sub-score rules of ScoringIndex for one grant"""
+        size = len(self.ids)
+        eligibility = grant.eligibility
+        active = self._active.view()
+        user_type_ok = self._any_of("user_type", eligibility.user_types, size)
+        stage_ok = self._any_of("stage", eligibility.stages, size)
+        in_location = self._any_of("country", eligibility.location, size)
+        global_location = GLOBAL_LOCATION in eligibility.location
+        if strict_eligibility:
+            near = user_type_ok & stage_ok & bitsets.from_mask(active)
+            if not global_location:
+                near &= in_location
+            rows = bitsets.to_positions(near, size)
+        else:
+            rows = np.flatnonzero(active)
+
+        def mask(bits: np.ndarray) -> np.ndarray:
+            return bitsets.to_mask(bits, size)[rows]
+
+        semantic = self._semantic(grant, rows)
+
+        focus = set(a.lower() for a in grant.focus_areas)
+        in_focus = np.zeros(len(self._domain_vocab), dtype=bool)
+        in_focus[[self._domain_vocab[f] for f in focus if f in self._domain_vocab]] = True
+        hits = self._domain_rows.view()[in_focus[self._domain_codes.view()]]
+        overlap = np.bincount(hits, minlength=size)[rows]
+        user_counts = self._domain_counts.view()[rows]
+        denom = np.maximum(np.maximum(user_counts, len(focus)), 1)
+        domain = np.where((user_counts == 0) | (len(focus) == 0), 0.5, overlap / denom)
+
+        in_location = mask(in_location)
+        score = np.ones(len(rows))
+        score -= 0.25 * ~mask(user_type_ok)
+        score -= 0.2 * ~mask(stage_ok)
+        if not global_location:
+            score -= 0.3 * ~in_location
+        score -= 0.15 * ~mask(self._any_of("org_type", eligibility.organization_types, size))
+        score -= 0.1 * (self._team_size.view()[rows] < eligibility.min_team_size)
+        score -= 0.2 * (self._unregistered.view()[rows] & eligibility.requires_registration)
+        eligibility_score = np.maximum(0, score)
+
+        score = np.full(len(rows), 0.5)
+        bonus_stages = [s for s in eligibility.stages if s in BONUS_STAGES]
+        score += 0.2 * mask(self._any_of("stage", bonus_stages, size))
+        score += 0.15 * in_location
+        funding_needed = self._funding_needed.view()[rows]
+        score += 0.15 * ((grant.amount >= funding_needed) & (funding_needed > 0))
+        strategic = np.minimum(1.0, score)
+
+        return rows, weighted_scores(semantic, domain, eligibility_score, strategic)
+
+    def _matrix(self, start: int = 0) -> sparse.csr_matrix:
+        """Profile vectors of rows start.. as a CSR matrix over the buffers"""
+        indptr = self._indptr.view()[start:]
+        first = indptr[0]
+        return sparse.csr_matrix(
+            (self._data.view()[first:], self._indices.view()[first:], indptr - first),
+            shape=(len(indptr) - 1, self._width)
+        )
+
+    def _semantic(self, grant: Grant, rows: np.ndarray) -> np.ndarray:
+        """Similarity of the grant's vector to the given profile rows (the values vector_similarities gives)"""
+        size = len(self.ids)
+        if not len(rows):
+            # Also covers an index with no profiles yet, whose matrix has no columns
+            return np.zeros(0)
+        text_index = self.matcher.text_index
+        position = self.matcher.positions.get(grant.id)
+        # A grant added after this build's vocabulary was replaced: encoded in it until the rebuild lands
+        added = text_index.transform([grant_text(grant)]) if position is None else None
+        if not sparse.issparse(text_index.matrix):
+            # Dense vectors: exact products, a chunk of profiles at a time
+            matrix, target = self._matrix(), np.array([position])
+            semantic = np.zeros(len(rows))
+            for start in range(0, len(rows), SCORE_CHUNK_SIZE):
+                chunk = rows[start:start + SCORE_CHUNK_SIZE]
+                if added is not None:
+                    similarities = np.clip((matrix[chunk] @ added.T).toarray()[:, 0], 0.0, 1.0)
+                else:
+                    similarities = text_index.vector_similarities(matrix[chunk], target)[:, 0]
+                semantic[start:start + len(chunk)] = similarities
+            return semantic
+        if self._postings is None or size - self._postings.shape[0] > max(1024, size // 10):
+            # Term -> profiles posting lists, rebuilt once enough rows were appended after them
+            self._postings = self._matrix().tocsc()
+        postings = self._postings
+        grant_vec = text_index.matrix[position] if added is None else added
+        # Only the posting lists of the grant's terms are read. Taken in column order, each
+        # profile's products are summed in the order of its own (sorted) vector, exactly
+        # as in the sparse product match() computes
+        order = np.argsort(grant_vec.indices)
+        spans = [slice(postings.indptr[c], postings.indptr[c + 1]) for c in grant_vec.indices[order]]
+        hit_rows = np.concatenate([postings.indices[span] for span in spans] + [np.zeros(0, dtype=np.int32)])
+        contributions = np.concatenate(
+            [postings.data[span] * w for span, w in zip(spans, grant_vec.data[order])] + [np.zeros(0)]
+        )
+        semantic = np.bincount(hit_rows, weights=contributions, minlength=size)
+        base = postings.shape[0]
+        if base < size:
+            # Rows appended since the posting lists were built
+            semantic[base:] = (self._matrix(base) @ grant_vec.T).toarray()[:, 0]
+        return semantic[rows]
+
+
+class ProfileIndex:
+    def __init__(
+        self, get_store: Callable[[], ProfileStore], sync_interval: float = config.PROFILE_INDEX_SYNC_SECONDS
+    ):
+        """get_store returns the store to follow; it is first called by the first query"""
+        self._get_store = get_store
+        self.store: Optional[ProfileStore] = None
+        self.sync_interval = sync_interval
+        # None until the first query builds the index
+        self._columns: Optional[_Columns] = None
+        # Guards the columns; queries and the writes they apply run one at a time
+        self._lock = threading.Lock()
+        self._pending: Dict[str, ProfileRecord] = {}
+        self._pending_lock = threading.Lock()
+        self._synced_at = 0.0
+        # Writes applied while a rebuild runs, applied again to its result before it is swapped in
+        self._rebuilding = False
+        self._backlog: Dict[str, ProfileRecord] = {}
+
+    def __len__(self) -> int:
+        """Live (not retired) profiles"""
+        return len(self._columns) if self._columns is not None else 0
+
+    @property
+    def vocabulary_key(self) -> Optional[str]:
+        """Vocabulary the served rows were computed under"""
+        return self._columns.vocabulary_key if self._columns is not None else None
+
+    def _queue(self, record: ProfileRecord):
+        # Called on the writer's thread: only queue, the work happens at the next query
+        with self._pending_lock:
+            self._pending[record.profile.id] = record
+
+    def _take_pending(self) -> Dict[str, ProfileRecord]:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def sync(self, matcher: MatcherService):
+        """Bring the index up to date with the store (caller holds the lock)"""
+        store = self._get_store()
+        if store is not self.store:
+            # First query, or the store was reopened: follow the new one from scratch
+            store.subscribe(self._queue)
+            self.store = store
+            self._columns = None
+        if self._columns is None:
+            # Nothing to serve yet, so the first build runs in this query
+            self._columns, self._synced_at = self._build(matcher)
+        columns = self._columns
+        stale = columns.vocabulary_key != matcher.vocabulary_key
+        if stale or columns.retired > max(len(columns), 1024):
+            self._start_rebuild(matcher)
+        if not stale:
+            # Same vocabulary: follow the matcher, so rows keep reading the current catalog's grant vectors
+            columns.matcher = matcher
+
+        records = self._take_pending()
+        if time.time() - self._synced_at >= self.sync_interval:
+            # Flushed first so this worker's own writes read back in their latest version
+            self.store.flush()
+            since, self._synced_at = self._synced_at - SYNC_SLACK_SECONDS, time.time()
+            for record in self.store.changed_since(since):
+                records.setdefault(record.profile.id, record)
+        if self._rebuilding:
+            self._backlog.update(records)
+        if records:
+            columns.apply(list(records.values()))
+
+    def _build(self, matcher: MatcherService) -> Tuple[_Columns, float]:
+        """(columns of every stored profile, time the export started)"""
+        started = time.time()
+        columns = _Columns(matcher)
+        chunk: List[ProfileRecord] = []
+        for record in self.store.export():
+            chunk.append(record)
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                columns.apply(chunk)
+                chunk = []
+        columns.apply(chunk)
+        return columns, started
+
+    def _start_rebuild(self, matcher: MatcherService):
+        # Queries keep using the current columns until the rebuild is swapped in
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        threading.Thread(target=self._rebuild, args=(matcher,), name="grantmatch-profile-index", daemon=True).start()
+
+    def _rebuild(self, matcher: MatcherService):
+        try:
+            with timed("candidates.rebuild"):
+                columns, started = self._build(matcher)
+            with self._lock:
+                # Writes queued or caught up on while the export ran (re-applying one is a no-op)
+                columns.apply(list(self._backlog.values()))
+                self._columns = columns
+                self._synced_at = min(self._synced_at, started)
+        except Exception:
+            logger.exception("Profile index rebuild failed")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._backlog = {}
+
+    def candidates(
+        self, matcher: MatcherService, grant_id: str, top_k: int = 25, strict_eligibility: bool = False
+    ) -> Optional[dict]:
+        """
+        The top_k stored profiles for a grant, best first (None if the grant is unknown or retired).
+
+        Scores are the ones match() gives the grant for each profile. With
+        strict_eligibility only profiles passing the grant's hard requirements
+        (country, user type and stage) are ranked.
+        """
+        position = matcher.positions.get(grant_id)
+        if position is None:
+            return None
+        grant = matcher.grants[position]
+        with self._lock:
+            with timed("candidates.sync"):
+                self.sync(matcher)
+            columns = self._columns
+            with timed("candidates.score"):
+                rows, scores = columns.score(grant, strict_eligibility)
+            with timed("candidates.rank"):
+                ranked = top_k_indices(scores, top_k)
+                candidates = [
+                    {
+                        "profile_id": columns.ids[rows[i]],
+                        "match_score": int(scores.match_score[i]),
+                        "eligibility_status": get_eligibility_status(float(scores.eligibility[i]), []),
+                        "semantic_score": float(scores.semantic[i]),
+                        "domain_score": float(scores.domain[i]),
+                        "eligibility_score": float(scores.eligibility[i]),
+                        "strategic_score": float(scores.strategic[i]),
+                    }
+                    for i in ranked
+                ]
+        return {"grant_id": grant_id, "candidates": candidates, "total_profiles": len(rows)}
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for /metrics"""
+        columns = self._columns
+        return {
+            "profiles": len(self),
+            "rows": len(columns.ids) if columns is not None else 0,
+            "pending": len(self._pending),
+            "rebuilding": int(self._rebuilding),
+        }
+
+
+# Global instance
+profile_index = ProfileIndex(get_profile_store)
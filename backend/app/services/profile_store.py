@@ -0,0 +1,504 @@
+"""
+Profile storage - pluggable backends for user profiles and their precomputed artifacts
+
+Each profile is stored as a ProfileRecord together with its readiness score and
+its TF-IDF vector, so reads do not recompute them. The vector is tagged with
+the vocabulary key it was computed under and is ignored once that changes.
+
+MemoryProfileStore keeps records in-process (the MVP behaviour).
+SQLiteProfileStore persists them in an embedded database in WAL mode, so
+profiles survive restarts and every uvicorn worker sees them. It adds a hot
+in-memory read-through cache and write-behind batching of writes.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from app import config
+from app.models.user import UserProfile, ReadinessScore
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileVector(NamedTuple):
+    vocabulary_key: str
+    vector: sparse.csr_matrix  # 1 x vocabulary width
+
+
+class ProfileRecord(NamedTuple):
+    profile: UserProfile
+    readiness: Optional[ReadinessScore] = None
+    vector: Optional[ProfileVector] = None
+
+
+def _vector_parts(vector: Optional[ProfileVector]) -> Tuple[Optional[str], Optional[bytes], Optional[bytes], Optional[int]]:
+    """(vocabulary key, indices, data, width) columns of a stored vector"""
+    if vector is None:
+        return None, None, None, None
+    row = vector.vector.tocsr()
+    return (
+        vector.vocabulary_key,
+        row.indices.astype("<i4").tobytes(),
+        row.data.astype("<f8").tobytes(),
+        row.shape[1]
+    )
+
+
+def _vector_from_parts(key: Optional[str], indices: Optional[bytes], data: Optional[bytes], width: Optional[int]):
+    if key is None:
+        return None
+    indices = np.frombuffer(indices, dtype="<i4")
+    row = sparse.csr_matrix(
+        (np.frombuffer(data, dtype="<f8"), indices, np.array([0, len(indices)])), shape=(1, width)
+    )
+    return ProfileVector(key, row)
+
+
+def record_to_json(record: ProfileRecord) -> str:
+    """One-line JSON form of a record (used for bulk export)"""
+    key, indices, data, width = _vector_parts(record.vector)
+    vector = None
+    if key is not None:
+        vector = {
+            "vocabulary_key": key, "width": width,
+            "indices": np.frombuffer(indices, dtype="<i4").tolist(),
+            "data": np.frombuffer(data, dtype="<f8").tolist()
+        }
+    return json.dumps({
+        "profile": record.profile.model_dump(),
+        "readiness": record.readiness.model_dump() if record.readiness else None,
+        "vector": vector
+    })
+
+
+def record_from_json(line: str) -> ProfileRecord:
+    raw = json.loads(line)
+    vector = raw.get("vector")
+    if vector:
+        vector = _vector_from_parts(
+            vector["vocabulary_key"],
+            np.array(vector["indices"], dtype="<i4").tobytes(),
+            np.array(vector["data"], dtype="<f8").tobytes(),
+            vector["width"]
+        )
+    readiness = raw.get("readiness")
+    return ProfileRecord(
+        UserProfile(**raw["profile"]),
+        ReadinessScore(**readiness) if readiness else None,
+        vector
+    )
+
+
+class ProfileStore(ABC):
+    """Profile storage interface; records are keyed by profile id"""
+
+    def __init__(self):
+        self._listeners: List[Callable[[ProfileRecord], None]] = []
+
+    def subscribe(self, listener: Callable[[ProfileRecord], None]):
+        """
+        Call listener with every record written through this store (e.g. to keep an index current).
+
+        Listeners run on the writer's thread, often the event loop, so they must
+        only queue work; they must not write to the store.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, record: ProfileRecord):
+        for listener in self._listeners:
+            listener(record)
+
+    @abstractmethod
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        """The record stored under profile_id, or None"""
+
+    def get_cached(self, profile_id: str) -> Optional[ProfileRecord]:
+        """
+        The record if it can be returned without I/O, else None (it may still exist).
+
+        Cheap enough for the event loop; on None, call get on a worker thread.
+        """
+        return None
+
+    def get_many(self, profile_ids: List[str]) -> Dict[str, ProfileRecord]:
+        """Records for the ids that exist"""
+        records = {}
+        for profile_id in profile_ids:
+            record = self.get(profile_id)
+            if record is not None:
+                records[profile_id] = record
+        return records
+
+    @abstractmethod
+    def put(self, record: ProfileRecord):
+        """Insert or replace a record and notify subscribers"""
+
+    def load(self, records: Iterable[ProfileRecord]) -> int:
+        """Bulk insert or replace records; returns how many were written"""
+        count = 0
+        for record in records:
+            self.put(record)
+            count += 1
+        return count
+
+    @abstractmethod
+    def export(self) -> Iterator[ProfileRecord]:
+        """Every stored record, including writes not yet flushed"""
+
+    def changed_since(self, timestamp: float) -> Iterator[ProfileRecord]:
+        """
+        Records durably written at or after timestamp (time.time()) by any process.
+
+        Lets followers such as the profile index catch up on writes made by
+        other workers; stores only this process writes to have none to report.
+        """
+        return iter(())
+
+    def flush(self):
+        """Make every accepted write durable"""
+
+    def close(self):
+        self.flush()
+
+    def __contains__(self, profile_id: str) -> bool:
+        return self.get(profile_id) is not None
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for /metrics"""
+        return {}
+
+    @classmethod
+    def from_config(cls) -> "ProfileStore":
+        if config.PROFILE_STORE == "memory":
+            return MemoryProfileStore()
+        if config.PROFILE_STORE == "sqlite":
+            return SQLiteProfileStore(
+                config.PROFILE_DB_PATH,
+                cache_size=config.PROFILE_CACHE_SIZE,
+                cache_ttl_seconds=config.PROFILE_CACHE_TTL_SECONDS,
+                flush_interval=config.PROFILE_FLUSH_INTERVAL_SECONDS,
+                flush_batch=config.PROFILE_FLUSH_BATCH
+            )
+        raise ValueError(f"Unknown profile store {config.PROFILE_STORE!r}")
+
+
+class MemoryProfileStore(ProfileStore):
+    """Process-local dict; profiles are lost on restart and not shared between workers"""
+
+    def __init__(self):
+        super().__init__()
+        self._records: Dict[str, ProfileRecord] = {}
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        return self._records.get(profile_id)
+
+    def get_cached(self, profile_id: str) -> Optional[ProfileRecord]:
+        return self._records.get(profile_id)
+
+    def put(self, record: ProfileRecord):
+        self._records[record.profile.id] = record
+        self._notify(record)
+
+    def stats(self) -> Dict[str, float]:
+        return {"profiles": len(self._records)}
+
+    def export(self) -> Iterator[ProfileRecord]:
+        return iter(list(self._records.values()))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    readiness TEXT,
+    vocabulary_key TEXT,
+    vector_indices BLOB,
+    vector_data BLOB,
+    vector_width INTEGER,
+    updated_at REAL NOT NULL
+)
+"""
+
+_UPDATED_AT_INDEX = "CREATE INDEX IF NOT EXISTS profiles_updated_at ON profiles (updated_at)"
+
+_UPSERT = "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+_SELECT = "SELECT profile, readiness, vocabulary_key, vector_indices, vector_data, vector_width FROM profiles"
+
+
+def _row_values(record: ProfileRecord) -> tuple:
+    return (
+        record.profile.id,
+        record.profile.model_dump_json(),
+        record.readiness.model_dump_json() if record.readiness else None,
+        *_vector_parts(record.vector),
+        time.time()
+    )
+
+
+def _record_from_row(row: tuple) -> ProfileRecord:
+    profile, readiness, *vector = row
+    return ProfileRecord(
+        UserProfile.model_validate_json(profile),
+        ReadinessScore.model_validate_json(readiness) if readiness else None,
+        _vector_from_parts(*vector)
+    )
+
+
+class SQLiteProfileStore(ProfileStore):
+    """
+    Profiles in an embedded SQLite database (WAL mode) shared by all workers.
+
+    Writes land in the cache and a pending buffer immediately and are flushed to
+    the database by a background thread, in one transaction per batch, every
+    flush_interval seconds or as soon as flush_batch writes are pending. Cached
+    entries expire after cache_ttl_seconds so writes made by other workers show up.
+
+    Database I/O holds only the connection lock, never the lock of the cache and
+    buffers, so cache hits and writes do not wait behind a query or a commit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache_size: int = 10000,
+        cache_ttl_seconds: float = 30.0,
+        flush_interval: float = 0.05,
+        flush_batch: int = 256
+    ):
+        super().__init__()
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._conn = self._connect()
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_UPDATED_AT_INDEX)
+        # Guards the connection; taken before _lock when both are held
+        self._io_lock = threading.Lock()
+        # Guards the cache and the pending and flushing buffers
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, ProfileRecord]]" = OrderedDict()
+        self._pending: Dict[str, ProfileRecord] = {}
+        # The batch being written: no longer pending, maybe not yet readable from the database
+        self._flushing: Dict[str, ProfileRecord] = {}
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._writer: Optional[threading.Thread] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _cache_put(self, record: ProfileRecord):
+        self._cache[record.profile.id] = (time.monotonic() + self.cache_ttl_seconds, record)
+        self._cache.move_to_end(record.profile.id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, profile_id: str, now: float) -> Optional[ProfileRecord]:
+        # Under _lock: the newest record held in memory
+        record = self._pending.get(profile_id) or self._flushing.get(profile_id)
+        if record is not None:
+            return record
+        entry = self._cache.get(profile_id)
+        if entry is not None and entry[0] >= now:
+            self._cache.move_to_end(profile_id)
+            return entry[1]
+        return None
+
+    def _fill(self, record: ProfileRecord) -> ProfileRecord:
+        # Under _lock: cache a record read from the database unless a write replaced it meanwhile
+        newer = self._lookup(record.profile.id, time.monotonic())
+        if newer is not None:
+            return newer
+        self._cache_put(record)
+        return record
+
+    def get_cached(self, profile_id: str) -> Optional[ProfileRecord]:
+        with self._lock:
+            record = self._lookup(profile_id, time.monotonic())
+            if record is not None:
+                self.cache_hits += 1
+            return record
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        record = self.get_cached(profile_id)
+        if record is not None:
+            return record
+        with self._lock:
+            self.cache_misses += 1
+        with self._io_lock:
+            row = self._conn.execute(_SELECT + " WHERE id = ?", (profile_id,)).fetchone()
+        with self._lock:
+            if row is None:
+                self._cache.pop(profile_id, None)
+                return self._lookup(profile_id, time.monotonic())
+            return self._fill(_record_from_row(row))
+
+    def get_many(self, profile_ids: List[str]) -> Dict[str, ProfileRecord]:
+        records = {}
+        missing = []
+        with self._lock:
+            now = time.monotonic()
+            for profile_id in profile_ids:
+                record = self._lookup(profile_id, now)
+                if record is not None:
+                    records[profile_id] = record
+                else:
+                    missing.append(profile_id)
+            self.cache_hits += len(records)
+            self.cache_misses += len(missing)
+        rows = []
+        with self._io_lock:
+            # One query per chunk instead of one per profile (SQLite caps bound parameters)
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._conn.execute(_SELECT + f" WHERE id IN ({placeholders})", chunk))
+        with self._lock:
+            for row in rows:
+                record = self._fill(_record_from_row(row))
+                records[record.profile.id] = record
+        return records
+
+    def put(self, record: ProfileRecord):
+        with self._lock:
+            self._pending[record.profile.id] = record
+            self._cache_put(record)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="grantmatch-profiles", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= self.flush_batch:
+                self._wakeup.set()
+        self._notify(record)
+
+    def _write_loop(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Pending writes stay buffered and are retried on the next round
+                logger.exception("Profile write-behind flush failed")
+
+    def flush(self):
+        with self._io_lock:
+            # Take the batch and release _lock, so reads and writes go on while it is written
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(_UPSERT, [_row_values(r) for r in batch.values()])
+            except BaseException:
+                with self._lock:
+                    # Back to pending, behind any newer write of the same profile
+                    for profile_id, record in batch.items():
+                        self._pending.setdefault(profile_id, record)
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def load(self, records: Iterable[ProfileRecord]) -> int:
+        """Bulk insert in one transaction, bypassing the write-behind buffer"""
+        records = list(records)
+        rows = [_row_values(r) for r in records]
+        self.flush()
+        with self._io_lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(_UPSERT, rows)
+        with self._lock:
+            for row in rows:
+                self._cache.pop(row[0], None)
+        for record in records:
+            self._notify(record)
+        return len(rows)
+
+    def export(self) -> Iterator[ProfileRecord]:
+        self.flush()
+        # A separate connection streams the table without holding up request reads
+        conn = self._connect()
+        try:
+            for row in conn.execute(_SELECT + " ORDER BY id"):
+                yield _record_from_row(row)
+        finally:
+            conn.close()
+
+    def changed_since(self, timestamp: float) -> Iterator[ProfileRecord]:
+        conn = self._connect()
+        try:
+            for row in conn.execute(_SELECT + " WHERE updated_at >= ?", (timestamp,)):
+                yield _record_from_row(row)
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "pending_writes": len(self._pending) + len(self._flushing),
+        }
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._io_lock:
+            self._conn.close()
+
+
+# Global instance, opened on first use: importing the app opens no database, and each
+# worker forked by app.server opens its own connection
+_profile_store: Optional[ProfileStore] = None
+_profile_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    global _profile_store
+    store = _profile_store
+    if store is None:
+        with _profile_store_lock:
+            if _profile_store is None:
+                _profile_store = ProfileStore.from_config()
+            store = _profile_store
+    return store
+
+
+def close_profile_store():
+    """Flush and close the store if it was opened (the next get_profile_store opens a new one)"""
+    global _profile_store
+    with _profile_store_lock:
+        store, _profile_store = _profile_store, None
+    if store is not None:
+        store.close()
+
+
+def profile_store_stats() -> Dict[str, float]:
+    """Counters for /metrics; a scrape never opens the store"""
+    store = _profile_store
+    return store.stats() if store is not None else {}
@@ -1,120 +1,210 @@
 """
 Profile completeness and readiness scoring
+
+The score depends only on a handful of profile facts (see _readiness_facts), so
+results are memoized per distinct set of facts: an unchanged profile revision
+is never rescored, and an edited one simply gets a new key. The memo holds
+plain data; every caller gets its own ReadinessScore built from it.
 """
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import numpy as np
 from app.models.user import UserProfile, ReadinessScore
+from app.services.metrics import timed
+
+# Columns of the facts tuple / array
+(
+    USER_TYPE, DOMAINS, LOCATION, TITLE, DESCRIPTION, KEYWORDS, FUNDING,
+    ORG_TYPE, REGISTERED, TEAM, FOUNDING_DATE, PREVIOUS_GRANTS, PUBLICATIONS, PATENTS
+) = range(14)
+
+# DESCRIPTION fact: description length bucket (the thresholds the score uses)
+DESCRIPTION_SHORT, DESCRIPTION_MEDIUM, DESCRIPTION_200, DESCRIPTION_LONG = range(4)
+
+
+def _description_bucket(description: str) -> int:
+    length = len(description)
+    if length <= 50:
+        return DESCRIPTION_SHORT
+    if length < 200:
+        return DESCRIPTION_MEDIUM
+    return DESCRIPTION_200 if length == 200 else DESCRIPTION_LONG
 
 
+def _readiness_facts(profile: UserProfile) -> Tuple[int, ...]:
+    """Everything the readiness score reads from a profile, clamped to the thresholds it uses"""
+    return (
+        int(bool(profile.user_type)),
+        min(len(profile.domains), 2),
+        int(bool(profile.location.country and profile.location.state)),
+        int(bool(profile.project.title)),
+        _description_bucket(profile.project.description),
+        min(len(profile.project.keywords), 3),
+        int(profile.project.funding_needed > 0),
+        int(bool(profile.organization.type)),
+        int(profile.organization.registered),
+        int(profile.organization.team_size >= 2),
+        int(bool(profile.organization.founding_date)),
+        int(len(profile.credentials.previous_grants) > 0),
+        int(profile.credentials.publications > 0),
+        int(profile.credentials.patents > 0),
+    )
+
+
+@timed("readiness")
 def calculate_readiness_score(profile: UserProfile) -> ReadinessScore:
     """
     Calculate a readiness score (0-100) for a user profile
+
+    Memoized per distinct set of facts; each call returns a new ReadinessScore.
     """
+    return _readiness(_readiness_facts(profile))
+
+
+def calculate_readiness_scores(profiles: List[UserProfile]) -> List[ReadinessScore]:
+    """Readiness for many profiles; each distinct set of facts is scored once"""
+    return [_readiness(_readiness_facts(p)) for p in profiles]
+
+
+def readiness_columns(profiles: List[UserProfile]) -> Dict[str, np.ndarray]:
+    """
+    Category and overall readiness scores as arrays (one entry per profile).
+
+    Column-wise, without building ReadinessScore objects (e.g. for reporting
+    over every stored profile). Same points as _score_facts.
+    """
+    f = np.array([_readiness_facts(p) for p in profiles], dtype=np.int64).reshape(-1, 14).T
+    columns = {
+        "basic_info": 5 * f[USER_TYPE] + 5 * (f[DOMAINS] > 0) + 5 * (f[DOMAINS] >= 2) + 5 * f[LOCATION],
+        "project_details": (
+            5 * f[TITLE] + 10 * (f[DESCRIPTION] > DESCRIPTION_SHORT) + 5 * (f[DESCRIPTION] == DESCRIPTION_LONG)
+            + 5 * (f[KEYWORDS] >= 3) + 5 * f[FUNDING]
+        ),
+        "organization": 5 * f[ORG_TYPE] + 10 * f[REGISTERED] + 5 * f[TEAM] + 5 * f[FOUNDING_DATE],
+        "credentials": 10 * f[PREVIOUS_GRANTS] + 8 * f[PUBLICATIONS] + 7 * f[PATENTS],
+    }
+    columns["overall"] = sum(columns.values())
+    return columns
+
+
+def _readiness(facts: Tuple[int, ...]) -> ReadinessScore:
+    # A new model (and new lists) per call, so editing one result never changes another's
+    return ReadinessScore.model_validate(_score_fields(facts))
+
+
+@lru_cache(maxsize=4096)
+def _score_fields(facts: Tuple[int, ...]) -> dict:
+    """_score_facts as plain data (never handed out, only validated into new models)"""
+    return _score_facts(facts).model_dump()
+
+
+def _score_facts(facts: Tuple[int, ...]) -> ReadinessScore:
     category_scores = {}
     improvements = []
     strong_areas = []
-    
+
     # Basic Info Score (20 points max)
     basic_score = 0
-    if profile.user_type:
+    if facts[USER_TYPE]:
         basic_score += 5
-    if len(profile.domains) > 0:
+    if facts[DOMAINS] > 0:
         basic_score += 5
-    if len(profile.domains) >= 2:
+    if facts[DOMAINS] >= 2:
         basic_score += 5
-    if profile.location.country and profile.location.state:
+    if facts[LOCATION]:
         basic_score += 5
     category_scores["basic_info"] = basic_score
-    
+
     if basic_score >= 15:
         strong_areas.append("Complete basic profile information")
-    if len(profile.domains) < 2:
+    if facts[DOMAINS] < 2:
         improvements.append({
             "area": "Domains",
             "points_gain": 5,
             "action": "Add at least 2 focus domains to improve matching"
         })
-    
+
     # Project Score (30 points max)
     project_score = 0
-    if profile.project.title:
+    if facts[TITLE]:
         project_score += 5
-    if len(profile.project.description) > 50:
+    if facts[DESCRIPTION] > DESCRIPTION_SHORT:
         project_score += 10
-    if len(profile.project.description) > 200:
+    if facts[DESCRIPTION] == DESCRIPTION_LONG:
         project_score += 5
-    if len(profile.project.keywords) >= 3:
+    if facts[KEYWORDS] >= 3:
         project_score += 5
-    if profile.project.funding_needed > 0:
+    if facts[FUNDING]:
         project_score += 5
     category_scores["project_details"] = project_score
-    
+
     if project_score >= 25:
         strong_areas.append("Strong project description")
-    if len(profile.project.description) < 200:
+    if facts[DESCRIPTION] < DESCRIPTION_200:
         improvements.append({
             "area": "Project Description",
             "points_gain": 10,
             "action": "Expand project description to 200+ characters for better AI matching"
         })
-    if len(profile.project.keywords) < 3:
+    if facts[KEYWORDS] < 3:
         improvements.append({
             "area": "Keywords",
             "points_gain": 5,
             "action": "Add at least 3 project keywords"
         })
-    
+
     # Organization Score (25 points max)
     org_score = 0
-    if profile.organization.type:
+    if facts[ORG_TYPE]:
         org_score += 5
-    if profile.organization.registered:
+    if facts[REGISTERED]:
         org_score += 10
-    if profile.organization.team_size >= 2:
+    if facts[TEAM]:
         org_score += 5
-    if profile.organization.founding_date:
+    if facts[FOUNDING_DATE]:
         org_score += 5
     category_scores["organization"] = org_score
-    
+
     if org_score >= 20:
         strong_areas.append("Established organization status")
-    if not profile.organization.registered:
+    if not facts[REGISTERED]:
         improvements.append({
             "area": "Registration",
             "points_gain": 10,
             "action": "Register your company/organization to unlock more grants"
         })
-    
+
     # Credentials Score (25 points max)
     cred_score = 0
-    if len(profile.credentials.previous_grants) > 0:
+    if facts[PREVIOUS_GRANTS]:
         cred_score += 10
-    if profile.credentials.publications > 0:
+    if facts[PUBLICATIONS]:
         cred_score += 8
-    if profile.credentials.patents > 0:
+    if facts[PATENTS]:
         cred_score += 7
     category_scores["credentials"] = cred_score
-    
+
     if cred_score >= 15:
         strong_areas.append("Strong credentials and track record")
-    if len(profile.credentials.previous_grants) == 0:
+    if not facts[PREVIOUS_GRANTS]:
         improvements.append({
             "area": "Previous Grants",
             "points_gain": 10,
             "action": "List any previous grants received (even small ones)"
         })
-    if profile.credentials.publications == 0:
+    if not facts[PUBLICATIONS]:
         improvements.append({
             "area": "Publications",
             "points_gain": 8,
             "action": "Add publication count to boost credibility"
         })
-    
+
     # Calculate overall score
     overall_score = sum(category_scores.values())
-    
+
     # Sort improvements by points gain
     improvements.sort(key=lambda x: x["points_gain"], reverse=True)
-    
+
     return ReadinessScore(
         overall_score=overall_score,
         category_scores=category_scores,
@@ -0,0 +1,286 @@
+"""
+Columnar scoring engine - scores profiles against the whole grant catalog at once
+"""
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from app.models.user import UserProfile
+from app.models.grant import Grant
+from app.services.compact_catalog import as_catalog
+
+# Weights of the four sub-scores in the final match score
+SEMANTIC_WEIGHT = 0.40
+DOMAIN_WEIGHT = 0.25
+ELIGIBILITY_WEIGHT = 0.20
+STRATEGIC_WEIGHT = 0.15
+
+# Stages that earn the strategic-fit stage bonus
+BONUS_STAGES = ("prototype", "registered")
+
+
+@dataclass
+class ScoreColumns:
+    """
+    Per-grant sub-scores aligned with the catalog order.
+
+    Arrays are 1-D (grants) for a single profile or 2-D (profiles x grants) for a batch.
+    """
+    semantic: np.ndarray
+    domain: np.ndarray
+    eligibility: np.ndarray
+    strategic: np.ndarray
+    final: np.ndarray
+    match_score: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.semantic, self.domain, self.eligibility, self.strategic, self.final, self.match_score))
+
+    def copy(self) -> "ScoreColumns":
+        """Scores in arrays of their own (e.g. a batch row to cache without keeping the batch alive)"""
+        return ScoreColumns(
+            semantic=self.semantic.copy(), domain=self.domain.copy(), eligibility=self.eligibility.copy(),
+            strategic=self.strategic.copy(), final=self.final.copy(), match_score=self.match_score.copy()
+        )
+
+    def take(self, rows: np.ndarray) -> "ScoreColumns":
+        """Scores of the given catalog rows only (1-D scores)"""
+        return ScoreColumns(
+            semantic=self.semantic[rows], domain=self.domain[rows], eligibility=self.eligibility[rows],
+            strategic=self.strategic[rows], final=self.final[rows], match_score=self.match_score[rows]
+        )
+
+    def row(self, i: int) -> "ScoreColumns":
+        """Scores of the i-th profile of a batch"""
+        return ScoreColumns(
+            semantic=self.semantic[i], domain=self.domain[i], eligibility=self.eligibility[i],
+            strategic=self.strategic[i], final=self.final[i], match_score=self.match_score[i]
+        )
+
+
+def _indicator(rows: List[List[str]]) -> Tuple[sparse.csc_matrix, Dict[str, int]]:
+    """Build a grants x values 0/1 matrix plus the value -> column vocabulary"""
+    vocab: Dict[str, int] = {}
+    row_idx, col_idx = [], []
+    for i, values in enumerate(rows):
+        for value in set(values):
+            row_idx.append(i)
+            col_idx.append(vocab.setdefault(value, len(vocab)))
+    matrix = sparse.csc_matrix(
+        (np.ones(len(row_idx), dtype=np.float64), (row_idx, col_idx)),
+        shape=(len(rows), len(vocab))
+    )
+    return matrix, vocab
+
+
+def _concat_indicator(
+    top: sparse.csc_matrix, top_vocab: Dict[str, int], bottom: sparse.csc_matrix, bottom_vocab: Dict[str, int]
+) -> Tuple[sparse.csc_matrix, Dict[str, int]]:
+    """Stack two indicator matrices, mapping bottom's columns into the merged vocabulary"""
+    vocab = dict(top_vocab)
+    for value in bottom_vocab:
+        vocab.setdefault(value, len(vocab))
+    remap = np.array([vocab[v] for v in sorted(bottom_vocab, key=bottom_vocab.get)], dtype=np.int64)
+    bottom = bottom.tocoo()
+    bottom = sparse.coo_matrix(
+        (bottom.data, (bottom.row, remap[bottom.col] if len(remap) else bottom.col)),
+        shape=(bottom.shape[0], len(vocab))
+    )
+    top = sparse.csc_matrix((top.data, top.indices, np.concatenate(
+        [top.indptr, np.full(len(vocab) - top.shape[1], top.indptr[-1], dtype=top.indptr.dtype)]
+    )), shape=(top.shape[0], len(vocab)))
+    return sparse.vstack([top, bottom], format="csc"), vocab
+
+
+class ScoringIndex:
+    """Grant-side columns precomputed once so a profile is scored with a few array ops"""
+
+    # (indicator matrix, its vocabulary) attribute pairs and per-grant array attributes
+    _MATRICES = (
+        ("focus", "focus_vocab"), ("user_types", "user_type_vocab"), ("stages", "stage_vocab"),
+        ("locations", "location_vocab"), ("org_types", "org_type_vocab"),
+    )
+    _ARRAYS = ("focus_counts", "global_location", "min_team_size", "requires_registration", "amount", "active")
+
+    def __init__(self, grants: Sequence[Grant]):
+        catalog = as_catalog(grants)
+        self.size = len(catalog)
+        focus_areas = [[a.lower() for a in areas] for areas in catalog.lists("focus_areas")]
+        self.focus, self.focus_vocab = _indicator(focus_areas)
+        self.focus_counts = np.array([len(set(a)) for a in focus_areas], dtype=np.int64)
+
+        locations = catalog.lists("location")
+        self.user_types, self.user_type_vocab = _indicator(catalog.lists("user_types"))
+        self.stages, self.stage_vocab = _indicator(catalog.lists("stages"))
+        self.locations, self.location_vocab = _indicator(locations)
+        self.org_types, self.org_type_vocab = _indicator(catalog.lists("organization_types"))
+        self.global_location = np.array(["Global" in values for values in locations], dtype=bool)
+        self.min_team_size = catalog.column("min_team_size").astype(np.int64)
+        self.requires_registration = catalog.column("requires_registration").copy()
+        self.amount = catalog.column("amount").copy()
+        # Retired grants keep their row until the next full rebuild but are never ranked
+        self.active = np.ones(self.size, dtype=bool)
+
+    @cached_property
+    def _row_major(self) -> Dict[str, sparse.csr_matrix]:
+        """CSR copies of the indicator matrices, so picking a few rows does not scan every column"""
+        return {matrix: getattr(self, matrix).tocsr() for matrix, _ in self._MATRICES}
+
+    @cached_property
+    def _no_focus_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.focus_counts == 0)
+
+    def domain_candidates(self, profile: UserProfile) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, domain scores) of the grants with a non-zero domain score for a profile.
+
+        Read from the focus-area posting lists, so the cost grows with the number
+        of hits rather than the catalog size. Empty when the profile has no
+        domains (every grant then scores the same 0.5).
+        """
+        user_domains = set(d.lower() for d in profile.domains)
+        cols = [self.focus_vocab[d] for d in user_domains if d in self.focus_vocab]
+        if not user_domains:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        if cols:
+            hits = np.concatenate([self.focus.indices[self.focus.indptr[c]:self.focus.indptr[c + 1]] for c in cols])
+            hit_rows, overlap = np.unique(hits, return_counts=True)
+        else:
+            hit_rows, overlap = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        denom = np.maximum(np.maximum(len(user_domains), self.focus_counts[hit_rows]), 1)
+        # Grants without focus areas score 0.5 for everyone (same rule as domain_scores)
+        rows = np.concatenate([hit_rows, self._no_focus_rows])
+        scores = np.concatenate([overlap / denom, np.full(len(self._no_focus_rows), 0.5)])
+        return rows, scores
+
+    def take(self, rows: np.ndarray) -> "ScoringIndex":
+        """Index restricted to the given catalog rows (in that order)"""
+        subset = ScoringIndex.__new__(ScoringIndex)
+        subset.size = len(rows)
+        for matrix, vocab in self._MATRICES:
+            setattr(subset, matrix, self._row_major[matrix][rows].tocsc())
+            setattr(subset, vocab, getattr(self, vocab))
+        for name in self._ARRAYS:
+            setattr(subset, name, getattr(self, name)[rows])
+        return subset
+
+    def append(self, grants: Sequence[Grant]) -> "ScoringIndex":
+        """New index with rows for grants appended (this one is left untouched)"""
+        added = ScoringIndex(grants)
+        merged = ScoringIndex.__new__(ScoringIndex)
+        merged.size = self.size + added.size
+        for matrix, vocab in self._MATRICES:
+            m, v = _concat_indicator(getattr(self, matrix), getattr(self, vocab), getattr(added, matrix), getattr(added, vocab))
+            setattr(merged, matrix, m)
+            setattr(merged, vocab, v)
+        for name in self._ARRAYS:
+            setattr(merged, name, np.concatenate([getattr(self, name), getattr(added, name)]))
+        return merged
+
+    def retire(self, rows: List[int]) -> "ScoringIndex":
+        """New index with the given rows marked inactive"""
+        retired = ScoringIndex.__new__(ScoringIndex)
+        retired.__dict__.update(self.__dict__)
+        retired.active = self.active.copy()
+        retired.active[rows] = False
+        return retired
+
+    def _contains(self, matrix: sparse.csc_matrix, vocab: Dict[str, int], values: List[Optional[str]]) -> np.ndarray:
+        """Boolean (profiles x grants): does each grant's list contain the profile's value"""
+        rows = [i for i, v in enumerate(values) if v in vocab]
+        onehot = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, [vocab[values[i]] for i in rows])),
+            shape=(len(values), len(vocab))
+        )
+        return (onehot @ matrix.T).toarray() > 0
+
+    def domain_scores(self, profiles: List[UserProfile]) -> np.ndarray:
+        """Domain overlap score (0-1) for every profile x grant"""
+        user_domains = [set(d.lower() for d in p.domains) for p in profiles]
+        rows, cols = [], []
+        for i, domains in enumerate(user_domains):
+            for d in domains:
+                if d in self.focus_vocab:
+                    rows.append(i)
+                    cols.append(self.focus_vocab[d])
+        user_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(profiles), len(self.focus_vocab))
+        )
+        overlap = (user_matrix @ self.focus.T).toarray()
+        user_counts = np.array([len(d) for d in user_domains], dtype=np.int64)[:, None]
+        denom = np.maximum(np.maximum(user_counts, self.focus_counts), 1)
+        return np.where((user_counts == 0) | (self.focus_counts == 0), 0.5, overlap / denom)
+
+    def eligibility_scores(self, profiles: List[UserProfile]) -> np.ndarray:
+        """Eligibility score (0-1) for every profile x grant, same rules as check_eligibility"""
+        score = np.ones((len(profiles), self.size))
+        score -= 0.25 * ~self._contains(self.user_types, self.user_type_vocab, [p.user_type for p in profiles])
+        score -= 0.2 * ~self._contains(self.stages, self.stage_vocab, [p.stage for p in profiles])
+        countries = [p.location.country for p in profiles]
+        in_location = self._contains(self.locations, self.location_vocab, countries)
+        score -= 0.3 * (~self.global_location & ~in_location)
+        org_types = [p.organization.type for p in profiles]
+        score -= 0.15 * ~self._contains(self.org_types, self.org_type_vocab, org_types)
+        team_size = np.array([p.organization.team_size for p in profiles], dtype=np.int64)[:, None]
+        score -= 0.1 * (team_size < self.min_team_size)
+        unregistered = np.array([not p.organization.registered for p in profiles], dtype=bool)[:, None]
+        score -= 0.2 * (unregistered & self.requires_registration)
+        return np.maximum(0, score)
+
+    def strategic_scores(self, profiles: List[UserProfile]) -> np.ndarray:
+        """Strategic fit bonus score (0-1) for every profile x grant"""
+        score = np.full((len(profiles), self.size), 0.5)
+        # Only prototype/registered stages earn the stage bonus
+        bonus_stages = [p.stage if p.stage in BONUS_STAGES else None for p in profiles]
+        score += 0.2 * self._contains(self.stages, self.stage_vocab, bonus_stages)
+        countries = [p.location.country for p in profiles]
+        score += 0.15 * self._contains(self.locations, self.location_vocab, countries)
+        funding_needed = np.array([p.project.funding_needed for p in profiles], dtype=np.int64)[:, None]
+        score += 0.15 * ((self.amount >= funding_needed) & (funding_needed > 0))
+        return np.minimum(1.0, score)
+
+    def score_batch(self, profiles: List[UserProfile], semantic: np.ndarray) -> ScoreColumns:
+        """Compute all sub-scores and the weighted final score as profiles x grants arrays"""
+        return weighted_scores(
+            semantic, self.domain_scores(profiles), self.eligibility_scores(profiles), self.strategic_scores(profiles)
+        )
+
+    def score(self, profile: UserProfile, semantic: np.ndarray) -> ScoreColumns:
+        """Compute all sub-scores and the weighted final score for the whole catalog"""
+        return self.score_batch([profile], semantic[None, :]).row(0)
+
+
+def weighted_scores(
+    semantic: np.ndarray, domain: np.ndarray, eligibility: np.ndarray, strategic: np.ndarray
+) -> ScoreColumns:
+    """The weighted final score and 0-100 match score from the four sub-scores"""
+    final = (
+        semantic * SEMANTIC_WEIGHT + domain * DOMAIN_WEIGHT
+        + eligibility * ELIGIBILITY_WEIGHT + strategic * STRATEGIC_WEIGHT
+    )
+    match_score = np.clip(final * 100, 0, 100).astype(np.int64)
+    return ScoreColumns(
+        semantic=semantic, domain=domain, eligibility=eligibility,
+        strategic=strategic, final=final, match_score=match_score
+    )
+
+
+def top_k_indices(scores: ScoreColumns, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k grants by match score, best first.
+
+    Uses a partial selection (argpartition) so only the survivors are sorted.
+    Ties on the integer match score are broken by semantic similarity.
+    """
+    n = len(scores.match_score)
+    if top_k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    # semantic is in [0, 1], so scaling it by 0.5 never crosses into the next integer score
+    key = scores.match_score + scores.semantic * 0.5
+    if top_k < n:
+        candidates = np.argpartition(-key, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-key[candidates], kind="stable")]
@@ -0,0 +1,13 @@
+"""
+Performance benchmarks (run from backend/, e.g. python -m benchmarks.micro)
+
+- synthetic: deterministic grant catalogs and profile populations
+- micro: embeddings, eligibility, explanation and readiness building blocks
+- load: ASGI-level load runs of /api/match, /api/timeline and analyze
+- retrieval: hybrid retrieval recall and latency against exhaustive scoring
+- serialization: match response encoding
+- catalog_memory: bytes per grant of the compact catalog vs Grant models
+
+Every benchmark prints one JSON report (or writes it with --output) with
+sorted keys, so reports from two commits can be diffed.
+"""
@@ -0,0 +1,67 @@
+"""
+Catalog memory - bytes per grant of the in-memory catalog, before and after compaction
+
+"list" is the previous representation: one Grant model per entry with its
+cached JSON encoding, plus the grant texts the text index used to keep.
+"compact" is CompactCatalog (see its memory_report for the per-part split).
+Both are measured with tracemalloc as the bytes still allocated once built:
+
+    python -m benchmarks.catalog_memory [--grants 50000] [--output catalog_memory.json]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from app.models.grant import Grant
+from app.services.compact_catalog import CompactCatalog
+from app.services.matcher import grant_text
+from benchmarks.common import emit
+from benchmarks.synthetic import grant_dicts
+
+
+def grant_list(records: List[Dict]):
+    grants = [Grant(**r) for r in records]
+    for g in grants:
+        g.json_bytes()
+    return grants, [grant_text(g) for g in grants]
+
+
+def compact(records: List[Dict]):
+    return CompactCatalog.from_grants(Grant(**r) for r in records)
+
+
+def measure(build: Callable, records: List[Dict]) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = build(records)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del catalog
+    return {
+        "build_seconds": round(seconds, 3),
+        "bytes": allocated,
+        "bytes_per_grant": round(allocated / len(records), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per grant of the in-memory catalog")
+    parser.add_argument("--grants", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    records = list(grant_dicts(args.grants, args.seed))
+    results = {"list": measure(grant_list, records), "compact": measure(compact, records)}
+    results["reduction"] = round(results["list"]["bytes"] / max(results["compact"]["bytes"], 1), 2)
+    report = compact(records).memory_report()
+    results["compact_parts_per_grant"] = {part: round(n / args.grants, 1) for part, n in report.items()}
+    emit("catalog_memory", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
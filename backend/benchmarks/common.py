@@ -0,0 +1,74 @@
+"""
+Shared benchmark helpers - latency summaries, peak RSS and JSON reports
+"""
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+import numpy as np
+
+
+def latency_summary(latencies: Iterable[float]) -> Dict[str, float]:
+    """Percentiles (milliseconds) of latencies given in seconds"""
+    ms = np.asarray(list(latencies), dtype=np.float64) * 1000
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def time_calls(fn: Callable, args: List[tuple], rounds: int) -> Dict[str, float]:
+    """Call fn(*args[i % len(args)]) rounds times; latency summary plus calls per second"""
+    latencies = []
+    for i in range(rounds):
+        call_args = args[i % len(args)]
+        start = time.perf_counter()
+        fn(*call_args)
+        latencies.append(time.perf_counter() - start)
+    summary = latency_summary(latencies)
+    summary["per_sec"] = round(rounds / sum(latencies), 1)
+    return summary
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit(benchmark: str, params: Dict, results: Dict, output: Optional[str] = None):
+    """
+    Print (or write to output) one JSON report.
+
+    Keys are sorted so reports from two commits can be diffed directly.
+    """
+    report = {
+        "benchmark": benchmark,
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
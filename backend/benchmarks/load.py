@@ -0,0 +1,137 @@
+"""
+ASGI-level load runs against the full application
+
+Starts the app in-process on a synthetic catalog (written to a temporary
+GRANTMATCH_GRANTS_FILE), stores a synthetic profile population through
+/api/profile/create, then drives /api/match, /api/timeline,
+/api/grants/{id}/analyze and /api/grants/search with a fixed number of concurrent clients through
+httpx's ASGI transport (no sockets, so the numbers are the application's own
+cost). Reports throughput, latency percentiles, status codes and peak RSS as
+JSON:
+
+    python -m benchmarks.load [--grants 10000] [--profiles 10000] [--requests 500] [--concurrency 16] [--output load.json]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+from benchmarks.common import emit, latency_summary, peak_rss_mb
+from benchmarks.synthetic import DOMAINS, TOPIC_WORDS, profile_dicts, write_grants
+
+ENDPOINTS = ("match", "timeline", "analyze", "search")
+
+
+async def _drive(client, make_request: Callable, requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < requests:
+            issued += 1
+            method, url = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url)
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary["requests_per_sec"] = round(len(latencies) / wall, 1)
+    summary["status"] = dict(statuses)
+    return summary
+
+
+def _search_url(rnd: random.Random) -> str:
+    """A /api/grants/search request: two topic words, sometimes a focus area and an amount floor"""
+    words = " ".join(rnd.sample(TOPIC_WORDS[rnd.choice(DOMAINS)].split(), 2))
+    url = f"/api/grants/search?q={words}&fields=compact"
+    if rnd.random() < 0.5:
+        url += f"&focus_area={rnd.choice(DOMAINS)}"
+    if rnd.random() < 0.5:
+        url += "&min_amount=50000"
+    return url
+
+
+async def run(args, grant_ids: List[str]) -> Dict:
+    import httpx
+    from app.main import app  # imported after the environment points at the synthetic catalog
+
+    rnd = random.Random(args.seed)
+    results = {}
+    # Unhandled errors become 500s in the report instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # The first match loads the catalog and builds the indexes
+        start = time.perf_counter()
+        await client.post("/api/match", json=next(profile_dicts(1, args.seed + 1)))
+        results["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        results["rss_after_warmup_mb"] = peak_rss_mb()
+
+        start = time.perf_counter()
+        profile_ids = []
+        for profile in profile_dicts(args.profiles, args.seed + 1):
+            response = await client.post("/api/profile/create", json=profile)
+            profile_ids.append(response.json()["profile_id"])
+        results["create_profiles_seconds"] = round(time.perf_counter() - start, 3)
+
+        requests = {
+            "match": lambda: ("POST", f"/api/match?profile_id={rnd.choice(profile_ids)}"),
+            "timeline": lambda: ("GET", "/api/timeline" + (f"?{args.timeline_params}" if args.timeline_params else "")),
+            "analyze": lambda: (
+                "POST", f"/api/grants/{rnd.choice(grant_ids)}/analyze?profile_id={rnd.choice(profile_ids)}"
+            ),
+            "search": lambda: ("GET", _search_url(rnd)),
+        }
+        for endpoint in args.endpoints:
+            results[endpoint] = await _drive(client, requests[endpoint], args.requests, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASGI-level load runs of the matching endpoints")
+    parser.add_argument("--grants", type=int, default=10000)
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--timeline-params", default="", help="query string for /api/timeline, e.g. fields=compact")
+    parser.add_argument("--profile-store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument(
+        "--match-batch-size", type=int, default=None, help="GRANTMATCH_MATCH_BATCH_MAX_SIZE (1 turns micro-batching off)"
+    )
+    parser.add_argument("--match-batch-wait-ms", type=float, default=None, help="GRANTMATCH_MATCH_BATCH_MAX_WAIT_MS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="grantmatch-bench-") as workdir:
+        grants_file = os.path.join(workdir, "grants.json")
+        write_grants(grants_file, args.grants, args.seed)
+        os.environ["GRANTMATCH_GRANTS_FILE"] = grants_file
+        os.environ["GRANTMATCH_INDEX_DIR"] = os.path.join(workdir, "index")
+        os.environ["GRANTMATCH_PROFILE_STORE"] = args.profile_store
+        os.environ["GRANTMATCH_PROFILE_DB"] = os.path.join(workdir, "profiles.db")
+        if args.match_batch_size is not None:
+            os.environ["GRANTMATCH_MATCH_BATCH_MAX_SIZE"] = str(args.match_batch_size)
+        if args.match_batch_wait_ms is not None:
+            os.environ["GRANTMATCH_MATCH_BATCH_MAX_WAIT_MS"] = str(args.match_batch_wait_ms)
+        grant_ids = [f"SYN-{i:07d}" for i in range(args.grants)]
+        results = asyncio.run(run(args, grant_ids))
+
+        from app.services.executor import execution_backend
+        from app.services.profile_store import close_profile_store
+        execution_backend.shutdown()
+        close_profile_store()
+    emit("load", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
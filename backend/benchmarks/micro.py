@@ -0,0 +1,67 @@
+"""
+Microbenchmarks of the matching pipeline's building blocks
+
+Times EmbeddingsService.fit and find_similar, check_eligibility,
+generate_explanation and calculate_readiness_score on synthetic data and
+prints one JSON report (see benchmarks.common.emit):
+
+    python -m benchmarks.micro [--grants 10000] [--profiles 10000] [--rounds 2000] [--output micro.json]
+"""
+import argparse
+import random
+import time
+from app.services.eligibility import check_eligibility
+from app.services.embeddings import EmbeddingsService
+from app.services.explainer import generate_explanation
+from app.services.matcher import grant_text
+from app.services.readiness import calculate_readiness_score
+from benchmarks.common import emit, time_calls
+from benchmarks.synthetic import make_grants, make_profiles
+
+
+def profile_text(profile) -> str:
+    return f"{profile.project.title} {profile.project.description} {' '.join(profile.domains)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the matching pipeline")
+    parser.add_argument("--grants", type=int, default=10000)
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--fit-rounds", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    grants = make_grants(args.grants, args.seed)
+    profiles = make_profiles(args.profiles, args.seed + 1)
+    generate_seconds = time.perf_counter() - start
+    texts = [grant_text(g) for g in grants]
+    rnd = random.Random(args.seed)
+    pairs = [(rnd.choice(profiles), rnd.choice(grants)) for _ in range(min(args.rounds, 10000))]
+
+    service = EmbeddingsService("tfidf")
+    results = {"generate_seconds": round(generate_seconds, 3)}
+    results["embeddings_fit"] = time_calls(service.fit, [(texts,)], args.fit_rounds)
+    results["embeddings_find_similar"] = time_calls(
+        service.find_similar, [(profile_text(p), args.top_k) for p in profiles[:1000]], args.rounds
+    )
+    results["check_eligibility"] = time_calls(
+        check_eligibility, [(p, g.eligibility) for p, g in pairs], args.rounds
+    )
+    explanation_args = []
+    for profile, grant in pairs:
+        score, issues, actions = check_eligibility(profile, grant.eligibility)
+        explanation_args.append((profile, grant, rnd.random(), rnd.random(), score, issues, actions))
+    results["generate_explanation"] = time_calls(generate_explanation, explanation_args, args.rounds)
+    # Memoized on the profile's readiness facts, so this includes cache hits as in production
+    results["calculate_readiness_score"] = time_calls(
+        calculate_readiness_score, [(p,) for p in profiles], args.rounds
+    )
+    emit("micro", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
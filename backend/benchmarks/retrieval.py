@@ -0,0 +1,65 @@
+"""
+Hybrid retrieval recall and latency benchmark
+
+For synthetic catalogs of increasing size, matches the same profiles with the
+exhaustive scorer (candidate_pool=0) and with candidate retrieval followed by
+exact scoring, and reports recall@k of the hybrid top-k against the
+exhaustive one plus per-profile latency percentiles, as JSON:
+
+    python -m benchmarks.retrieval [--sizes 5000 20000 50000] [--profiles 200] [--pool 500] [--top-k 25] [--output retrieval.json]
+
+Use it to pick GRANTMATCH_MATCH_CANDIDATES: recall should stay at (or very
+near) 1.0 while the hybrid latency stays flat as the catalog grows.
+"""
+import argparse
+import time
+from typing import Dict
+import numpy as np
+from app.services.matcher import MatcherService
+from benchmarks.common import emit, latency_summary
+from benchmarks.synthetic import make_grants, make_profiles
+
+
+def evaluate(matcher: MatcherService, profiles, pool: int, top_k: int, strict: bool) -> Dict:
+    recalls, exhaustive_times, hybrid_times, candidates = [], [], [], []
+    for profile in profiles:
+        vector = matcher.profile_vectors([profile])
+        start = time.perf_counter()
+        exact = matcher.match(profile, top_k, strict, vector=vector, candidate_pool=0)
+        exhaustive_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        hybrid = matcher.match(profile, top_k, strict, vector=vector, candidate_pool=pool)
+        hybrid_times.append(time.perf_counter() - start)
+        candidates.append(len(matcher.candidate_rows(profile, pool, vector, strict)))
+        expected = {m.grant.id for m in exact}
+        if expected:
+            recalls.append(len(expected & {m.grant.id for m in hybrid}) / len(expected))
+    return {
+        f"recall_at_{top_k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "min_recall": round(float(np.min(recalls)), 4) if recalls else None,
+        "avg_candidates": int(np.mean(candidates)),
+        "exhaustive": latency_summary(exhaustive_times),
+        "hybrid": latency_summary(hybrid_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid retrieval against exhaustive scoring")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--pool", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=25)
+    parser.add_argument("--strict", action="store_true", help="match with strict_eligibility")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    profiles = make_profiles(args.profiles)
+    results = {}
+    for size in args.sizes:
+        matcher = MatcherService(make_grants(size))
+        results[str(size)] = evaluate(matcher, profiles, args.pool, args.top_k, args.strict)
+    emit("retrieval", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
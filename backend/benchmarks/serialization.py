@@ -0,0 +1,91 @@
+"""
+Match response serialization benchmark
+
+Compares the previous response path (validated MatchResult construction, a
+response_model round trip and the standard JSON encoder) with the fast path
+(model_construct, pre-encoded grant bytes spliced in, orjson). Reports
+latency percentiles per response and encoded bytes/sec as JSON:
+
+    python -m benchmarks.serialization [--grants 2000] [--responses 500] [--top-k 25] [--output serialization.json]
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+from fastapi.encoders import jsonable_encoder
+from app import config
+from app.api.serialization import match_response_json
+from app.models.grant import Grant, MatchResponse, MatchResult
+from app.models.user import UserProfile
+from app.services.grant_repository import GrantRepository
+from app.services.matcher import MatcherService
+from benchmarks.common import emit, latency_summary
+
+
+def load_grants(count: int) -> List[Grant]:
+    """The bundled catalog, repeated with fresh ids until it has count grants"""
+    with open(config.GRANTS_FILE) as f:
+        raw = json.load(f)
+    return [Grant(**dict(raw[i % len(raw)], id=f"{raw[i % len(raw)]['id']}-{i}")) for i in range(count)]
+
+
+def pydantic_path(matches: List[MatchResult], summary: Dict) -> bytes:
+    # Results were validated on construction, then FastAPI validated the response
+    # against response_model and encoded it with jsonable_encoder + json.dumps
+    validated = [MatchResult(**m.__dict__) for m in matches]
+    response = MatchResponse.model_validate(MatchResponse(matches=validated, **summary).model_dump())
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_path(matches: List[MatchResult], summary: Dict) -> bytes:
+    return match_response_json(matches, **summary)
+
+
+def measure(encode: Callable, workload: List, rounds: int) -> Dict:
+    latencies, total_bytes = [], 0
+    for i in range(rounds):
+        matches, summary = workload[i % len(workload)]
+        start = time.perf_counter()
+        body = encode(matches, summary)
+        latencies.append(time.perf_counter() - start)
+        total_bytes += len(body)
+    summary = latency_summary(latencies)
+    summary["bytes_per_sec"] = int(total_bytes / sum(latencies))
+    summary["avg_response_bytes"] = total_bytes // rounds
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark match response serialization")
+    parser.add_argument("--grants", type=int, default=2000)
+    parser.add_argument("--responses", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=25)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    grants = load_grants(args.grants)
+    GrantRepository(grants)  # pre-encodes the grants, as catalog load does
+    matcher = MatcherService(grants)
+    example = UserProfile.model_config["json_schema_extra"]["example"]
+    profiles = [
+        UserProfile(**dict(example, domains=domains))
+        for domains in (["AI", "Healthcare"], ["CleanTech"], ["Agriculture", "AI"], ["Education"])
+    ]
+    workload = []
+    for profile in profiles:
+        matches = matcher.match(profile, top_k=args.top_k)
+        summary = {"total_funding": sum(m.grant.amount for m in matches), "total_matches": len(matches), "profile_score": 50}
+        workload.append((matches, summary))
+
+    # Both paths must produce the same document
+    assert json.loads(pydantic_path(*workload[0])) == json.loads(fast_path(*workload[0]))
+
+    results = {"before": measure(pydantic_path, workload, args.responses), "after": measure(fast_path, workload, args.responses)}
+    results["speedup_p99"] = round(results["before"]["p99_ms"] / results["after"]["p99_ms"], 2)
+    emit("serialization", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
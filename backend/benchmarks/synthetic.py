@@ -0,0 +1,139 @@
+"""
+Synthetic grant catalogs and user profiles for benchmarks
+
+Deterministic for a given seed. Text is drawn from a few topic vocabularies
+so TF-IDF similarity, domain overlap and eligibility vary the way they do on
+a real catalog rather than being uniform noise.
+
+Records are generated as plain dicts one at a time, so large populations can
+be written to disk without building every model in memory:
+
+    python -m benchmarks.synthetic grants 100000 grants.json     # GRANTMATCH_GRANTS_FILE format
+    python -m benchmarks.synthetic profiles 100000 profiles.ndjson  # for python -m app.profiles_io load
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Dict, Iterator, List
+from app.models.grant import Grant
+from app.models.user import UserProfile
+
+DOMAINS = (
+    "AI", "Healthcare", "CleanTech", "Agriculture", "Education", "FinTech",
+    "Climate", "Biotech", "Social Impact", "IoT", "Water", "Mobility"
+)
+TOPIC_WORDS = {
+    "AI": "machine learning deep neural model inference vision language data",
+    "Healthcare": "patient clinical diagnosis hospital medical imaging disease care",
+    "CleanTech": "solar battery renewable energy grid efficiency emissions storage",
+    "Agriculture": "crop yield soil farmer irrigation harvest livestock seeds",
+    "Education": "students learning school teachers curriculum literacy skills classroom",
+    "FinTech": "payments lending credit banking inclusion savings insurance wallet",
+    "Climate": "carbon adaptation resilience flood drought mitigation forest monitoring",
+    "Biotech": "genomics protein vaccine enzyme cell therapy laboratory molecule",
+    "Social Impact": "community livelihoods women rural inclusion nonprofit poverty access",
+    "IoT": "sensors devices connectivity edge embedded telemetry wireless firmware",
+    "Water": "sanitation purification groundwater wastewater drinking supply treatment quality",
+    "Mobility": "transport electric vehicles logistics charging urban transit fleet",
+}
+USER_TYPES = ("startup", "researcher", "ngo", "student")
+STAGES = ("idea", "prototype", "registered", "revenue", "scaling")
+COUNTRIES = ("India", "USA", "Kenya", "Brazil", "Germany")
+ORG_TYPES = ("company", "individual", "institute", "ngo")
+
+
+def _text(rnd: random.Random, topics: List[str], words: int) -> str:
+    pool = " ".join(TOPIC_WORDS[t] for t in topics).split()
+    return " ".join(rnd.choice(pool) for _ in range(words))
+
+
+def grant_dicts(count: int, seed: int = 0) -> Iterator[Dict]:
+    rnd = random.Random(seed)
+    for i in range(count):
+        topics = rnd.sample(DOMAINS, rnd.randint(1, 3))
+        yield dict(
+            id=f"SYN-{i:07d}",
+            name=f"{topics[0]} Grant {i}",
+            organization=f"Funder {rnd.randint(1, 500)}",
+            type=rnd.choice(["government", "accelerator", "foundation", "corporate", "academic"]),
+            amount=rnd.choice([5000, 25000, 50000, 100000, 250000, 1000000]),
+            currency="USD",
+            deadline=f"2027-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            description=_text(rnd, topics, 30),
+            focus_areas=topics if rnd.random() < 0.9 else [],
+            tags=rnd.sample(["competitive", "equity-free", "non-dilutive", "early-stage", "research"], rnd.randint(0, 2)),
+            eligibility={
+                "user_types": rnd.sample(USER_TYPES, rnd.randint(1, 3)),
+                "stages": rnd.sample(STAGES, rnd.randint(2, 4)),
+                "location": ["Global"] if rnd.random() < 0.3 else rnd.sample(COUNTRIES, rnd.randint(1, 2)),
+                "organization_types": rnd.sample(ORG_TYPES, rnd.randint(1, 3)),
+                "min_team_size": rnd.randint(1, 4),
+                "requires_registration": rnd.random() < 0.4,
+            },
+            difficulty=rnd.choice(["easy", "medium", "hard"]),
+            equity_required=rnd.random() < 0.1,
+        )
+
+
+def profile_dicts(count: int, seed: int = 1) -> Iterator[Dict]:
+    rnd = random.Random(seed)
+    for i in range(count):
+        topics = rnd.sample(DOMAINS, rnd.randint(1, 3))
+        yield dict(
+            id=f"syn-profile-{i}",
+            user_type=rnd.choice(USER_TYPES),
+            domains=topics,
+            location={"country": rnd.choice(COUNTRIES), "state": None, "city": None},
+            stage=rnd.choice(STAGES),
+            organization={"type": rnd.choice(ORG_TYPES), "registered": rnd.random() < 0.5, "team_size": rnd.randint(1, 8)},
+            project={
+                "title": f"{topics[0]} project",
+                "description": _text(rnd, topics, 25),
+                "keywords": _text(rnd, topics, 3).split(),
+                "funding_needed": rnd.choice([10000, 50000, 200000]),
+            },
+            credentials={"previous_grants": [], "publications": rnd.randint(0, 3), "patents": rnd.randint(0, 1)},
+        )
+
+
+def make_grants(count: int, seed: int = 0) -> List[Grant]:
+    return [Grant(**g) for g in grant_dicts(count, seed)]
+
+
+def make_profiles(count: int, seed: int = 1) -> List[UserProfile]:
+    return [UserProfile(**p) for p in profile_dicts(count, seed)]
+
+
+def write_grants(path: str, count: int, seed: int = 0):
+    """A grants.json-style catalog, written one grant at a time"""
+    with open(path, "w") as f:
+        f.write("[")
+        for i, grant in enumerate(grant_dicts(count, seed)):
+            f.write(("," if i else "") + "\n" + json.dumps(grant))
+        f.write("\n]\n")
+
+
+def write_profiles(path: str, count: int, seed: int = 1):
+    """Profile records, one JSON object per line (the profiles_io load format)"""
+    with open(path, "w") as f:
+        for profile in profile_dicts(count, seed):
+            f.write(json.dumps({"profile": profile, "readiness": None, "vector": None}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic grant catalog or profile population")
+    parser.add_argument("kind", choices=["grants", "profiles"])
+    parser.add_argument("count", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.kind == "grants":
+        write_grants(args.path, args.count, 0 if args.seed is None else args.seed)
+    else:
+        write_profiles(args.path, args.count, 1 if args.seed is None else args.seed)
+    print(f"{args.kind}: {args.count} written to {args.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Test configuration - app settings point at a temporary directory
+
+config is read once at import, so the environment is set before any app module
+is imported. Each test gets its own change log and a catalog that has not been
+loaded yet, so tests never see each other's ingested grants.
+"""
+import os
+import tempfile
+from typing import Callable
+
+_DATA_DIR = tempfile.mkdtemp(prefix="grantmatch-tests-")
+os.environ.update(
+    GRANTMATCH_ADMIN_TOKEN="test-token",
+    GRANTMATCH_INGEST_DIR=os.path.join(_DATA_DIR, "ingested"),
+    GRANTMATCH_INDEX_DIR="",
+    GRANTMATCH_PROFILE_STORE="memory",
+    GRANTMATCH_WARMUP="off",
+    # Ingesting a handful of grants into the small shipped catalog must not start background re-fits
+    GRANTMATCH_REFIT_DRIFT_THRESHOLD="2",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from app import config
+from app.api import routes
+from app.main import app
+from app.services import catalog, ingestion
+from app.services.catalog import catalog_state
+from app.services.grant_changes import GrantChangeLog
+from app.services.match_cache import MatchCache
+from app.services.match_cursors import CursorStore
+
+
+def _restart_catalog(monkeypatch, directory: str) -> GrantChangeLog:
+    change_log = GrantChangeLog(config.GRANTS_FILE, directory)
+    monkeypatch.setattr(catalog, "grant_change_log", change_log)
+    monkeypatch.setattr(ingestion, "grant_change_log", change_log)
+    monkeypatch.setattr(catalog_state, "_snapshot", None)
+    monkeypatch.setattr(catalog_state, "_base", None)
+    # Caches are per process, and catalog versions start over after a restart
+    monkeypatch.setattr(routes, "match_cache", MatchCache())
+    monkeypatch.setattr(routes, "match_cursors", CursorStore(max_page_size=config.MATCH_PAGE_MAX_SIZE))
+    return change_log
+
+
+@pytest.fixture
+def ingest_dir(tmp_path) -> str:
+    return str(tmp_path / "ingested")
+
+
+@pytest.fixture
+def restart(monkeypatch, ingest_dir) -> Callable[[], GrantChangeLog]:
+    """Forget the loaded catalog as a restarted process would; the next request replays the change log"""
+    return lambda: _restart_catalog(monkeypatch, ingest_dir)
+
+
+@pytest.fixture
+def client(restart):
+    restart()
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,230 @@
+"""
+Runtime grant ingestion: matching after add/update/retire, change log replay,
+re-fits under load and cache/cursor invalidation on a catalog version change
+"""
+import json
+import threading
+import pytest
+from app.api import routes
+from app.models.grant import Grant
+from app.services import ingestion
+from app.services.catalog import catalog_state
+from app.services.ingestion import ingestion_service
+
+ADMIN_HEADERS = {"X-Admin-Token": "test-token"}
+
+PROFILE = {
+    "user_type": "startup",
+    "domains": ["AI", "Healthcare"],
+    "location": {"country": "India", "state": None, "city": None},
+    "stage": "prototype",
+    "organization": {"type": "company", "registered": True, "team_size": 3},
+    "project": {
+        "title": "Retinal scan triage",
+        "description": "Deep learning models that triage retinal scans with ophthalmoscopy for rural clinics.",
+        "keywords": ["ophthalmoscopy", "retina", "diagnostics"],
+        "funding_needed": 50000,
+    },
+    "credentials": {"previous_grants": [], "publications": 1, "patents": 0},
+}
+
+
+def new_grant(client, grant_id: str, **fields) -> dict:
+    """A grant modelled on G001 under a new id"""
+    grant = json.loads(client.get("/api/grants/G001").content)
+    grant.update(
+        id=grant_id,
+        name="Ophthalmoscopy AI Fund",
+        description="Funding for AI ophthalmoscopy and retina diagnostics in rural healthcare.",
+        deadline="2099-01-31",
+        **fields
+    )
+    return grant
+
+
+def matched_ids(client, profile: dict = PROFILE) -> list:
+    response = client.post("/api/match", json=profile)
+    assert response.status_code == 200
+    return [m["grant"]["id"] for m in response.json()["matches"]]
+
+
+def add(client, grant: dict) -> dict:
+    response = client.post("/api/admin/grants", json=grant, headers=ADMIN_HEADERS)
+    assert response.status_code == 201
+    return response.json()
+
+
+def retire(client, grant_id: str) -> dict:
+    response = client.delete(f"/api/admin/grants/{grant_id}", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_added_grant_is_matched(client):
+    assert "NEW-1" not in matched_ids(client)
+    version = catalog_state.version
+
+    result = add(client, new_grant(client, "NEW-1"))
+
+    assert result["catalog_version"] == version + 1
+    assert client.get("/api/grants/NEW-1").json()["name"] == "Ophthalmoscopy AI Fund"
+    matches = client.post("/api/match", json=PROFILE).json()["matches"]
+    assert "NEW-1" in [m["grant"]["id"] for m in matches]
+    # Terms outside the fitted vocabulary still count for the new grant's semantic score
+    semantic = {m["grant"]["id"]: m["semantic_score"] for m in matches}
+    assert semantic["NEW-1"] == max(semantic.values())
+
+
+def test_add_rejects_existing_grant(client):
+    response = client.post("/api/admin/grants", json=new_grant(client, "G001"), headers=ADMIN_HEADERS)
+    assert response.status_code == 409
+
+
+def test_admin_endpoints_require_token(client):
+    response = client.post("/api/admin/grants", json=new_grant(client, "NEW-1"))
+    assert response.status_code == 403
+    assert client.delete("/api/admin/grants/G001", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_updated_grant_replaces_old_version(client):
+    add(client, new_grant(client, "NEW-1"))
+    grant = new_grant(client, "NEW-1", amount=250000)
+
+    response = client.put("/api/admin/grants/NEW-1", json=grant, headers=ADMIN_HEADERS)
+
+    assert response.status_code == 200
+    assert client.get("/api/grants/NEW-1").json()["amount"] == 250000
+    assert matched_ids(client).count("NEW-1") == 1
+
+
+def test_retired_grant_is_excluded(client):
+    assert "G001" in matched_ids(client)
+
+    retire(client, "G001")
+
+    assert "G001" not in matched_ids(client)
+    assert client.get("/api/grants/G001").status_code == 404
+    search = client.get("/api/grants/search", params={"q": "healthcare"}).json()
+    assert "G001" not in [g["id"] for g in search["results"]]
+    assert client.delete("/api/admin/grants/G001", headers=ADMIN_HEADERS).status_code == 404
+
+
+def test_added_grant_is_searchable(client):
+    add(client, new_grant(client, "NEW-1"))
+
+    search = client.get("/api/grants/search", params={"q": "ophthalmoscopy"}).json()
+
+    assert [g["id"] for g in search["results"]] == ["NEW-1"]
+
+
+def test_change_log_is_replayed_after_restart(client, restart):
+    add(client, new_grant(client, "NEW-1"))
+    add(client, new_grant(client, "NEW-2"))
+    client.put("/api/admin/grants/NEW-1", json=new_grant(client, "NEW-1", amount=250000), headers=ADMIN_HEADERS)
+    retire(client, "NEW-2")
+    retire(client, "G002")
+    before = client.post("/api/match", json=PROFILE).json()
+
+    restart()
+
+    assert catalog_state.peek() is None
+    assert client.get("/api/grants/NEW-1").json()["amount"] == 250000
+    assert client.get("/api/grants/NEW-2").status_code == 404
+    assert client.get("/api/grants/G002").status_code == 404
+    assert client.post("/api/match", json=PROFILE).json() == before
+
+
+def test_failed_log_write_leaves_catalog_unchanged(client, monkeypatch):
+    def fail(grant_id, record):
+        raise OSError("disk full")
+
+    matched_ids(client)
+    version = catalog_state.version
+    monkeypatch.setattr(ingestion.grant_change_log, "append", fail)
+
+    with pytest.raises(OSError):
+        ingestion_service.add(Grant(**new_grant(client, "NEW-1")))
+
+    assert catalog_state.version == version
+    assert client.get("/api/grants/NEW-1").status_code == 404
+
+
+def test_refit_compacts_change_log(client, restart):
+    add(client, new_grant(client, "NEW-1"))
+    retire(client, "G002")
+    before = matched_ids(client)
+
+    snapshot = ingestion_service.refit()
+
+    assert snapshot.repository.get("NEW-1") is not None
+    assert snapshot.repository.get("G002") is None
+    assert sorted(matched_ids(client)) == sorted(before)
+    # The compacted catalog now holds the changes; a restart must not apply them twice
+    change_log = restart()
+    assert change_log.load()[1] == {}
+    assert client.get("/api/grants/NEW-1").status_code == 200
+    assert client.get("/api/grants/G002").status_code == 404
+    assert sorted(matched_ids(client)) == sorted(before)
+
+
+def test_refit_swap_while_requests_are_in_flight(client):
+    add(client, new_grant(client, "NEW-1"))
+    expected = sorted(matched_ids(client))
+    old_snapshot = catalog_state.ready_snapshot()
+    stop = threading.Event()
+    failures = []
+    served = []
+
+    def match_until_stopped():
+        while not stop.is_set():
+            response = client.post("/api/match", json=PROFILE)
+            served.append(catalog_state.version)
+            if response.status_code != 200 or sorted(m["grant"]["id"] for m in response.json()["matches"]) != expected:
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=match_until_stopped) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(3):
+            ingestion_service.refit()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert failures == []
+    # Requests were served both before and after swaps
+    assert len(set(served)) > 1
+    assert catalog_state.version == old_snapshot.version + 3
+    # A request still holding the old snapshot keeps a consistent repository and matcher
+    assert old_snapshot.repository.get("NEW-1") is not None
+    assert len(old_snapshot.matcher.positions) == len(old_snapshot.repository.grants)
+
+
+def test_match_cache_is_invalidated_by_catalog_change(client):
+    matched_ids(client)
+    assert routes.match_cache.stats()["entries"] == 1
+
+    add(client, new_grant(client, "NEW-1"))
+    ids = matched_ids(client)
+
+    assert "NEW-1" in ids
+    stats = routes.match_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 0
+
+
+def test_cursor_is_invalidated_by_catalog_change(client):
+    first = client.post("/api/match", params={"page_size": 3}, json=PROFILE).json()
+    cursor = first["next_cursor"]
+    assert client.post("/api/match", params={"cursor": cursor}).status_code == 200
+
+    add(client, new_grant(client, "NEW-1"))
+
+    response = client.post("/api/match", params={"cursor": cursor})
+    assert response.status_code == 410
+    assert routes.match_cursors.stats()["entries"] == 0
+    again = client.post("/api/match", params={"page_size": 3}, json=PROFILE).json()
+    assert again["total_results"] == first["total_results"] + 1
+    assert client.post("/api/match", params={"cursor": again["next_cursor"]}).status_code == 200